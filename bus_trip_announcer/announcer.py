@@ -2,7 +2,11 @@
 Contains the announcer that keeps track of the next stops in the bus trip.
 """
 
-from bus_trip_announcer.models import Stop, TripStatus
+from collections.abc import Callable
+
+from bus_trip_announcer import metrics
+from bus_trip_announcer.events import AnnouncementEvent, detect_changes
+from bus_trip_announcer.models import StopsView, TripStatus
 from bus_trip_announcer.stops_finder import NextStopsFinder
 
 
@@ -12,14 +16,15 @@ class TripAnnouncer:
     those stops.
 
     The method update_next_stops must be called to update the information
-    as the bus travels.
+    as the bus travels. Subscribers are called with the events of an update
+    only when the next stops change in a way the rider would notice.
 
     Attributes
     ----------
     _next_stops_finder: NextStopsFinder
         the NextStopsFinder object for the announcer to retrieve the next
         stops from
-    next_stops: list[Stop]
+    next_stops: StopsView
         the next stops in the bus trip
     route_number: int
         the route number of the bus trip the announcer is getting the stops for
@@ -33,12 +38,37 @@ class TripAnnouncer:
         self.next_stops_finder = None
         self.trip_status = trip_status
         self.next_stops = None
+        self._subscribers = []
 
+    def subscribe(
+        self, subscriber: Callable[[list[AnnouncementEvent]], None]
+    ) -> Callable[[], None]:
+        """
+        Subscribes to the events of the announcer.
+        :param subscriber: the function called with the events of each update
+            that has any
+        :return: a function that unsubscribes the subscriber
+        """
+        self._subscribers.append(subscriber)
+        return lambda: self._subscribers.remove(subscriber)
+
+    @metrics.timed("announcer_update_seconds")
     def update_next_stops(self) -> None:
         """
         Updates the next stops the announcer is keeping track of
         for the updated trip status.
         """
+        previous_stops = self.next_stops
         self.next_stops = self.next_stops_finder.get_next_stops(
             self.trip_status.coordinates
         )
+        if not self._subscribers:
+            return
+
+        events = detect_changes(previous_stops, self.next_stops)
+        if metrics.registry.enabled:
+            for event in events:
+                metrics.count("announcer_events_total", type=event.type.name)
+        if events:
+            for subscriber in list(self._subscribers):
+                subscriber(events)
@@ -0,0 +1,200 @@
+"""
+Contains the asyncio interface to the announcers, finders, and database.
+
+The finders and database block while they work, so they are run on a bounded
+pool of worker threads to keep the event loop free.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import TYPE_CHECKING, TypeVar
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.database.database import Database, Query
+from bus_trip_announcer.database.finders import TripFinder
+from bus_trip_announcer.models import StopsView, Trip, TripStatus
+from bus_trip_announcer.sessions import SessionManager
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+T = TypeVar("T")
+
+
+class AsyncAnnouncerService:
+    """
+    Runs the work of the announcer sessions without blocking the event loop.
+
+    At most max_workers calls run at the same time, and at most max_pending
+    calls are waiting for or using a worker. Each call can be given a
+    timeout in seconds, which includes the time spent waiting for the
+    number of pending calls to drop below max_pending. A call that times
+    out, or whose task is cancelled, raises in the caller straight away. It
+    is removed from the pool if it has not started, and its result is
+    discarded otherwise.
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        database: Database,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        timeout: float | None = None,
+    ):
+        """
+        Initializes the service with the given parameters.
+        :param session_manager: the manager of the announcer sessions
+        :param database: the database the trips are found in
+        :param max_workers: the number of worker threads
+        :param max_pending: the maximum number of calls that can be waiting
+            for or using a worker
+        :param timeout: the default timeout of the calls in seconds
+        """
+        self.session_manager = session_manager
+        self._database = database
+        self._trip_finder = TripFinder(database)
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="announcer"
+        )
+        self._pending = asyncio.Semaphore(max_pending)
+        self.timeout = timeout
+
+    async def get(
+        self, query: Query, timeout: float | None = None
+    ) -> pd.DataFrame:
+        """
+        Retrieves the table that satisfies the query from the database.
+        :param query: the query
+        :param timeout: the timeout of the call in seconds
+        :return: the table that satisfies the query
+        """
+        return await self._run(self._database.get, (query,), timeout)
+
+    async def find_trip(
+        self,
+        route_number: int,
+        direction: SEQDirection,
+        coordinates: Coordinates,
+        time: timedelta,
+        timeout: float | None = None,
+    ) -> Trip:
+        """
+        Finds the trip of the bus, see TripFinder.get_trip.
+        :param route_number: the route number of the trip
+        :param direction: the direction of the bus trip
+        :param coordinates: the coordinates of the bus at the given time
+        :param time: the time
+        :param timeout: the timeout of the call in seconds
+        :return: the trip
+        """
+        return await self._run(
+            self._trip_finder.get_trip,
+            (route_number, direction, coordinates, time),
+            timeout,
+        )
+
+    def open_session(
+        self,
+        rider_id: Hashable,
+        trip: Trip,
+        trip_status: TripStatus | None = None,
+    ) -> TripAnnouncer:
+        """
+        Opens a session for the rider on the given trip.
+
+        Opening a session does not block, so it is done on the event loop.
+        :param rider_id: the id of the rider
+        :param trip: the trip the rider is on
+        :param trip_status: the status of the rider's trip
+        :return: the announcer of the session
+        """
+        return self.session_manager.open_session(rider_id, trip, trip_status)
+
+    async def update_location(
+        self,
+        rider_id: Hashable,
+        coordinates: Coordinates,
+        timeout: float | None = None,
+    ) -> StopsView:
+        """
+        Updates the location of the rider and the next stops of their
+        session.
+        :param rider_id: the id of the rider
+        :param coordinates: the current location of the rider
+        :param timeout: the timeout of the call in seconds
+        :return: the next stops of the rider
+        """
+        return await self._run(
+            self.session_manager.update_location,
+            (rider_id, coordinates),
+            timeout,
+        )
+
+    def close(self) -> None:
+        """
+        Stops the worker threads. Calls that have not started are cancelled.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self) -> AsyncAnnouncerService:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+    async def _run(
+        self,
+        function: Callable[..., T],
+        args: tuple,
+        timeout: float | None,
+    ) -> T:
+        """
+        Runs the function on a worker thread.
+
+        The pending slot of the call is only released once the worker is
+        done with it, so timed out calls still count towards max_pending
+        until they finish.
+        :param function: the function
+        :param args: the arguments to the function
+        :param timeout: the timeout of the call in seconds, defaults to the
+            timeout of the service
+        :return: the result of the function
+        """
+        loop = asyncio.get_running_loop()
+        if timeout is None:
+            timeout = self.timeout
+        # waiting for a pending slot counts towards the timeout of the call
+        deadline = None if timeout is None else loop.time() + timeout
+        await asyncio.wait_for(self._pending.acquire(), timeout)
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(
+            functools.partial(self._release_pending, loop)
+        )
+        remaining = None
+        if deadline is not None:
+            remaining = max(deadline - loop.time(), 0)
+        return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+
+    def _release_pending(
+        self, loop: asyncio.AbstractEventLoop, _: Future
+    ) -> None:
+        """
+        Releases the pending slot of a finished call on the event loop.
+        :param loop: the event loop the call was made from
+        """
+        try:
+            loop.call_soon_threadsafe(self._pending.release)
+        except RuntimeError:
+            # the event loop has been closed
+            pass
@@ -0,0 +1,469 @@
+"""
+Contains the microbenchmarks of the hot paths of the announcer, and the
+comparison of their results against a baseline.
+
+Each benchmark runs against synthetic networks of several sizes. The
+results are saved as JSON, and comparing two results flags the
+benchmarks that became slower by a statistically significant amount,
+using a one-sided Mann-Whitney U test on the timing samples.
+
+Usage:
+    python -m bus_trip_announcer.benchmarks run --output baseline.json
+    python -m bus_trip_announcer.benchmarks compare baseline.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import fnmatch
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+import pandas as pd
+
+from bus_trip_announcer.data_managers.synthetic_data_generator import (
+    SyntheticNetworkGenerator,
+)
+from bus_trip_announcer.database.database import CSVDatabase, Query
+from bus_trip_announcer.database.finders import DirectionFinder, TripFinder
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.utils import Coordinates, Line, SEQDirection
+
+# the parameters of the synthetic network of each dataset size
+SIZES = {
+    "small": {
+        "number_of_routes": 10,
+        "trips_per_direction": 10,
+        "stops_per_trip": 10,
+    },
+    "medium": {
+        "number_of_routes": 60,
+        "trips_per_direction": 70,
+        "stops_per_trip": 40,
+    },
+    "large": {
+        "number_of_routes": 600,
+        "trips_per_direction": 70,
+        "stops_per_trip": 40,
+    },
+}
+DEFAULT_SIZES = ("small", "medium")
+
+
+class Dataset:
+    """
+    A synthetic network the benchmarks run against.
+
+    Attributes
+    ----------
+    size: str
+        the name of the size of the network
+    directory: str
+        the directory of the tables of the network
+    route_number: int
+        the route the finder benchmarks look up
+    trip_id: str
+        a trip of the route
+    location: Coordinates
+        a location halfway along the trip
+    time: datetime.timedelta
+        a time before the trip reaches the location
+    """
+
+    def __init__(self, size: str, directory: str):
+        """
+        Generates the network of the given size in the directory, unless it
+        is there already.
+        :param size: the name of the size
+        :param directory: the directory the networks are kept in
+        """
+        self.size = size
+        self.directory = os.path.join(directory, size)
+        if not os.path.exists(os.path.join(self.directory, "stops.csv")):
+            SyntheticNetworkGenerator(**SIZES[size]).write(self.directory)
+
+        # a trip in the middle of the day of a numbered route
+        trips = pd.read_csv(os.path.join(self.directory, "trips.csv"))
+        trips = trips[
+            (trips["direction_id"] == 0)
+            & trips["route_id"].str[0].str.isdigit()
+        ]
+        trip = trips.iloc[len(trips) // 2]
+        self.trip_id = trip["trip_id"]
+        self.route_number = int(trip["route_id"].split("-")[0])
+
+        stop_times = pd.read_csv(
+            os.path.join(self.directory, "stop_times.csv")
+        )
+        trip_stop_times = stop_times[stop_times["trip_id"] == self.trip_id]
+        middle = trip_stop_times.iloc[len(trip_stop_times) // 2]
+        stops = pd.read_csv(os.path.join(self.directory, "stops.csv"))
+        stop = stops[stops["stop_id"] == middle["stop_id"]].iloc[0]
+        self.location = Coordinates(stop["stop_lat"], stop["stop_lon"])
+        self.time = pd.to_timedelta(trip_stop_times["arrival_time"].iloc[0])
+
+
+def _cold_load(dataset: Dataset) -> Callable[[], object]:
+    return lambda: CSVDatabase(dataset.directory).get(Query("stop_times"))
+
+
+def _warm_load(dataset: Dataset) -> Callable[[], object]:
+    database = _warm_database(dataset)
+    return lambda: database.get(Query("stop_times"))
+
+
+def _query_select(dataset: Dataset) -> Callable[[], object]:
+    database = _warm_database(dataset)
+    return lambda: database.get(
+        Query("stop_times").select(["trip_id", "stop_id"])
+    )
+
+
+def _query_where(dataset: Dataset) -> Callable[[], object]:
+    database = _warm_database(dataset)
+    trip_id = dataset.trip_id
+    return lambda: database.get(
+        Query("stop_times").where(lambda row: row["trip_id"] == trip_id)
+    )
+
+
+def _query_join(dataset: Dataset) -> Callable[[], object]:
+    database = _warm_database(dataset)
+    return lambda: database.get(
+        Query("trips")
+        .select(["trip_id", "route_id"])
+        .join("stop_times", "trip_id")
+    )
+
+
+def _query_order_by(dataset: Dataset) -> Callable[[], object]:
+    database = _warm_database(dataset)
+    return lambda: database.get(Query("stop_times").order_by("arrival_time"))
+
+
+def _get_headsigns(dataset: Dataset) -> Callable[[], object]:
+    finder = DirectionFinder(_warm_database(dataset))
+    return lambda: finder.get_headsigns(dataset.route_number)
+
+
+def _get_direction(dataset: Dataset) -> Callable[[], object]:
+    finder = DirectionFinder(_warm_database(dataset))
+    headsign = finder.get_headsigns(dataset.route_number)[0]
+    return lambda: finder.get_direction(dataset.route_number, headsign)
+
+
+def _get_trip(dataset: Dataset) -> Callable[[], object]:
+    finder = TripFinder(_warm_database(dataset))
+    return lambda: finder.get_trip(
+        dataset.route_number, SEQDirection.ZERO, dataset.location, dataset.time
+    )
+
+
+def _create_trip(dataset: Dataset) -> Callable[[], object]:
+    finder = TripFinder(_warm_database(dataset))
+    return lambda: finder._create_trip(
+        dataset.trip_id, dataset.route_number, SEQDirection.ZERO
+    )
+
+
+def _get_in_between_stops(dataset: Dataset) -> Callable[[], object]:
+    stops = list(_trip(dataset).stops)
+    return lambda: NextStopsFinder.get_in_between_stops(
+        stops, dataset.location
+    )
+
+
+def _get_next_stops(dataset: Dataset) -> Callable[[], object]:
+    finder = NextStopsFinder(_trip(dataset))
+    return lambda: finder.get_next_stops(dataset.location)
+
+
+def _minimum_distance(dataset: Dataset) -> Callable[[], object]:
+    line = Line(Coordinates(-27.47, 153.02), Coordinates(-27.48, 153.03))
+    return lambda: Line.minimum_distance(line, dataset.location)
+
+
+def _warm_database(dataset: Dataset) -> CSVDatabase:
+    """
+    Returns a database of the dataset with its stop_times already loaded.
+    """
+    database = CSVDatabase(dataset.directory)
+    database.get(Query("stop_times"))
+    return database
+
+
+def _trip(dataset: Dataset):
+    """
+    Returns the trip of the dataset.
+    """
+    finder = TripFinder(_warm_database(dataset))
+    return finder._create_trip(
+        dataset.trip_id, dataset.route_number, SEQDirection.ZERO
+    )
+
+
+# the setup of each benchmark, which returns the function that is timed
+BENCHMARKS = {
+    "csv_database.cold_load": _cold_load,
+    "csv_database.warm_load": _warm_load,
+    "query.select": _query_select,
+    "query.where": _query_where,
+    "query.join": _query_join,
+    "query.order_by": _query_order_by,
+    "direction_finder.get_headsigns": _get_headsigns,
+    "direction_finder.get_direction": _get_direction,
+    "trip_finder.get_trip": _get_trip,
+    "trip_finder.create_trip": _create_trip,
+    "next_stops_finder.get_in_between_stops": _get_in_between_stops,
+    "next_stops_finder.get_next_stops": _get_next_stops,
+    "line.minimum_distance": _minimum_distance,
+}
+
+
+def time_function(
+    function: Callable[[], object], repeat: int = 15, min_time: float = 0.05
+) -> list[float]:
+    """
+    Returns samples of the time a call of the function takes.
+
+    Each sample times enough calls in a row to take at least min_time, and
+    is the mean time of those calls.
+    :param function: the function
+    :param repeat: the number of samples
+    :param min_time: the minimum time in seconds of a sample
+    :return: the samples in seconds
+    """
+    loops = 1
+    while True:
+        elapsed = _time_loops(function, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    return [_time_loops(function, loops) / loops for _ in range(repeat)]
+
+
+def _time_loops(function: Callable[[], object], loops: int) -> float:
+    """Returns the time the given number of calls of the function take."""
+    start = time.perf_counter()
+    for _ in range(loops):
+        function()
+    return time.perf_counter() - start
+
+
+def run_benchmarks(
+    sizes: list[str] = DEFAULT_SIZES,
+    pattern: str = "*",
+    repeat: int = 15,
+    min_time: float = 0.05,
+    data_directory: str | None = None,
+    log: Callable[[str], None] = lambda _: None,
+) -> dict:
+    """
+    Runs the benchmarks whose name matches the pattern on each size.
+    :param sizes: the names of the dataset sizes
+    :param pattern: a shell-style pattern of the benchmark names
+    :param repeat: the number of samples of each benchmark
+    :param min_time: the minimum time in seconds of a sample
+    :param data_directory: where the datasets are generated and kept, a
+        temporary directory by default
+    :param log: called with the progress
+    :return: the results, which can be written as JSON
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = data_directory or temporary_directory
+        for size in sizes:
+            log(f"generating the {size} dataset")
+            dataset = Dataset(size, directory)
+            for name, setup in BENCHMARKS.items():
+                if not fnmatch.fnmatch(name, pattern):
+                    continue
+                samples = time_function(setup(dataset), repeat, min_time)
+                median = statistics.median(samples)
+                results[f"{name}[{size}]"] = {
+                    "samples": samples,
+                    "median": median,
+                    "mean": statistics.fmean(samples),
+                    "stdev": statistics.stdev(samples) if repeat > 1 else 0,
+                }
+                log(f"{name}[{size}]: {_format_seconds(median)}")
+
+    return {
+        "metadata": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def mann_whitney_u(baseline: list[float], current: list[float]) -> float:
+    """
+    Returns the p-value of the one-sided Mann-Whitney U test that the
+    current samples tend to be larger than the baseline samples.
+
+    The p-value uses the normal approximation of U with a correction for
+    ties, which is accurate for the ten or more samples of a benchmark.
+    :param baseline: the baseline samples
+    :param current: the current samples
+    :return: the p-value
+    """
+    n1, n2 = len(current), len(baseline)
+    combined = sorted(
+        [(value, 0) for value in current] + [(value, 1) for value in baseline]
+    )
+    n = n1 + n2
+
+    # the ranks of the current samples, with tied values sharing their rank
+    current_rank_sum = 0.0
+    tie_correction = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_correction += ties**3 - ties
+        current_rank_sum += rank * sum(
+            1 for k in range(i, j + 1) if combined[k][1] == 0
+        )
+        i = j + 1
+
+    u = current_rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_correction / (n * (n - 1)))
+    if variance <= 0:
+        return 0.5
+    # with a continuity correction
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    alpha: float = 0.01,
+    threshold: float = 0.05,
+) -> list[dict]:
+    """
+    Compares the benchmarks in both results.
+
+    A benchmark has regressed when its current samples are significantly
+    larger than the baseline, with a p-value below alpha, and its median
+    is more than threshold slower.
+    :param baseline: the baseline results
+    :param current: the current results
+    :param alpha: the significance level
+    :param threshold: the smallest relative slowdown that is flagged
+    :return: the comparison of each benchmark in both results
+    """
+    comparisons = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        baseline_result = baseline["results"][name]
+        ratio = result["median"] / baseline_result["median"]
+        p_value = mann_whitney_u(
+            baseline_result["samples"], result["samples"]
+        )
+        comparisons.append(
+            {
+                "name": name,
+                "baseline": baseline_result["median"],
+                "current": result["median"],
+                "ratio": ratio,
+                "p_value": p_value,
+                "regressed": p_value < alpha and ratio > 1 + threshold,
+            }
+        )
+    return comparisons
+
+
+def _format_seconds(seconds: float) -> str:
+    """Returns the time with a suitable unit."""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.1f}ns"
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """
+    Runs or compares the benchmarks from the command line.
+    :param arguments: the command line arguments, by default sys.argv
+    :return: the exit status, 1 if compare found a regression
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot paths of the bus trip announcer."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--output", default="-", help="the JSON results file")
+    run.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES
+    )
+    run.add_argument("--filter", default="*", help="a benchmark name pattern")
+    run.add_argument("--repeat", type=int, default=15)
+    run.add_argument("--min-time", type=float, default=0.05)
+    run.add_argument(
+        "--data-dir", default=None, help="where to keep the datasets"
+    )
+
+    compare_command = commands.add_parser(
+        "compare", help="compare results against a baseline"
+    )
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current")
+    compare_command.add_argument("--alpha", type=float, default=0.01)
+    compare_command.add_argument("--threshold", type=float, default=0.05)
+    options = parser.parse_args(arguments)
+
+    if options.command == "run":
+        results = run_benchmarks(
+            options.sizes,
+            options.filter,
+            options.repeat,
+            options.min_time,
+            options.data_dir,
+            lambda message: print(message, file=sys.stderr),
+        )
+        if options.output == "-":
+            json.dump(results, sys.stdout, indent=2)
+        else:
+            with open(options.output, "w") as file:
+                json.dump(results, file, indent=2)
+        return 0
+
+    with open(options.baseline) as file:
+        baseline = json.load(file)
+    with open(options.current) as file:
+        current = json.load(file)
+    comparisons = compare(baseline, current, options.alpha, options.threshold)
+    for comparison in comparisons:
+        flag = "SLOWER" if comparison["regressed"] else ""
+        print(
+            f"{comparison['name']:<52}"
+            f"{_format_seconds(comparison['baseline']):>12}"
+            f"{_format_seconds(comparison['current']):>12}"
+            f"{comparison['ratio']:>8.2f}x"
+            f"  p={comparison['p_value']:.4f} {flag}"
+        )
+    return int(any(comparison["regressed"] for comparison in comparisons))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
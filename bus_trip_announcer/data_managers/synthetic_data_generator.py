@@ -0,0 +1,389 @@
+"""
+Generates synthetic transport networks in the format of useful_data, so
+that the database, the finders and the stops finder can be run and sized
+against networks of any scale without the real SEQ data.
+
+The generation is deterministic: the same parameters and seed always give
+the same files.
+
+Usage: python -m bus_trip_announcer.data_managers.synthetic_data_generator
+    OUTPUT_DIRECTORY [--scale 1] [--seed 0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+
+import numpy as np
+
+# the directions a route can run in, along the x or y axis of the grid
+_HEADINGS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)])
+
+_STREETS = (
+    "Adelaide",
+    "Albert",
+    "Ann",
+    "Boundary",
+    "Charlotte",
+    "Edward",
+    "Elizabeth",
+    "George",
+    "Grey",
+    "Logan",
+    "Margaret",
+    "Mary",
+    "Melbourne",
+    "Queen",
+    "Stanley",
+    "Wickham",
+)
+
+# the hours of the morning and afternoon peaks, when buses are slower
+_PEAKS = ((7 * 3600, 9 * 3600), (16 * 3600, 18 * 3600))
+_PEAK_SLOWDOWN = 1.25
+
+
+class SyntheticNetworkGenerator:
+    """
+    Generates a network of bus routes on a grid of stops.
+
+    Routes are numbered from 100, with every tenth route a lettered prime
+    route. Each route runs from a random stop of the grid in one heading,
+    moving one stop forward and up to one stop sideways at a time, so
+    routes cross and share stops as real routes do. Direction 0 of a route
+    runs along its stops and direction 1 runs back. The trips of each
+    direction are spread evenly over the service day, and take longer in
+    the peaks.
+
+    Attributes
+    ----------
+    number_of_routes: int
+        the number of routes
+    trips_per_direction: int
+        the number of trips of each route in each direction
+    stops_per_trip: int
+        the number of stops of each route
+    seed: int
+        the seed of the random numbers
+    centre: tuple[float, float]
+        the latitude and longitude of the centre of the network
+    stop_spacing: float
+        the distance in degrees between neighbouring stops of the grid
+    service_start: int
+        the time in seconds since midnight the first trips start
+    service_end: int
+        the time in seconds since midnight the last trips start
+    segment_times: tuple[int, int]
+        the smallest and largest time in seconds between two stops
+    """
+
+    # the size of the SEQ bus network the scale is relative to
+    SEQ_ROUTES = 600
+    SEQ_TRIPS_PER_DIRECTION = 70
+    SEQ_STOPS_PER_TRIP = 40
+
+    def __init__(
+        self,
+        number_of_routes: int = 60,
+        trips_per_direction: int = 70,
+        stops_per_trip: int = 40,
+        seed: int = 0,
+        centre: tuple[float, float] = (-27.47, 153.03),
+        stop_spacing: float = 0.004,
+        service_start: int = 5 * 3600,
+        service_end: int = 23 * 3600,
+        segment_times: tuple[int, int] = (45, 240),
+    ):
+        """
+        Initializes the generator with the given parameters.
+        :param number_of_routes: the number of routes
+        :param trips_per_direction: the number of trips of each route in
+            each direction
+        :param stops_per_trip: the number of stops of each route
+        :param seed: the seed of the random numbers
+        :param centre: the latitude and longitude of the centre
+        :param stop_spacing: the distance in degrees between neighbouring
+            stops
+        :param service_start: the time in seconds the first trips start
+        :param service_end: the time in seconds the last trips start
+        :param segment_times: the smallest and largest time in seconds
+            between two stops
+        """
+        if stops_per_trip < 2:
+            raise ValueError("a trip needs at least two stops")
+        self.number_of_routes = number_of_routes
+        self.trips_per_direction = trips_per_direction
+        self.stops_per_trip = stops_per_trip
+        self.seed = seed
+        self.centre = centre
+        self.stop_spacing = stop_spacing
+        self.service_start = service_start
+        self.service_end = service_end
+        self.segment_times = segment_times
+
+    @classmethod
+    def at_seq_scale(
+        cls, scale: float = 1.0, seed: int = 0, **kwargs
+    ) -> SyntheticNetworkGenerator:
+        """
+        Returns a generator for a network with scale times the routes of
+        the SEQ bus network, with the same trips and stops per route.
+
+        At scale 1 the network has about 3.4 million stop times.
+        :param scale: the size relative to the SEQ network
+        :param seed: the seed of the random numbers
+        :param kwargs: the other parameters of the generator
+        :return: the generator
+        """
+        return cls(
+            number_of_routes=max(1, round(cls.SEQ_ROUTES * scale)),
+            trips_per_direction=cls.SEQ_TRIPS_PER_DIRECTION,
+            stops_per_trip=cls.SEQ_STOPS_PER_TRIP,
+            seed=seed,
+            **kwargs,
+        )
+
+    def write(self, directory: str) -> dict[str, int]:
+        """
+        Writes the routes, trips, stops and stop_times tables of the network
+        as csv files in the given directory.
+
+        The routes are generated and written one at a time, so the memory
+        used does not grow with the number of stop times.
+        :param directory: the directory
+        :return: the number of rows of each table
+        """
+        os.makedirs(directory, exist_ok=True)
+        rng = np.random.default_rng(self.seed)
+        # the stop of each cell of the grid, and the stops by their id
+        stop_ids: dict[tuple[int, int], int] = {}
+        stop_cells: list[tuple[int, int]] = []
+        rows = {"routes": 0, "trips": 0, "stop_times": 0}
+        # routes start close enough together that about half of the stops
+        # of a route are shared with other routes, as in SEQ
+        grid_size = int(
+            math.sqrt(self.number_of_routes * self.stops_per_trip) / 4
+        )
+
+        files = {
+            table: open(
+                os.path.join(directory, f"{table}.csv"), "w", newline=""
+            )
+            for table in rows
+        }
+        try:
+            files["routes"].write(",route_id,route_short_name\n")
+            files["trips"].write(
+                ",trip_id,route_id,trip_headsign,direction_id\n"
+            )
+            files["stop_times"].write(
+                ",trip_id,stop_id,arrival_time,stop_sequence\n"
+            )
+            for route in range(self.number_of_routes):
+                cells = self._route_cells(rng, grid_size)
+                route_stops = []
+                for cell in cells:
+                    stop_id = stop_ids.get(cell)
+                    if stop_id is None:
+                        stop_cells.append(cell)
+                        stop_id = stop_ids[cell] = len(stop_cells)
+                    route_stops.append(stop_id)
+                segment_times = rng.integers(
+                    self.segment_times[0],
+                    self.segment_times[1] + 1,
+                    len(cells) - 1,
+                )
+                self._write_route(
+                    files, rows, rng, route, route_stops, segment_times
+                )
+        finally:
+            for file in files.values():
+                file.close()
+
+        rows["stops"] = self._write_stops(directory, rng, stop_cells)
+        return rows
+
+    def _route_cells(
+        self, rng: np.random.Generator, grid_size: int
+    ) -> list[tuple[int, int]]:
+        """
+        Returns the cells of the grid a route stops at.
+        :param rng: the random numbers
+        :param grid_size: the size of the grid routes start in
+        :return: the cells, in the order of the route
+        """
+        start = rng.integers(-grid_size, grid_size + 1, 2)
+        heading = _HEADINGS[rng.integers(len(_HEADINGS))]
+        sideways = heading[::-1]
+        steps = rng.integers(-1, 2, self.stops_per_trip - 1)
+        # every step moves forward, so a route never visits a cell twice
+        moves = heading + steps[:, np.newaxis] * sideways
+        cells = np.vstack([start, start + np.cumsum(moves, axis=0)])
+        return [(int(x), int(y)) for x, y in cells]
+
+    def _write_route(
+        self,
+        files: dict,
+        rows: dict[str, int],
+        rng: np.random.Generator,
+        route: int,
+        route_stops: list[int],
+        segment_times: np.ndarray,
+    ) -> None:
+        """
+        Writes a route, its trips in both directions and their stop times.
+        :param files: the files of the tables
+        :param rows: the number of rows written to each table
+        :param rng: the random numbers
+        :param route: the number of the route
+        :param route_stops: the stops of the route in direction 0
+        :param segment_times: the times between the stops in direction 0
+        """
+        # like the prime routes of SEQ, such as P88, some routes have a
+        # letter, so that the short names are read as strings as in SEQ
+        route_number = str(100 + route)
+        if route % 10 == 9:
+            route_number = "P" + route_number
+        route_id = f"{route_number}-1"
+        files["routes"].write(f"{rows['routes']},{route_id},{route_number}\n")
+        rows["routes"] += 1
+
+        headway = (self.service_end - self.service_start) / max(
+            self.trips_per_direction, 1
+        )
+        for direction in (0, 1):
+            stops = route_stops if direction == 0 else route_stops[::-1]
+            times = segment_times if direction == 0 else segment_times[::-1]
+            offsets = np.concatenate([[0], np.cumsum(times)])
+            headsign = _stop_name(stops[-1])
+
+            # the trips do not leave exactly on the headway
+            delays = rng.integers(
+                0, int(headway // 4) + 1, self.trips_per_direction
+            )
+            starts = (
+                self.service_start
+                + np.arange(self.trips_per_direction) * headway
+                + delays
+            )
+            for trip, start in enumerate(starts):
+                trip_id = f"{route_id}-{direction}-{trip}"
+                files["trips"].write(
+                    f"{rows['trips']},{trip_id},{route_id},{headsign},"
+                    f"{direction}\n"
+                )
+                rows["trips"] += 1
+
+                slowdown = _PEAK_SLOWDOWN if _in_peak(start) else 1.0
+                arrivals = np.rint(start + offsets * slowdown).astype(int)
+                index = rows["stop_times"]
+                files["stop_times"].writelines(
+                    f"{index + i},{trip_id},{stop},"
+                    f"{_format_time(arrival)},{i + 1}\n"
+                    for i, (stop, arrival) in enumerate(zip(stops, arrivals))
+                )
+                rows["stop_times"] += len(stops)
+
+    def _write_stops(
+        self,
+        directory: str,
+        rng: np.random.Generator,
+        stop_cells: list[tuple[int, int]],
+    ) -> int:
+        """
+        Writes the stops table.
+        :param directory: the directory of the tables
+        :param rng: the random numbers
+        :param stop_cells: the cell of each stop, in the order of their ids
+        :return: the number of stops
+        """
+        cells = np.array(stop_cells, dtype=float).reshape(-1, 2)
+        # stops are not exactly on the grid
+        jitter = rng.uniform(-0.2, 0.2, cells.shape)
+        latitudes = self.centre[0] + (cells[:, 1] + jitter[:, 1]) * (
+            self.stop_spacing
+        )
+        longitudes = self.centre[1] + (cells[:, 0] + jitter[:, 0]) * (
+            self.stop_spacing
+        )
+        with open(
+            os.path.join(directory, "stops.csv"), "w", newline=""
+        ) as file:
+            file.write(",stop_id,stop_name,stop_lat,stop_lon\n")
+            file.writelines(
+                f"{i},{i + 1},{_stop_name(i + 1)},{latitude:.6f},"
+                f"{longitude:.6f}\n"
+                for i, (latitude, longitude) in enumerate(
+                    zip(latitudes, longitudes)
+                )
+            )
+        return len(stop_cells)
+
+
+def _stop_name(stop_id: int) -> str:
+    """
+    Returns a street corner name for a stop.
+    """
+    street = _STREETS[stop_id % len(_STREETS)]
+    cross_street = _STREETS[(stop_id // len(_STREETS)) % len(_STREETS)]
+    return f"{street} St near {cross_street} St stop {stop_id}"
+
+
+def _in_peak(time: float) -> bool:
+    """
+    Returns whether the time in seconds since midnight is in a peak.
+    """
+    return any(start <= time < end for start, end in _PEAKS)
+
+
+def _format_time(seconds: int) -> str:
+    """
+    Returns the time in seconds since midnight as HH:MM:SS, with hours past
+    24 for times after midnight as in GTFS.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """
+    Generates a network from the command line.
+    :param arguments: the command line arguments, by default sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic network in the useful_data format."
+    )
+    parser.add_argument("output", help="the directory of the tables")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=None,
+        help="the size relative to SEQ, overrides --routes",
+    )
+    parser.add_argument("--routes", type=int, default=60)
+    parser.add_argument("--trips-per-direction", type=int, default=70)
+    parser.add_argument("--stops-per-trip", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(arguments)
+
+    if options.scale is not None:
+        generator = SyntheticNetworkGenerator.at_seq_scale(
+            options.scale, options.seed
+        )
+    else:
+        generator = SyntheticNetworkGenerator(
+            options.routes,
+            options.trips_per_direction,
+            options.stops_per_trip,
+            options.seed,
+        )
+    rows = generator.write(options.output)
+    for table, number in rows.items():
+        print(f"{table}: {number} rows")
+
+
+if __name__ == "__main__":
+    main()
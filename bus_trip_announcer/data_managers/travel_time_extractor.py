@@ -0,0 +1,13 @@
+from bus_trip_announcer.database.database import CSVDatabase, Query
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+
+
+def main():
+    database = CSVDatabase("useful_data")
+    stop_times = database.get(Query("stop_times"))
+    travel_times = SegmentTravelTimes.from_stop_times(stop_times)
+    travel_times.save("useful_data/segment_travel_times.npz")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,23 @@
 Module that provides query access to the SEQ transport database.
 """
 from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Callable, Protocol
-
-import pandas as pd
+from typing import TYPE_CHECKING, Callable, Iterable, Protocol
 
+from bus_trip_announcer import metrics, profiling
 from bus_trip_announcer.models import Trip, Stop
 from bus_trip_announcer.utils import Coordinates, Direction
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 # file paths to the csv files
 DATA_DIRECTORY = "useful_data"
 TABLE_FILE_PATH = {
@@ -19,6 +27,9 @@ TABLE_FILE_PATH = {
     "stop_times": DATA_DIRECTORY + "/stop_times.csv",
     "trips": DATA_DIRECTORY + "/trips.csv",
 }
+TABLE_NAMES = tuple(TABLE_FILE_PATH)
+
+logger = logging.getLogger(__name__)
 
 
 class QueryOperation(Enum):
@@ -146,36 +157,255 @@ class Database(Protocol):
         """
 
 
+class OperationProfile:
+    """
+    What one step of a query did and what it cost.
+
+    Attributes
+    ----------
+    operation: str
+        the step, SCAN for reading the queried table, or the name of the
+        QueryOperation
+    detail: str
+        the arguments of the step, such as the columns or the joined table
+    source: str
+        where the data of the step came from, disk for a table read from its
+        csv file, cache for a table kept in memory, or memory for a step on
+        the result of the previous step
+    elapsed: float
+        the time the step took in seconds
+    input_rows: int
+        the number of rows going into the step
+    output_rows: int
+        the number of rows coming out of the step
+    output_bytes: int
+        the memory used by the result of the step, not counting the
+        contents of python objects such as strings
+    """
+
+    __slots__ = (
+        "operation",
+        "detail",
+        "source",
+        "elapsed",
+        "input_rows",
+        "output_rows",
+        "output_bytes",
+    )
+
+    def __init__(
+        self,
+        operation: str,
+        detail: str,
+        source: str,
+        elapsed: float,
+        input_rows: int,
+        output_rows: int,
+        output_bytes: int,
+    ):
+        """
+        Initializes the profile with the given parameters.
+        """
+        self.operation = operation
+        self.detail = detail
+        self.source = source
+        self.elapsed = elapsed
+        self.input_rows = input_rows
+        self.output_rows = output_rows
+        self.output_bytes = output_bytes
+
+    def to_dict(self) -> dict:
+        """Returns the profile as a dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class QueryProfile:
+    """
+    The plan of a query as it was run, with the cost of each step, like the
+    output of EXPLAIN ANALYZE.
+
+    Attributes
+    ----------
+    table_name: str
+        the name of the queried table
+    operations: list[OperationProfile]
+        the steps of the query, in the order they ran
+    """
+
+    def __init__(self, table_name: str):
+        """
+        Initializes the profile of a query on the given table.
+        :param table_name: the name of the queried table
+        """
+        self.table_name = table_name
+        self.operations = []
+
+    @property
+    def elapsed(self) -> float:
+        """The time the query took in seconds."""
+        return sum(operation.elapsed for operation in self.operations)
+
+    @property
+    def slowest(self) -> OperationProfile | None:
+        """The step that took the longest."""
+        return max(
+            self.operations,
+            key=lambda operation: operation.elapsed,
+            default=None,
+        )
+
+    def to_dict(self) -> dict:
+        """Returns the profile as a dictionary."""
+        return {
+            "table": self.table_name,
+            "elapsed": self.elapsed,
+            "operations": [
+                operation.to_dict() for operation in self.operations
+            ],
+        }
+
+    def to_json(self) -> str:
+        """Returns the profile as JSON."""
+        return json.dumps(self.to_dict())
+
+    def __str__(self) -> str:
+        lines = [f"Query on {self.table_name} ({self.elapsed * 1000:.3f}ms)"]
+        for operation in self.operations:
+            lines.append(
+                f"  {operation.operation} {operation.detail}"
+                f" [{operation.source}]"
+                f" rows={operation.input_rows}->{operation.output_rows}"
+                f" bytes={operation.output_bytes}"
+                f" time={operation.elapsed * 1000:.3f}ms"
+            )
+        return "\n".join(lines)
+
+
 class CSVDatabase(Database):
     """
     The class that supports query access to the local database of csv files.
 
+    The cached tables are read from their csv files once, the first time
+    they are queried, and then kept in memory. They are read only once even
+    when several threads query them at the same time, and each query gets
+    its own shallow copy of the table, so the cached tables are never
+    changed by the code that uses them.
+
     Attributes
     ----------
     _data_directory:
         the file path to the directory of the csv files
-    _stop_times:
-        the stop_times table
+    _cached_tables:
+        the names of the tables kept in memory
+    _tables:
+        the cached tables that have been read, by their name
+    profile_queries:
+        whether every query is profiled and its plan logged
     """
 
-    def __init__(self, data_directory: str):
+    def __init__(
+        self,
+        data_directory: str,
+        profile_queries: bool = False,
+        cached_tables: Iterable[str] = ("stop_times",),
+    ):
         """
         Specifies the file path to the directory of the csv data files.
 
-        It also initializes a stop_times attribute to store the large
-        "stop_times" csv file in memory.
+        By default only the large "stop_times" csv file is kept in memory.
 
         :param data_directory: the file path to the directory of the csv files
+        :param profile_queries: whether every query is profiled and its plan
+            logged at the debug level
+        :param cached_tables: the names of the tables kept in memory
         """
         self._data_directory = data_directory
-        self._stop_times = None
+        self._cached_tables = frozenset(cached_tables)
+        self._tables: dict[str, pd.DataFrame] = {}
+        # one lock for each cached table, so that loading one table does not
+        # hold up queries of the others
+        self._table_locks = {
+            table_name: threading.Lock() for table_name in self._cached_tables
+        }
+        self.profile_queries = profile_queries
+
+    def preload(self) -> None:
+        """
+        Reads the cached tables that have not been read yet.
+        """
+        for table_name in sorted(self._cached_tables):
+            self._load_table(table_name)
 
     def get(self, query: Query) -> pd.DataFrame:
-        result = self._get_table(query.table_name)
+        if self.profile_queries:
+            result, profile = self.get_with_profile(query)
+            logger.debug(
+                "query plan\n%s",
+                profile,
+                extra={"query_plan": profile.to_dict()},
+            )
+            return result
+
+        with metrics.timer("database_query_seconds", table=query.table_name):
+            result = self._get_table(query.table_name)
+
+            for operation, args in query.operations:
+                result = self._process_operation(operation, result, args)
+            return result
+
+    def get_with_profile(
+        self, query: Query
+    ) -> tuple[pd.DataFrame, QueryProfile]:
+        """
+        Retrieves the table that satisfies the query, and profiles each step
+        of the query.
+        :param query: the query
+        :return: the table and the profile of the query
+        """
+        profile = QueryProfile(query.table_name)
+
+        start = time.perf_counter()
+        result, source = self._load_table(query.table_name)
+        profile.operations.append(
+            OperationProfile(
+                "SCAN",
+                query.table_name,
+                source,
+                time.perf_counter() - start,
+                len(result),
+                len(result),
+                _memory_usage(result),
+            )
+        )
 
         for operation, args in query.operations:
-            result = self._process_operation(operation, result, args)
-        return result
+            input_rows = len(result)
+            source = "memory"
+            start = time.perf_counter()
+            if operation == QueryOperation.JOIN:
+                # the joined table is loaded here to know where it came from
+                table_name, join_column = args
+                join_table, source = self._load_table(table_name)
+                result = _merge(result, join_table, join_column)
+            else:
+                result = self._process_operation(operation, result, args)
+            profile.operations.append(
+                OperationProfile(
+                    operation.name,
+                    _describe_arguments(operation, args),
+                    source,
+                    time.perf_counter() - start,
+                    input_rows,
+                    len(result),
+                    _memory_usage(result),
+                )
+            )
+
+        if metrics.registry.enabled:
+            metrics.histogram(
+                "database_query_seconds", table=query.table_name
+            ).observe(profile.elapsed)
+        return result, profile
 
     def _file_path(self, table_name) -> str:
         """
@@ -202,7 +432,7 @@ class CSVDatabase(Database):
             table_name, join_column = args
             join_table = self._get_table(table_name)
 
-            return pd.merge(table, join_table, on=join_column)
+            return _merge(table, join_table, join_column)
         elif operation == QueryOperation.WHERE:
             condition = args
             return table[condition]
@@ -216,13 +446,115 @@ class CSVDatabase(Database):
         :param table_name: the name of the table
         :return: the table
         """
-        if table_name == "stop_times":
-            if self._stop_times is None:
-                self._stop_times = pd.read_csv(self._file_path("stop_times"))
-            return self._stop_times
+        return self._load_table(table_name)[0]
+
+    def _load_table(self, table_name: str) -> tuple[pd.DataFrame, str]:
+        """
+        Retrieves the table with the given table name, and where it came
+        from.
+        :param table_name: the name of the table
+        :return: the table, and disk if it was read from its csv file or
+            cache if it was already in memory
+        """
+        if table_name not in self._cached_tables:
+            return self._read_table(table_name), "disk"
+
+        source = "cache"
+        table = self._tables.get(table_name)
+        if table is None:
+            # the first thread to get here reads the table, and the others
+            # wait for it and use its table
+            with self._table_locks[table_name]:
+                table = self._tables.get(table_name)
+                if table is None:
+                    table = self._read_table(table_name)
+                    self._tables[table_name] = table
+                    source = "disk"
+        return table.copy(deep=False), source
+
+    @profiling.profiled("database_load")
+    def _read_table(self, table_name: str) -> pd.DataFrame:
+        """
+        Reads the table with the given table name from its csv file.
+        :param table_name: the name of the table
+        :return: the table
+        """
+        # pandas is imported on the first read, so that importing the
+        # database does not slow down starting the application
+        import pandas as pd
+
+        metrics.count("database_table_reads_total", table=table_name)
         return pd.read_csv(self._file_path(table_name))
 
 
+# the shared database of each data directory, used by the whole process
+_shared_databases: dict[str, CSVDatabase] = {}
+_shared_databases_lock = threading.Lock()
+
+
+def get_shared_database(data_directory: str = DATA_DIRECTORY) -> CSVDatabase:
+    """
+    Returns the database of the given directory shared by the whole process.
+
+    The database keeps every table in memory once it has been read, so all
+    the sessions of the application, such as the pages of the Flet web
+    app, query one copy of the tables instead of each reading its own. As
+    the database is shared, the stop registry of its trips is shared too.
+    :param data_directory: the file path to the directory of the csv files
+    :return: the database
+    """
+    # the database reads from the resolved path, so it keeps reading from
+    # the directory of its key if the working directory changes
+    key = os.path.realpath(data_directory)
+    with _shared_databases_lock:
+        database = _shared_databases.get(key)
+        if database is None:
+            database = CSVDatabase(key, cached_tables=TABLE_NAMES)
+            _shared_databases[key] = database
+        return database
+
+
+def _merge(
+    table: pd.DataFrame | pd.Series, join_table: pd.DataFrame, column: str
+) -> pd.DataFrame:
+    """
+    Performs an inner join of the tables on the given column.
+    """
+    import pandas as pd
+
+    return pd.merge(table, join_table, on=column)
+
+
+def _describe_arguments(operation: QueryOperation, args) -> str:
+    """
+    Returns a description of the arguments of a query operation for its
+    profile.
+    :param operation: the operation
+    :param args: the arguments of the operation
+    :return: the description
+    """
+    if operation == QueryOperation.JOIN:
+        table_name, join_column = args
+        return f"{table_name} on {join_column}"
+    if operation == QueryOperation.ORDER_BY:
+        column, ascending = args
+        return f"{column} {'asc' if ascending else 'desc'}"
+    if operation == QueryOperation.WHERE:
+        return getattr(args, "__qualname__", repr(args))
+    return str(args)
+
+
+def _memory_usage(table: pd.DataFrame | pd.Series) -> int:
+    """
+    Returns the memory used by the table, not counting the contents of
+    python objects.
+    """
+    usage = table.memory_usage(index=True)
+    if table.ndim == 2:
+        return int(usage.sum())
+    return int(usage)
+
+
 class TransportDatabase(Protocol):
     """
     The database for the route information that can be queried.
@@ -2,13 +2,50 @@
 Module containing classes that query from the database.
 """
 
-from datetime import datetime, timedelta
+import logging
+import threading
+import weakref
+from datetime import timedelta
 
+from bus_trip_announcer import metrics, profiling
 from bus_trip_announcer.database.database import Database, Query
-from bus_trip_announcer.models import Trip, Stop
+from bus_trip_announcer.models import StopRegistry, Trip
 from bus_trip_announcer.stops_finder import NextStopsFinder
 from bus_trip_announcer.utils import Coordinates, SEQDirection
 
+logger = logging.getLogger(__name__)
+
+# the stop registry of each database, shared by everything in the process
+_stop_registries = weakref.WeakKeyDictionary()
+_stop_registries_lock = threading.Lock()
+
+
+def get_stop_registry(database: Database) -> StopRegistry:
+    """
+    Returns the stop registry for the given database.
+
+    The registry is loaded from the stops table the first time it is needed,
+    and then shared by all the trips created from the database.
+    :param database: the database
+    :return: the stop registry
+    """
+    with _stop_registries_lock:
+        stop_registry = _stop_registries.get(database)
+        if stop_registry is None:
+            stops = database.get(
+                Query("stops").select(
+                    ["stop_id", "stop_name", "stop_lat", "stop_lon"]
+                )
+            )
+            stop_registry = StopRegistry(
+                stops["stop_id"],
+                stops["stop_name"],
+                stops["stop_lat"].to_numpy(),
+                stops["stop_lon"].to_numpy(),
+            )
+            _stop_registries[database] = stop_registry
+        return stop_registry
+
 
 class DirectionFinder:
     """
@@ -22,6 +59,7 @@ class DirectionFinder:
         """
         self._database = database
 
+    @metrics.timed("direction_finder_seconds", method="get_headsigns")
     def get_headsigns(self, route_number: int) -> list[str]:
         """
         Returns the possible headsigns for the given route.
@@ -37,6 +75,7 @@ class DirectionFinder:
         )
         return list(self._database.get(query).unique())
 
+    @metrics.timed("direction_finder_seconds", method="get_direction")
     def get_direction(self, route_number: int, headsign: str) -> SEQDirection:
         """
         Returns the SEQDirection that matches the given route and headsign
@@ -69,6 +108,8 @@ class TripFinder:
         """
         self._database = database
 
+    @metrics.timed("trip_finder_seconds", method="get_trip")
+    @profiling.profiled("get_trip")
     def get_trip(
         self,
         route_number: int,
@@ -85,6 +126,8 @@ class TripFinder:
         :param time: the time
         :return: the Trip object
         """
+        import pandas as pd
+
         route_id = self._database.get(
             Query("routes")
             .where(lambda row: row["route_short_name"] == str(route_number))
@@ -101,17 +144,10 @@ class TripFinder:
             .select("trip_id")
         ).iloc[0]
 
-        # use this Trip object to find the two stops we are in between
+        # use this Trip object to find the next stop
         trip = self._create_trip(example_trip_id, route_number, direction)
-        _, next_stop = NextStopsFinder.get_in_between_stops(
-            trip.stops, coordinates
-        )
-
-        next_stop_id = self._database.get(
-            Query("stops")
-            .where(lambda row: row["stop_name"] == next_stop.name)
-            .select("stop_id")
-        ).iloc[0]
+        next_stops = NextStopsFinder(trip).get_next_stops(coordinates)
+        next_stop_id = trip.stop_ids[next_stops.start]
 
         # find the trip that arrives at the next stop with the earliest
         # arrival time after the current time
@@ -124,8 +160,8 @@ class TripFinder:
             .select("trip_id")
             .join("stop_times", "trip_id")
             .where(
-                lambda row: (row["stop_id"] == next_stop_id)
-                & (row["arrival_time"].astype("timedelta64") >= time)
+                lambda row: (row["stop_id"].astype(str) == next_stop_id)
+                & (pd.to_timedelta(row["arrival_time"]) >= time)
             )
             .order_by("arrival_time")
             .select("trip_id")
@@ -133,32 +169,58 @@ class TripFinder:
 
         return self._create_trip(trip_id, route_number, direction)
 
+    def get_trip_by_id(
+        self, trip_id: str, route_number: int, direction: SEQDirection
+    ) -> Trip:
+        """
+        Returns the Trip object for the trip with the given id.
+        :param trip_id: the trip id
+        :param route_number: the route number of the trip
+        :param direction: the direction of the trip
+        :return: the Trip object
+        """
+        return self._create_trip(trip_id, route_number, direction)
+
+    @metrics.timed("trip_finder_seconds", method="create_trip")
     def _create_trip(
         self, trip_id: str, route_number: int, direction: SEQDirection
     ) -> Trip:
         """
         Creates the Trip object for the given trip id.
+
+        The stops of the trip that are not in the stops table are left out
+        of the trip, and a warning is logged.
         :param trip_id: the trip id
         :param route_number: the route number of the trip
         :param direction: the direction of the trip
         :return: the Trip object
         """
+        import pandas as pd
+
         trip_data = self._database.get(
             Query("stop_times")
             .where(lambda row: row["trip_id"] == trip_id)
             .order_by("stop_sequence")
             .select(["stop_id", "arrival_time"])
-            .join("stops", "stop_id")
         )
 
-        stops = []
-        for _, stop_data in trip_data.iterrows():
-            name = stop_data["stop_name"]
-            latitude = stop_data["stop_lat"]
-            longitude = stop_data["stop_lon"]
-            time = datetime.strptime(stop_data["arrival_time"], "%H:%M:%S")
-            time = timedelta(
-                hours=time.hour, minutes=time.minute, seconds=time.second
+        # the trip only stores its times and references the shared stops
+        stop_registry = get_stop_registry(self._database)
+        stop_indices = stop_registry.indices_of(trip_data["stop_id"])
+        is_known_stop = stop_indices >= 0
+        if not is_known_stop.all():
+            unknown_stop_ids = trip_data["stop_id"][~is_known_stop]
+            logger.warning(
+                "Trip %s has stops that are not in the stops table: %s",
+                trip_id,
+                ", ".join(str(stop_id) for stop_id in unknown_stop_ids),
             )
-            stops.append(Stop(name, Coordinates(latitude, longitude), time))
-        return Trip(route_number, direction, stops)
+        times = pd.to_timedelta(trip_data["arrival_time"]).dt.total_seconds()
+        return Trip.from_registry(
+            route_number,
+            direction,
+            stop_registry,
+            stop_indices[is_known_stop],
+            times.to_numpy()[is_known_stop],
+            trip_id,
+        )
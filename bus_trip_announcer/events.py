@@ -0,0 +1,241 @@
+"""
+Contains the events the announcer publishes when the next stops change in a
+way a rider would notice, and a subscriber that debounces them.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from enum import Enum
+
+import numpy as np
+
+from bus_trip_announcer.models import Stop, StopsView
+
+
+class AnnouncementEventType(Enum):
+    """
+    The kinds of changes the announcer publishes.
+
+    NEXT_STOP_CHANGED: The next stop is a different stop.
+    STOP_PASSED: The bus has passed a stop.
+    ETA_MINUTE_CHANGED: The time until a next stop has crossed a minute.
+    """
+
+    NEXT_STOP_CHANGED = 1
+    STOP_PASSED = 2
+    ETA_MINUTE_CHANGED = 3
+
+
+class AnnouncementEvent:
+    """
+    A change in the next stops of a trip.
+
+    Attributes
+    ----------
+    type: AnnouncementEventType
+        the kind of change
+    stop: Stop | None
+        the stop the change is about, the next stop for NEXT_STOP_CHANGED and
+        ETA_MINUTE_CHANGED, or None if there are no next stops
+    stop_index: int
+        the index of the stop in the trip
+    """
+
+    __slots__ = ("type", "stop", "stop_index")
+
+    def __init__(
+        self, type: AnnouncementEventType, stop: Stop | None, stop_index: int
+    ):
+        """
+        Initializes the event with the given parameters.
+        :param type: the kind of change
+        :param stop: the stop the change is about
+        :param stop_index: the index of the stop in the trip
+        """
+        self.type = type
+        self.stop = stop
+        self.stop_index = stop_index
+
+    def to_dict(self) -> dict:
+        """
+        Returns the announcement of the event as a dictionary, as written
+        in the lines of JSON of the headless and replay outputs.
+        :return: the announcement
+        """
+        stop = self.stop
+        if stop is None or stop.time_until_stop is None:
+            seconds_until_stop = None
+        else:
+            seconds_until_stop = stop.time_until_stop.total_seconds()
+        return {
+            "event": self.type.name,
+            "stop_index": int(self.stop_index),
+            "stop": None if stop is None else stop.name,
+            "seconds_until_stop": seconds_until_stop,
+        }
+
+    def __repr__(self) -> str:
+        return f"AnnouncementEvent({self.type.name}, {self.stop})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AnnouncementEvent):
+            return False
+        return (
+            self.type == other.type
+            and self.stop == other.stop
+            and self.stop_index == other.stop_index
+        )
+
+
+def detect_changes(
+    previous_stops: StopsView | None, next_stops: StopsView
+) -> list[AnnouncementEvent]:
+    """
+    Returns the events for the change from the previous next stops to the
+    new next stops.
+    :param previous_stops: the previous next stops, or None if there were
+        none
+    :param next_stops: the new next stops
+    :return: the events, in the order they happened
+    """
+    next_stop = next_stops[0] if next_stops else None
+    if previous_stops is None or previous_stops.trip is not next_stops.trip:
+        return [
+            AnnouncementEvent(
+                AnnouncementEventType.NEXT_STOP_CHANGED,
+                next_stop,
+                next_stops.start,
+            )
+        ]
+
+    events = []
+    if next_stops.start != previous_stops.start:
+        # the stops between the previous and new next stop have been passed
+        for index in range(previous_stops.start, next_stops.start):
+            events.append(
+                AnnouncementEvent(
+                    AnnouncementEventType.STOP_PASSED,
+                    previous_stops[index - previous_stops.start],
+                    index,
+                )
+            )
+        events.append(
+            AnnouncementEvent(
+                AnnouncementEventType.NEXT_STOP_CHANGED,
+                next_stop,
+                next_stops.start,
+            )
+        )
+    elif next_stops:
+        previous_minutes = np.floor(previous_stops.times_until_stops / 60)
+        minutes = np.floor(next_stops.times_until_stops / 60)
+        if not np.array_equal(previous_minutes, minutes, equal_nan=True):
+            events.append(
+                AnnouncementEvent(
+                    AnnouncementEventType.ETA_MINUTE_CHANGED,
+                    next_stop,
+                    next_stops.start,
+                )
+            )
+    return events
+
+
+class DebouncedSubscriber:
+    """
+    A subscriber that delivers events to its callback at most once every
+    interval seconds.
+
+    Events that arrive within the interval are held back and coalesced.
+    Only the latest NEXT_STOP_CHANGED and ETA_MINUTE_CHANGED events are
+    kept, and STOP_PASSED is kept once per stop. The held back events are
+    delivered from a timer thread at the end of the interval.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[list[AnnouncementEvent]], None],
+        interval: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes the subscriber with the given parameters.
+        :param callback: the function the events are delivered to
+        :param interval: the minimum time in seconds between deliveries
+        :param clock: the clock that times the deliveries
+        """
+        self._callback = callback
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: dict[tuple, AnnouncementEvent] = {}
+        self._last_delivery = None
+        self._timer = None
+
+    def __call__(self, events: list[AnnouncementEvent]) -> None:
+        """
+        Receives the events from the announcer.
+        :param events: the events
+        """
+        with self._lock:
+            for event in events:
+                self._coalesce(event)
+            now = self._clock()
+            if (
+                self._last_delivery is None
+                or now - self._last_delivery >= self.interval
+            ):
+                deliver = True
+            else:
+                deliver = False
+                if self._timer is None:
+                    self._timer = threading.Timer(
+                        self._last_delivery + self.interval - now, self.flush
+                    )
+                    self._timer.daemon = True
+                    self._timer.start()
+        if deliver:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Delivers the held back events now.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            events = list(self._pending.values())
+            self._pending.clear()
+            if events:
+                self._last_delivery = self._clock()
+        if events:
+            self._callback(events)
+
+    def close(self) -> None:
+        """
+        Discards the held back events and stops the timer.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending.clear()
+
+    def _coalesce(self, event: AnnouncementEvent) -> None:
+        """
+        Adds the event to the held back events, replacing the event it
+        supersedes.
+        :param event: the event
+        """
+        if event.type == AnnouncementEventType.STOP_PASSED:
+            key = (event.type, event.stop_index)
+        else:
+            key = (event.type,)
+            # a new next stop makes the minute change of the old one stale
+            if event.type == AnnouncementEventType.NEXT_STOP_CHANGED:
+                self._pending.pop(
+                    (AnnouncementEventType.ETA_MINUTE_CHANGED,), None
+                )
+        self._pending.pop(key, None)
+        self._pending[key] = event
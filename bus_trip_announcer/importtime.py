@@ -0,0 +1,239 @@
+"""
+Reports the time taken to import the modules of the application, like
+python -X importtime but sorted by the slowest imports.
+
+Each module is imported in a new interpreter run with -X importtime, so
+nothing is already imported, and the report lists the total import time
+and the imports that took the longest including what they imported. A
+budget can be given to fail when an entry point becomes slow to start.
+
+Usage: python -m bus_trip_announcer.importtime [MODULE ...] [--top 15]
+    [--budget 1.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+
+# the modules imported by the entry points of the application
+ENTRY_POINTS = (
+    "bus_trip_announcer.main",
+    "bus_trip_announcer.replay",
+    "bus_trip_announcer.sessions",
+)
+
+# the modules that are slow to import and should only be imported when
+# they are used
+HEAVY_MODULES = ("flet", "pandas", "matplotlib")
+
+
+class ImportRecord:
+    """
+    The time taken to import a module.
+
+    Attributes
+    ----------
+    module: str
+        the name of the module
+    self_time: float
+        the time in seconds taken by the module itself
+    cumulative_time: float
+        the time in seconds taken by the module and what it imported
+    depth: int
+        how deeply nested the import was, 0 for a top level import
+    """
+
+    __slots__ = ("module", "self_time", "cumulative_time", "depth")
+
+    def __init__(
+        self, module: str, self_time: float, cumulative_time: float, depth: int
+    ):
+        self.module = module
+        self.self_time = self_time
+        self.cumulative_time = cumulative_time
+        self.depth = depth
+
+    def __repr__(self) -> str:
+        return (
+            f"ImportRecord({self.module!r}, {self.self_time}, "
+            f"{self.cumulative_time}, {self.depth})"
+        )
+
+
+class ImportReport:
+    """
+    The import times of a module and everything it imported.
+
+    Attributes
+    ----------
+    module: str
+        the module that was imported
+    records: list[ImportRecord]
+        the import time of each module imported, in the order they
+        finished importing
+    """
+
+    def __init__(self, module: str, records: list[ImportRecord]):
+        self.module = module
+        self.records = records
+
+    @property
+    def total_time(self) -> float:
+        """The time in seconds taken by the top level imports."""
+        return sum(
+            record.cumulative_time
+            for record in self.records
+            if record.depth == 0
+        )
+
+    @property
+    def modules(self) -> set[str]:
+        """The names of the modules that were imported."""
+        return {record.module for record in self.records}
+
+    def heavy_modules(self) -> list[str]:
+        """Returns the slow modules that were imported."""
+        return [module for module in HEAVY_MODULES if module in self.modules]
+
+    def slowest(self, top: int = 15) -> list[ImportRecord]:
+        """
+        Returns the imports that took the longest, including what they
+        imported.
+        :param top: the number of imports
+        :return: the imports, slowest first
+        """
+        return sorted(
+            self.records,
+            key=lambda record: record.cumulative_time,
+            reverse=True,
+        )[:top]
+
+    def format(self, top: int = 15) -> str:
+        """
+        Returns the report as text.
+        :param top: the number of the slowest imports listed
+        :return: the text
+        """
+        lines = [
+            f"{self.module}: {self.total_time * 1000:.1f} ms, "
+            f"{len(self.records)} modules",
+        ]
+        heavy = self.heavy_modules()
+        if heavy:
+            lines.append(f"  heavy modules imported: {', '.join(heavy)}")
+        lines.append(f"  {'cumulative':>10} {'self':>8}  module")
+        for record in self.slowest(top):
+            lines.append(
+                f"  {record.cumulative_time * 1000:8.1f}ms"
+                f" {record.self_time * 1000:6.1f}ms"
+                f"  {'  ' * record.depth}{record.module}"
+            )
+        return "\n".join(lines)
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """
+    Parses the output of python -X importtime.
+    :param output: what the interpreter wrote to stderr
+    :return: the import time of each module
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # the header of the table
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        records.append(
+            ImportRecord(
+                module,
+                int(fields[0]) / 1e6,
+                int(fields[1]) / 1e6,
+                max(depth, 0),
+            )
+        )
+    return records
+
+
+def measure(module: str, python: str = sys.executable) -> ImportReport:
+    """
+    Imports the module in a new interpreter and measures its import time.
+
+    The modules the interpreter imports when it starts are left out.
+    :param module: the name of the module
+    :param python: the interpreter to run
+    :return: the report of the import
+    """
+    startup_modules = {
+        record.module for record in _run_importtime("pass", python)
+    }
+    records = _run_importtime(f"import {module}", python)
+    return ImportReport(
+        module,
+        [record for record in records if record.module not in startup_modules],
+    )
+
+
+def _run_importtime(code: str, python: str) -> list[ImportRecord]:
+    """
+    Runs the code in a new interpreter with -X importtime.
+    :param code: the code
+    :param python: the interpreter to run
+    :return: the import time of each module imported
+    """
+    process = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        raise ImportFailedError(f"{code}: {process.stderr.strip()}")
+    return parse_importtime(process.stderr)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """
+    Reports the import times of the given modules, exiting with an error if
+    one is over the budget.
+    :param arguments: the command line arguments, by default sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description="Report the import times of the modules."
+    )
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--budget", type=float, default=None, help="seconds per module"
+    )
+    options = parser.parse_args(arguments)
+
+    over_budget = []
+    for module in options.modules:
+        report = measure(module)
+        print(report.format(options.top))
+        print()
+        if options.budget is not None and report.total_time > options.budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(
+            f"over the budget of {options.budget} s: {', '.join(over_budget)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+class ImportFailedError(Exception):
+    """
+    The module could not be imported.
+    """
+
+
+if __name__ == "__main__":
+    main()
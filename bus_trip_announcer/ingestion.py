@@ -0,0 +1,275 @@
+"""
+Contains the ingestion stage that queues GPS fixes in front of the
+announcers.
+
+Fixes arrive in bursts, so only the latest fix of each session is kept, each
+session is processed at most max_rate times a second, and submitting blocks
+when too many sessions are waiting to be processed.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Hashable
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.utils import Coordinates
+
+logger = logging.getLogger(__name__)
+
+
+def update_announcer(announcer: TripAnnouncer, coordinates: Coordinates):
+    """
+    Updates the next stops of the announcer for the given location.
+
+    This is the processing function for an ingestor whose sessions are
+    keyed by their announcer.
+    :param announcer: the announcer
+    :param coordinates: the location
+    """
+    announcer.trip_status.coordinates = coordinates
+    announcer.update_next_stops()
+
+
+class FixIngestor:
+    """
+    Queues the GPS fixes of the sessions and processes the latest fix of
+    each session.
+
+    Attributes
+    ----------
+    max_rate: float | None
+        the maximum number of fixes processed per second for each session,
+        or None for no limit
+    max_queued_sessions: int
+        the maximum number of sessions with a fix waiting to be processed
+    coalesced_fixes: int
+        the number of fixes replaced by a newer fix before being processed
+    rejected_fixes: int
+        the number of fixes that could not be queued
+    processed_fixes: int
+        the number of fixes processed
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Hashable, Coordinates], object],
+        max_rate: float | None = None,
+        max_queued_sessions: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes the ingestor with the given parameters.
+        :param process: the function that processes the fix of a session,
+            such as SessionManager.update_location
+        :param max_rate: the maximum number of fixes processed per second
+            for each session, or None for no limit
+        :param max_queued_sessions: the maximum number of sessions with a fix
+            waiting to be processed
+        :param clock: the clock that limits the rate
+        """
+        self._process = process
+        self.max_rate = max_rate
+        self.max_queued_sessions = max_queued_sessions
+        self._clock = clock
+        self._condition = threading.Condition()
+        # the latest unprocessed fix of each session
+        self._fixes: dict[Hashable, Coordinates] = {}
+        # the sessions whose fix can be processed now
+        self._ready: deque[Hashable] = deque()
+        # the sessions held back by the rate limit, by when they can go
+        self._delayed: list[tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._last_processed: dict[Hashable, float] = {}
+        # the number of fixes taken from the queue and not yet processed
+        self._processing = 0
+        self._worker = None
+        self._running = False
+        self.coalesced_fixes = 0
+        self.rejected_fixes = 0
+        self.processed_fixes = 0
+
+    def submit(
+        self,
+        session_id: Hashable,
+        coordinates: Coordinates,
+        block: bool = True,
+        timeout: float | None = None,
+    ) -> bool:
+        """
+        Queues the fix of a session.
+
+        If the session already has a fix waiting, it is replaced. Otherwise,
+        if max_queued_sessions sessions are waiting, the call blocks until
+        one is processed.
+        :param session_id: the id of the session
+        :param coordinates: the location of the fix
+        :param block: whether to wait for space in the queue
+        :param timeout: the maximum time in seconds to wait for space
+        :return: true if the fix was queued, false if the queue was full
+        """
+        with self._condition:
+            if session_id in self._fixes:
+                self._fixes[session_id] = coordinates
+                self.coalesced_fixes += 1
+                return True
+
+            if len(self._fixes) >= self.max_queued_sessions and not (
+                block
+                and self._condition.wait_for(
+                    lambda: len(self._fixes) < self.max_queued_sessions,
+                    timeout,
+                )
+            ):
+                self.rejected_fixes += 1
+                return False
+
+            self._fixes[session_id] = coordinates
+            self._ready.append(session_id)
+            self._condition.notify_all()
+            return True
+
+    def forget(self, session_id: Hashable) -> None:
+        """
+        Discards the waiting fix and the rate limit state of a session, for
+        when the session is closed.
+        :param session_id: the id of the session
+        """
+        with self._condition:
+            self._fixes.pop(session_id, None)
+            self._last_processed.pop(session_id, None)
+            self._condition.notify_all()
+
+    def process_pending(self, max_fixes: int | None = None) -> int:
+        """
+        Processes the fixes that are ready, on the calling thread.
+        :param max_fixes: the maximum number of fixes to process
+        :return: the number of fixes processed
+        """
+        number_processed = 0
+        while max_fixes is None or number_processed < max_fixes:
+            with self._condition:
+                fix = self._next_fix()
+            if fix is None:
+                break
+            self._process_fix(*fix)
+            number_processed += 1
+        return number_processed
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every waiting fix has been processed, by the worker
+        thread or by another thread calling process_pending.
+        :param timeout: the maximum time in seconds to wait
+        :return: true if the fixes were processed, false on a timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._fixes and not self._processing, timeout
+            )
+
+    def start(self) -> None:
+        """
+        Starts processing the fixes on a worker thread.
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._worker = threading.Thread(
+            target=self._run, name="fix-ingestor", daemon=True
+        )
+        self._worker.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops the worker thread. Waiting fixes are kept.
+        :param timeout: the maximum time in seconds to wait for the worker
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    @property
+    def number_waiting(self) -> int:
+        """The number of sessions with a fix waiting to be processed."""
+        return len(self._fixes)
+
+    def _run(self) -> None:
+        """
+        Processes the fixes until the ingestor is stopped.
+        """
+        while True:
+            with self._condition:
+                # the ingestor is checked before taking a fix, so that the
+                # fixes waiting when it is stopped are kept
+                fix = None
+                while self._running and (fix := self._next_fix()) is None:
+                    self._condition.wait(self._time_until_delayed())
+                if fix is None:
+                    return
+            self._process_fix(*fix)
+
+    def _next_fix(self) -> tuple[Hashable, Coordinates] | None:
+        """
+        Takes the next fix that can be processed. The lock must be held by
+        the caller, and the fix must then be passed to _process_fix.
+        :return: a tuple of the session id and its fix, or None if no fix
+            can be processed now
+        """
+        now = self._clock()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, session_id = heapq.heappop(self._delayed)
+            self._ready.append(session_id)
+
+        while self._ready:
+            session_id = self._ready.popleft()
+            if session_id not in self._fixes:
+                # the session was forgotten
+                continue
+            last_processed = self._last_processed.get(session_id)
+            if self.max_rate is not None and last_processed is not None:
+                earliest = last_processed + 1 / self.max_rate
+                if earliest > now:
+                    heapq.heappush(
+                        self._delayed,
+                        (earliest, next(self._sequence), session_id),
+                    )
+                    continue
+            self._last_processed[session_id] = now
+            coordinates = self._fixes.pop(session_id)
+            self._processing += 1
+            self._condition.notify_all()
+            return session_id, coordinates
+        return None
+
+    def _time_until_delayed(self) -> float | None:
+        """
+        Returns the time until the next session held back by the rate limit
+        can be processed. The lock must be held by the caller.
+        :return: the time in seconds, or None if no session is held back
+        """
+        if not self._delayed:
+            return None
+        return max(self._delayed[0][0] - self._clock(), 0)
+
+    def _process_fix(self, session_id: Hashable, coordinates: Coordinates):
+        """
+        Processes the fix of a session.
+        :param session_id: the id of the session
+        :param coordinates: the location of the fix
+        """
+        try:
+            self._process(session_id, coordinates)
+        except Exception:
+            logger.exception("Failed to process the fix of %r", session_id)
+        with self._condition:
+            self.processed_fixes += 1
+            self._processing -= 1
+            self._condition.notify_all()
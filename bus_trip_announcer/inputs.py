@@ -1,16 +1,20 @@
 from __future__ import annotations
 
 import functools
+import threading
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-
-import flet as ft
-from waiting import wait
+from typing import IO, TYPE_CHECKING
 
 from bus_trip_announcer.announcer import TripAnnouncer
 from bus_trip_announcer.database.finders import DirectionFinder, TripFinder
+from bus_trip_announcer.ingestion import FixIngestor, update_announcer
 from bus_trip_announcer.models import TripStatus
-from bus_trip_announcer.utils import Coordinates
+from bus_trip_announcer.traces import GPSFix, read_fix_stream
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+if TYPE_CHECKING:
+    import flet as ft
 
 
 class LocationInput:
@@ -55,6 +59,20 @@ class InputDevice(ABC):
         self._direction_finder = direction_finder
         self.announcer = announcer
         self.time = None
+        # when set, location updates are queued instead of processed
+        # straight away
+        self.fix_ingestor: FixIngestor | None = None
+
+    def _update_location(self, coordinates: Coordinates) -> None:
+        """
+        Updates the announcer for the new location, through the fix ingestor
+        if there is one.
+        :param coordinates: the new location
+        """
+        if self.fix_ingestor is not None:
+            self.fix_ingestor.submit(self.announcer, coordinates)
+        else:
+            update_announcer(self.announcer, coordinates)
 
     @abstractmethod
     def input_coordinates(self, update: bool = False) -> None:
@@ -74,13 +92,13 @@ class InputDevice(ABC):
 
 
 class CommandLineInputDevice(InputDevice):
-    def input_coordinates(self, keep_on: bool = False) -> None:
-        if keep_on:
-            raise TypeError("CommandLineInputDevice cannot have input kept on.")
-
+    def input_coordinates(self, update: bool = False) -> None:
         latitude = input("Input Latitude: ")
         longitude = input("Input Longitude: ")
         new_coordinates = Coordinates(float(latitude), float(longitude))
+        if update:
+            self._update_location(new_coordinates)
+            return
 
         current = self.announcer.trip_status
         self.announcer.trip_status = TripStatus(
@@ -138,16 +156,28 @@ class FletInputDevice(InputDevice):
         self._page = page
 
     @staticmethod
-    def _has_been_called(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            wrapper.has_been_called = True
-            return func(*args, **kwargs)
-        wrapper.has_been_called = False
-        return wrapper
+    def _sets_event(event: threading.Event):
+        """
+        Returns a decorator for event handlers that sets the given event once
+        the handler has run, waking up the code waiting for the input.
+        :param event: the event to set
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    event.set()
+            return wrapper
+        return decorator
 
     def input_route_number(self) -> None:
-        @self._has_been_called
+        import flet as ft
+
+        entered = threading.Event()
+
+        @self._sets_event(entered)
         def btn_clicked(_):
             self.announcer.trip_status.route_number = int(field.value)
             self._page.controls.pop(0)
@@ -162,11 +192,15 @@ class FletInputDevice(InputDevice):
                 ]
             )
         )
-        wait(lambda: btn_clicked.has_been_called)
+        entered.wait()
 
     def input_direction(self) -> None:
+        import flet as ft
+
+        selected = threading.Event()
+
         def btn_i_clicked(i):
-            @self._has_been_called
+            @self._sets_event(selected)
             def btn_clicked(_):
                 direction = self._direction_finder.get_direction(
                     self.announcer.trip_status.route_number, headsigns[i]
@@ -182,27 +216,30 @@ class FletInputDevice(InputDevice):
         prompt = ft.Text("Which Headsign?")
 
         headsign_buttons = []
-        button_functions = []
         for i, headsign in enumerate(headsigns):
             btn_clicked = btn_i_clicked(i)
-            button_functions.append(btn_clicked)
             headsign_buttons.append(
                 ft.FilledTonalButton(text=headsign, on_click=btn_clicked)
             )
 
         self._page.add(ft.Column(controls=[prompt, *headsign_buttons]))
 
-        wait(lambda: True in [btn.has_been_called for btn in button_functions])
+        selected.wait()
 
     def input_coordinates(self, update: bool = False) -> None:
-        @self._has_been_called
+        import flet as ft
+
+        entered = threading.Event()
+
+        @self._sets_event(entered)
         def btn_clicked(_):
-            self.announcer.trip_status.coordinates = Coordinates(
+            coordinates = Coordinates(
                 float(latitude.value), float(longitude.value)
             )
             if update:
-                self.announcer.update_next_stops()
-            if not update:
+                self._update_location(coordinates)
+            else:
+                self.announcer.trip_status.coordinates = coordinates
                 self._page.controls.pop(0)
 
         latitude = ft.TextField(width=150)
@@ -231,10 +268,14 @@ class FletInputDevice(InputDevice):
             )
         )
         if not update:
-            wait(lambda: btn_clicked.has_been_called)
+            entered.wait()
 
     def input_time(self) -> None:
-        @self._has_been_called
+        import flet as ft
+
+        entered = threading.Event()
+
+        @self._sets_event(entered)
         def btn_clicked(e):
             self.time = timedelta(
                 hours=int(hours.value), minutes=int(minutes.value)
@@ -255,10 +296,127 @@ class FletInputDevice(InputDevice):
                 ]
             )
         )
-        wait(lambda: btn_clicked.has_been_called)
+        entered.wait()
+
+
+class StreamInputDevice(InputDevice):
+    """
+    Reads the location of the bus from a live feed of GPS fixes.
+
+    The feed is a stream of NMEA sentences or line-delimited JSON fixes,
+    such as a file, a pipe or a socket opened with
+    traces.open_fix_source. It is parsed one line at a time as the lines
+    arrive, so the location is updated at the rate of the device. The route
+    number and the direction are not part of the feed and are given to the
+    device instead.
+
+    Attributes
+    ----------
+    fixes_read: int
+        the number of fixes read from the feed
+    """
+
+    def __init__(
+        self,
+        direction_finder: DirectionFinder,
+        announcer: TripAnnouncer,
+        stream: IO[str],
+        route_number: int | None = None,
+        direction: SEQDirection | None = None,
+    ):
+        """
+        Initializes the device with the given feed.
+        :param direction_finder: the finder of the directions of the routes
+        :param announcer: the announcer to update
+        :param stream: the feed of fixes
+        :param route_number: the route number of the bus
+        :param direction: the direction of the bus
+        """
+        super().__init__(direction_finder, announcer)
+        self._fixes = read_fix_stream(stream)
+        self._route_number = route_number
+        self._direction = direction
+        self._latest_fix: GPSFix | None = None
+        self._stopped = threading.Event()
+        self.fixes_read = 0
+
+    def _next_fix(self) -> GPSFix:
+        """
+        Reads the next fix, waiting for it to arrive.
+        :return: the fix
+        """
+        fix = next(self._fixes, None)
+        if fix is None:
+            raise EndOfFeedError
+        self.fixes_read += 1
+        self._latest_fix = fix
+        return fix
+
+    def input_coordinates(self, update: bool = False) -> None:
+        """
+        Reads the location of the bus from the feed.
+
+        Without update, the next fix becomes the location of the trip
+        status. With update, every fix updates the announcer as it arrives,
+        until the feed ends or stop is called.
+        :param update: whether to keep updating the announcer
+        """
+        if not update:
+            self.announcer.trip_status.coordinates = (
+                self._next_fix().coordinates
+            )
+            return
+
+        while not self._stopped.is_set():
+            try:
+                fix = self._next_fix()
+            except EndOfFeedError:
+                return
+            self._update_location(fix.coordinates)
+
+    def stop(self) -> None:
+        """
+        Stops updating the announcer after the fix being read.
+        """
+        self._stopped.set()
+
+    def input_time(self) -> None:
+        """
+        Specifies the current time as the time of the latest fix, or the
+        time of the computer if the fixes do not have one.
+        """
+        if self._latest_fix is not None and self._latest_fix.time is not None:
+            self.time = timedelta(seconds=self._latest_fix.time)
+        else:
+            now = datetime.now()
+            self.time = timedelta(
+                hours=now.hour, minutes=now.minute, seconds=now.second
+            )
+
+    def input_route_number(self) -> None:
+        if self._route_number is None:
+            raise NoRouteNumberError
+        self.announcer.trip_status.route_number = self._route_number
+
+    def input_direction(self) -> None:
+        if self._direction is None:
+            raise NoDirectionError
+        self.announcer.trip_status.direction = self._direction
 
 
 class NoRouteNumberError(Exception):
     """
     The Route number has not been specified yet.
     """
+
+
+class NoDirectionError(Exception):
+    """
+    The direction has not been specified.
+    """
+
+
+class EndOfFeedError(Exception):
+    """
+    The feed of fixes ended before a fix was read.
+    """
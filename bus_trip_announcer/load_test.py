@@ -0,0 +1,458 @@
+"""
+Contains the load and soak test of the announcer stack with many riders
+updating their location at once.
+
+Each simulated rider rides a trip of a network, such as one made by the
+synthetic generator, and sends GPS fixes along the trip at a fixed rate
+through a SessionManager. Over the test, the throughput, the latency
+percentiles of the location updates, the growth of the resident memory
+and the pauses of the garbage collector are sampled at regular intervals,
+so that leaks and saturation show up as trends.
+
+Usage: python -m bus_trip_announcer.load_test DATA_DIRECTORY --riders 1000
+    --fix-rate 1 --duration 3600 --output samples.ndjson
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import TripFinder
+from bus_trip_announcer.metrics import Histogram
+from bus_trip_announcer.models import Trip
+from bus_trip_announcer.sessions import SessionManager
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+# the standard deviation of the GPS noise in degrees, about 10 metres
+GPS_NOISE = 1e-4
+
+
+class Rider:
+    """
+    A simulated rider moving along a trip.
+
+    The rider moves along the straight lines between the stops of the trip
+    on its schedule, and wraps around to the start of the trip at its end.
+
+    Attributes
+    ----------
+    rider_id: int
+        the id of the rider
+    trip: Trip
+        the trip the rider is on
+    trip_time: float
+        how far into the trip the rider is, in seconds
+    """
+
+    __slots__ = ("rider_id", "trip", "trip_time", "_rng", "_times")
+
+    def __init__(
+        self, rider_id: int, trip: Trip, rng: np.random.Generator
+    ):
+        """
+        Initializes the rider at a random point of the trip.
+        :param rider_id: the id of the rider
+        :param trip: the trip the rider is on
+        :param rng: the random numbers of the rider's trajectory
+        """
+        self.rider_id = rider_id
+        self.trip = trip
+        self._rng = rng
+        self._times = trip.scheduled_times - trip.scheduled_times[0]
+        self.trip_time = float(rng.uniform(0, self._times[-1]))
+
+    def next_fix(self, trip_seconds: float) -> Coordinates:
+        """
+        Moves the rider along the trip and returns their new location.
+        :param trip_seconds: how far the rider moves, in seconds of the trip
+        :return: the location, with GPS noise
+        """
+        duration = self._times[-1]
+        self.trip_time = (
+            (self.trip_time + trip_seconds) % duration if duration else 0.0
+        )
+        noise = self._rng.normal(0, GPS_NOISE, 2)
+        return Coordinates(
+            float(
+                np.interp(self.trip_time, self._times, self.trip.latitudes)
+                + noise[0]
+            ),
+            float(
+                np.interp(self.trip_time, self._times, self.trip.longitudes)
+                + noise[1]
+            ),
+        )
+
+
+class GCMonitor:
+    """
+    Measures the pauses of the garbage collector through gc.callbacks.
+
+    Attributes
+    ----------
+    pauses: list[float]
+        the pauses in seconds since they were last drained
+    collections: int
+        the number of collections since they were last drained
+    """
+
+    def __init__(self):
+        """Initializes the monitor without installing it."""
+        self.pauses = []
+        self.collections = 0
+        self._start = None
+        self._lock = threading.Lock()
+
+    def _callback(self, phase: str, _: dict) -> None:
+        if phase == "start":
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            pause = time.perf_counter() - self._start
+            self._start = None
+            with self._lock:
+                self.pauses.append(pause)
+                self.collections += 1
+
+    def install(self) -> None:
+        """Starts measuring the pauses."""
+        gc.callbacks.append(self._callback)
+
+    def uninstall(self) -> None:
+        """Stops measuring the pauses."""
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    def drain(self) -> tuple[list[float], int]:
+        """
+        Returns the pauses and the number of collections since the last
+        drain, and forgets them.
+        """
+        with self._lock:
+            pauses, self.pauses = self.pauses, []
+            collections, self.collections = self.collections, 0
+        return pauses, collections
+
+
+def current_rss() -> int:
+    """
+    Returns the resident memory of the process in bytes.
+
+    On systems without /proc, the peak resident memory is returned.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoadTest:
+    """
+    Drives the location updates of many riders through a session manager.
+
+    The riders are split between worker threads. Every 1 / fix_rate
+    seconds, each worker sends a fix for each of its riders. A worker that
+    cannot keep up starts its next round straight away, so saturation shows
+    as a fix rate below the target and a growing lag.
+
+    Attributes
+    ----------
+    riders: list[Rider]
+        the simulated riders
+    fix_rate: float
+        the number of fixes per second sent by each rider
+    speedup: float
+        how many seconds of the trip a rider moves per real second
+    workers: int
+        the number of worker threads
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        riders: list[Rider],
+        fix_rate: float = 1.0,
+        speedup: float = 30.0,
+        workers: int = 4,
+    ):
+        """
+        Initializes the test and opens a session for each rider.
+        :param session_manager: the session manager under test
+        :param riders: the simulated riders
+        :param fix_rate: the number of fixes per second of each rider
+        :param speedup: how many seconds of the trip a rider moves per
+            real second
+        :param workers: the number of worker threads
+        """
+        self._session_manager = session_manager
+        self.riders = riders
+        self.fix_rate = fix_rate
+        self.speedup = speedup
+        self.workers = workers
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._window_latencies = Histogram("update_seconds", {})
+        self._total_latencies = Histogram("update_seconds", {})
+        self._window_announcements = 0
+        self._max_lag = 0.0
+
+        for rider in riders:
+            announcer = session_manager.open_session(
+                rider.rider_id, rider.trip
+            )
+            announcer.subscribe(self._count_announcements)
+
+    def _count_announcements(self, events: list) -> None:
+        with self._lock:
+            self._window_announcements += len(events)
+
+    def run(
+        self,
+        duration: float,
+        sample_interval: float = 10.0,
+        on_sample: Callable[[dict], None] = lambda _: None,
+    ) -> dict:
+        """
+        Runs the test for the given time.
+        :param duration: the length of the test in seconds
+        :param sample_interval: the time in seconds between samples
+        :param on_sample: called with each sample as it is taken
+        :return: the summary of the test
+        """
+        gc_monitor = GCMonitor()
+        gc_monitor.install()
+        self._stopped.clear()
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(self.riders[worker :: self.workers],),
+                daemon=True,
+            )
+            for worker in range(self.workers)
+        ]
+
+        start = time.perf_counter()
+        start_rss = current_rss()
+        rss_growth = 0
+        gc_pauses = 0
+        gc_pause_total = 0.0
+        gc_pause_max = 0.0
+        for thread in threads:
+            thread.start()
+        try:
+            previous = start
+            while not self._stopped.wait(
+                min(sample_interval, max(start + duration - previous, 0))
+            ):
+                now = time.perf_counter()
+                sample = self._sample(now - start, now - previous, gc_monitor)
+                rss_growth = sample["rss_bytes"] - start_rss
+                sample["rss_growth_bytes"] = rss_growth
+                gc_pauses += sample["gc_collections"]
+                gc_pause_total += sample["gc_pause_total_s"]
+                gc_pause_max = max(gc_pause_max, sample["gc_pause_max_s"])
+                on_sample(sample)
+                previous = now
+                if now - start >= duration:
+                    break
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+            gc_monitor.uninstall()
+
+        elapsed = time.perf_counter() - start
+        total_fixes = self._total_latencies.count
+        return {
+            "riders": len(self.riders),
+            "target_fixes_per_second": len(self.riders) * self.fix_rate,
+            "fixes": total_fixes,
+            "fixes_per_second": total_fixes / elapsed if elapsed else 0.0,
+            "elapsed_s": elapsed,
+            "latency": self._total_latencies.snapshot(),
+            "rss_growth_bytes": rss_growth,
+            "gc_pauses": gc_pauses,
+            "gc_pause_total_s": gc_pause_total,
+            "gc_pause_max_s": gc_pause_max,
+        }
+
+    def stop(self) -> None:
+        """Stops the test early."""
+        self._stopped.set()
+
+    def _work(self, riders: list[Rider]) -> None:
+        """
+        Sends the fixes of the given riders until the test stops.
+        """
+        interval = 1 / self.fix_rate
+        trip_seconds = interval * self.speedup
+        next_round = time.perf_counter()
+        while not self._stopped.is_set():
+            lag = time.perf_counter() - next_round
+            for rider in riders:
+                coordinates = rider.next_fix(trip_seconds)
+                start = time.perf_counter()
+                self._session_manager.update_location(
+                    rider.rider_id, coordinates
+                )
+                latency = time.perf_counter() - start
+                self._window_latencies.observe(latency)
+                self._total_latencies.observe(latency)
+            with self._lock:
+                self._max_lag = max(self._max_lag, lag)
+
+            next_round += interval
+            delay = next_round - time.perf_counter()
+            if delay > 0:
+                self._stopped.wait(delay)
+
+    def _sample(
+        self, elapsed: float, window: float, gc_monitor: GCMonitor
+    ) -> dict:
+        """
+        Returns the measurements of the window since the last sample and
+        starts a new window.
+        """
+        with self._lock:
+            announcements = self._window_announcements
+            self._window_announcements = 0
+            max_lag, self._max_lag = self._max_lag, 0.0
+        latencies = self._window_latencies.snapshot_and_reset()
+        fixes = latencies["count"]
+        pauses, collections = gc_monitor.drain()
+        return {
+            "elapsed_s": elapsed,
+            "fixes": fixes,
+            "fixes_per_second": fixes / window if window else 0.0,
+            "announcements": announcements,
+            "latency": latencies,
+            "max_lag_s": max_lag,
+            "rss_bytes": current_rss(),
+            "gc_collections": collections,
+            "gc_pause_total_s": sum(pauses),
+            "gc_pause_max_s": max(pauses, default=0.0),
+        }
+
+
+def create_riders(
+    data_directory: str,
+    number_of_riders: int,
+    number_of_trips: int | None = None,
+    seed: int = 0,
+) -> list[Rider]:
+    """
+    Creates riders on random trips of the network in the directory.
+    :param data_directory: the directory of the tables of the network
+    :param number_of_riders: the number of riders
+    :param number_of_trips: the number of different trips the riders are
+        on, by default one for every ten riders
+    :param seed: the seed of the random numbers
+    :return: the riders
+    """
+    if number_of_trips is None:
+        number_of_trips = number_of_riders // 10 + 1
+    rng = np.random.default_rng(seed)
+    database = CSVDatabase(data_directory)
+    finder = TripFinder(database)
+
+    trips_table = pd.read_csv(os.path.join(data_directory, "trips.csv"))
+    routes = pd.read_csv(
+        os.path.join(data_directory, "routes.csv"),
+        dtype={"route_short_name": str},
+    ).set_index("route_id")["route_short_name"]
+    chosen = rng.choice(
+        len(trips_table),
+        min(number_of_trips, len(trips_table)),
+        replace=False,
+    )
+    trips = []
+    for index in chosen:
+        row = trips_table.iloc[index]
+        trip = finder.get_trip_by_id(
+            row["trip_id"],
+            routes[row["route_id"]],
+            SEQDirection(int(row["direction_id"])),
+        )
+        if len(trip) >= 2:
+            trips.append(trip)
+    if not trips:
+        raise ValueError(
+            f"No trip with at least two stops was found in {data_directory}"
+        )
+
+    return [
+        Rider(rider_id, trips[rider_id % len(trips)], rng)
+        for rider_id in range(number_of_riders)
+    ]
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """
+    Runs a load test from the command line, writing each sample as a line
+    of JSON and the summary to stderr.
+    :param arguments: the command line arguments, by default sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description="Load test the announcer with many riders."
+    )
+    parser.add_argument("data", help="the directory of the network tables")
+    parser.add_argument("--riders", type=int, default=1000)
+    parser.add_argument("--trips", type=int, default=None)
+    parser.add_argument(
+        "--fix-rate", type=float, default=1.0, help="fixes/s of each rider"
+    )
+    parser.add_argument("--speedup", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--sample-interval", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="NDJSON samples file")
+    options = parser.parse_args(arguments)
+
+    riders = create_riders(
+        options.data, options.riders, options.trips, options.seed
+    )
+    test = LoadTest(
+        SessionManager(idle_timeout=options.duration + 3600),
+        riders,
+        options.fix_rate,
+        options.speedup,
+        options.workers,
+    )
+    output = (
+        sys.stdout
+        if options.output == "-"
+        else open(options.output, "w", encoding="utf-8")
+    )
+
+    def write_sample(sample: dict) -> None:
+        output.write(json.dumps(sample) + "\n")
+        output.flush()
+
+    try:
+        summary = test.run(
+            options.duration, options.sample_interval, write_sample
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,261 @@
 """
-The starting point for the commandline version of the Bus Trip Announcer
-Application
+The starting points of the Bus Trip Announcer Application.
+
+There is an entry point for each way of running the application, and each
+only imports what it uses, so the command line and headless versions start
+without loading Flet:
+
+gui: the Flet application (the default)
+cli: asks for the trip and the locations on the command line
+headless: reads the location from a feed of GPS fixes and writes the
+    announcements as lines of JSON
+
+Flet and pandas are only imported when they are first used. The import
+time of each entry point is reported by bus_trip_announcer.importtime.
+
+Each entry point queues the locations of the bus in a FixIngestor, so the
+next stops are updated on its worker thread at most FIX_RATE times a
+second, with the locations that arrive in between coalesced.
+
+Usage: python -m bus_trip_announcer.main [gui | cli | headless ...]
 """
-import flet as ft
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import IO, TYPE_CHECKING
 
 from bus_trip_announcer.announcer import TripAnnouncer
-from bus_trip_announcer.inputs import TripInput, FletInputDevice, LocationInput
+from bus_trip_announcer.database.database import (
+    CSVDatabase,
+    get_shared_database,
+)
+from bus_trip_announcer.database.finders import DirectionFinder, TripFinder
+from bus_trip_announcer.events import AnnouncementEvent
+from bus_trip_announcer.ingestion import FixIngestor, update_announcer
+from bus_trip_announcer.inputs import (
+    CommandLineInputDevice,
+    FletInputDevice,
+    InputDevice,
+    LocationInput,
+    StreamInputDevice,
+    TripInput,
+)
 from bus_trip_announcer.models import TripStatus
 from bus_trip_announcer.stops_finder import NextStopsFinder
-from database.database import CSVDatabase
-from database.finders import DirectionFinder, TripFinder
-from bus_trip_announcer.viewers import CommandLineTripViewer, FletTripViewer
-
-
-#
-# def main() -> None:
-#     """
-#     Initialize the application and run the input-output loop in the command
-#     line.
-#     """
-#     database = CSVDatabase("useful_data")
-#     trip_finder = TripFinder(database)
-#     direction_finder = DirectionFinder(database)
-#     trip_specifier = CommandLineTripSpecifier(direction_finder, trip_finder)
-#     trip_specifier.specify_all()
-#     announcer = trip_specifier.create_announcer()
-#
-#     updator = CommandlineLocationSpecifier(
-#         announcer, trip_specifier.trip_status
-#     )
-#     display = CommandlineDisplay(announcer)
-#
-#     while True:
-#         display.show_next_stops()
-#         updator.update_trip_announcer()
+from bus_trip_announcer.traces import open_fix_source
+from bus_trip_announcer.utils import SEQDirection
+from bus_trip_announcer.viewers import (
+    CommandLineTripViewer,
+    FletTripViewer,
+    RenderScheduler,
+)
 
+if TYPE_CHECKING:
+    import flet as ft
 
-def main2(page: ft.Page) -> None:
-    """
-    Initialize the GUI application
-    """
-    page.window_width = 500
-    page.window_height = 700
+DATA_DIRECTORY = "useful_data"
 
-    database = CSVDatabase("useful_data")
-    trip_finder = TripFinder(database)
-    direction_finder = DirectionFinder(database)
+# the maximum number of locations processed per second
+FIX_RATE = 2.0
 
-    trip_status = TripStatus()
-    announcer = TripAnnouncer(trip_status)
-    input_device = FletInputDevice(direction_finder, announcer, page)
-    trip_input = TripInput(input_device)
 
+def _start_trip(input_device: InputDevice, trip_finder: TripFinder) -> None:
+    """
+    Inputs the trip from the device and sets up its announcer with the next
+    stops of the trip.
+    :param input_device: the device the trip is input from
+    :param trip_finder: the finder of the trip
+    """
+    trip_input = TripInput(input_device)
     trip_input.input_all()
-    time = trip_input.get_time()
+    trip_status = trip_input.get_trip_status()
     trip = trip_finder.get_trip(
         trip_status.route_number,
         trip_status.direction,
         trip_status.coordinates,
-        time,
+        trip_input.get_time(),
     )
 
+    announcer = input_device.announcer
     announcer.next_stops_finder = NextStopsFinder(trip)
     announcer.update_next_stops()
 
+
+def _start_fix_ingestor(
+    input_device: InputDevice, max_rate: float | None = FIX_RATE
+) -> FixIngestor:
+    """
+    Starts an ingestor that updates the announcer of the device for the
+    locations input from it.
+    :param input_device: the device the locations are input from
+    :param max_rate: the maximum number of locations processed per second
+    :return: the ingestor, which must be stopped when the device is done
+    """
+    fix_ingestor = FixIngestor(update_announcer, max_rate)
+    fix_ingestor.start()
+    input_device.fix_ingestor = fix_ingestor
+    return fix_ingestor
+
+
+def main2(page: ft.Page) -> None:
+    """
+    Initialize the GUI application
+    """
+    page.window_width = 500
+    page.window_height = 700
+
+    # every page of the web app shares the tables of one database
+    database = get_shared_database(DATA_DIRECTORY)
+    trip_finder = TripFinder(database)
+    direction_finder = DirectionFinder(database)
+
+    announcer = TripAnnouncer(TripStatus())
+    input_device = FletInputDevice(direction_finder, announcer, page)
+    _start_trip(input_device, trip_finder)
+
+    fix_ingestor = _start_fix_ingestor(input_device)
+
     viewer = FletTripViewer(announcer, page)
+    scheduler = RenderScheduler(viewer, announcer)
+
+    def close(_=None) -> None:
+        scheduler.stop()
+        fix_ingestor.stop()
+
+    page.on_disconnect = close
+    page.on_close = close
+
     location_input = LocationInput(input_device)
     location_input.update_coordinates()
 
-    while True:
-        viewer.show_next_stops()
+    scheduler.run()
 
 
-if __name__ == "__main__":
+def run_gui() -> None:
+    """
+    Runs the GUI application.
+    """
+    import flet as ft
+
     ft.app(target=main2)
+
+
+def run_cli(data_directory: str = DATA_DIRECTORY) -> None:
+    """
+    Initialize the application and run the input-output loop in the command
+    line.
+    :param data_directory: the directory of the csv files
+    """
+    database = CSVDatabase(data_directory)
+    trip_finder = TripFinder(database)
+    direction_finder = DirectionFinder(database)
+
+    announcer = TripAnnouncer(TripStatus())
+    input_device = CommandLineInputDevice(direction_finder, announcer)
+    _start_trip(input_device, trip_finder)
+
+    fix_ingestor = _start_fix_ingestor(input_device)
+
+    viewer = CommandLineTripViewer(announcer)
+    location_input = LocationInput(input_device)
+    try:
+        while True:
+            viewer.show_next_stops()
+            location_input.update_coordinates()
+            # the next stops are shown once the location is processed
+            fix_ingestor.drain()
+    finally:
+        fix_ingestor.stop()
+
+
+def run_headless(
+    feed: IO[str],
+    route_number: int,
+    direction: SEQDirection,
+    output: IO[str],
+    data_directory: str = DATA_DIRECTORY,
+    max_rate: float | None = FIX_RATE,
+) -> int:
+    """
+    Announces the next stops of the bus for a feed of GPS fixes, writing
+    each announcement as a line of JSON, until the feed ends.
+
+    The first fix of the feed is used to find the trip. The fixes that
+    arrive faster than max_rate are coalesced, so the stops passed in
+    between are announced together.
+    :param feed: the feed of fixes
+    :param route_number: the route number of the bus
+    :param direction: the direction of the bus
+    :param output: the stream the announcements are written to
+    :param data_directory: the directory of the csv files
+    :param max_rate: the maximum number of fixes processed per second
+    :return: the number of fixes read
+    """
+    database = CSVDatabase(data_directory)
+    trip_finder = TripFinder(database)
+    direction_finder = DirectionFinder(database)
+
+    announcer = TripAnnouncer(TripStatus())
+    input_device = StreamInputDevice(
+        direction_finder, announcer, feed, route_number, direction
+    )
+
+    def write_announcements(events: list[AnnouncementEvent]) -> None:
+        for event in events:
+            output.write(json.dumps(event.to_dict()) + "\n")
+        output.flush()
+
+    announcer.subscribe(write_announcements)
+    _start_trip(input_device, trip_finder)
+    fix_ingestor = _start_fix_ingestor(input_device, max_rate)
+    try:
+        LocationInput(input_device).update_coordinates()
+        # the last fixes of the feed are still announced
+        fix_ingestor.drain()
+    finally:
+        fix_ingestor.stop()
+    return input_device.fixes_read
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """
+    Runs the entry point chosen on the command line.
+    :param arguments: the command line arguments, by default sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Bus Trip Announcer")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("gui", help="run the Flet application")
+    cli = commands.add_parser("cli", help="run on the command line")
+    cli.add_argument("--data", default=DATA_DIRECTORY)
+    headless = commands.add_parser(
+        "headless", help="announce the stops for a feed of GPS fixes"
+    )
+    headless.add_argument(
+        "source",
+        help="the feed: a file, - for stdin, unix:PATH or tcp:HOST:PORT",
+    )
+    headless.add_argument("--route", type=int, required=True)
+    headless.add_argument("--direction", type=int, choices=[0, 1], default=0)
+    headless.add_argument("--data", default=DATA_DIRECTORY)
+    options = parser.parse_args(arguments)
+
+    if options.command == "cli":
+        run_cli(options.data)
+    elif options.command == "headless":
+        with open_fix_source(options.source) as feed:
+            run_headless(
+                feed,
+                options.route,
+                SEQDirection(options.direction),
+                sys.stdout,
+                options.data,
+            )
+    else:
+        run_gui()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Contains the metrics of the announcer: counters, and latency histograms
+that estimate percentiles as the latencies stream in.
+
+Metrics are disabled by default, and the timers and counters around the
+database queries, finders and announcer then only check a flag. They are
+enabled with enable(), or by setting the environment variable
+BUS_TRIP_ANNOUNCER_METRICS to 1. The metrics can be exported as Prometheus
+text or as a JSON snapshot.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+
+ENVIRONMENT_VARIABLE = "BUS_TRIP_ANNOUNCER_METRICS"
+
+# the percentiles reported for each histogram
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Counter:
+    """
+    A count of things that have happened.
+
+    Attributes
+    ----------
+    name: str
+        the name of the counter
+    labels: dict[str, str]
+        the labels that tell the counter apart from others with its name
+    value: float
+        the count
+    """
+
+    __slots__ = ("name", "labels", "value", "_lock")
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        """
+        Initializes the counter at zero.
+        :param name: the name of the counter
+        :param labels: the labels of the counter
+        """
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Adds the given amount to the count.
+        :param amount: the amount
+        """
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        """Sets the count back to zero."""
+        with self._lock:
+            self.value = 0
+
+    def snapshot(self) -> dict:
+        """Returns the counter as a dictionary."""
+        return {"value": self.value}
+
+
+class Histogram:
+    """
+    The distribution of a latency, or any other positive value.
+
+    Values are counted in buckets whose bounds grow by a fixed ratio, so
+    memory does not grow with the number of values and a percentile is
+    estimated within the width of a bucket, about 19% of its value.
+
+    Attributes
+    ----------
+    name: str
+        the name of the histogram
+    labels: dict[str, str]
+        the labels that tell the histogram apart from others with its name
+    count: int
+        the number of values observed
+    sum: float
+        the sum of the values observed
+    min: float
+        the smallest value observed
+    max: float
+        the largest value observed
+    """
+
+    NUMBER_OF_BUCKETS = 120
+    # the upper bounds of the buckets, from a microsecond growing by a
+    # quarter of a doubling, the last bucket has no upper bound
+    BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(NUMBER_OF_BUCKETS - 1)]
+
+    __slots__ = (
+        "name",
+        "labels",
+        "count",
+        "sum",
+        "min",
+        "max",
+        "_buckets",
+        "_lock",
+    )
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        """
+        Initializes the histogram with no values.
+        :param name: the name of the histogram
+        :param labels: the labels of the histogram
+        """
+        self.name = name
+        self.labels = labels
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, value: float) -> None:
+        """
+        Adds a value to the distribution.
+        :param value: the value
+        """
+        index = bisect.bisect_left(self.BOUNDS, value)
+        with self._lock:
+            self._buckets[index] += 1
+            self.count += 1
+            self.sum += value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns an estimate of the given quantile of the values.
+        :param q: the quantile, between 0 and 1
+        :return: the estimate, or nan if there are no values
+        """
+        with self._lock:
+            if self.count == 0:
+                return math.nan
+            rank = q * self.count
+            cumulative = 0
+            for index, bucket_count in enumerate(self._buckets):
+                if bucket_count and cumulative + bucket_count >= rank:
+                    break
+                cumulative += bucket_count
+
+            # interpolate geometrically within the bucket
+            lower = self.BOUNDS[index - 1] if index > 0 else self.min
+            upper = (
+                self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+            )
+            lower = max(lower, self.min)
+            upper = min(upper, self.max)
+            fraction = (rank - cumulative) / bucket_count
+            if lower <= 0:
+                return lower + (upper - lower) * fraction
+            return lower * (upper / lower) ** fraction
+
+    def reset(self) -> None:
+        """Discards the values."""
+        with self._lock:
+            self._clear()
+
+    def snapshot_and_reset(self) -> dict:
+        """
+        Returns the summary of the histogram and discards its values.
+
+        The values are taken in one step, so a value observed while the
+        summary is made is kept for the next one instead of being lost.
+        :return: the summary, see snapshot
+        """
+        taken = Histogram(self.name, self.labels)
+        with self._lock:
+            taken._buckets = self._buckets
+            taken.count = self.count
+            taken.sum = self.sum
+            taken.min = self.min
+            taken.max = self.max
+            self._clear()
+        return taken.snapshot()
+
+    def snapshot(self) -> dict:
+        """Returns the summary of the histogram as a dictionary."""
+        if self.count == 0:
+            return {"count": 0, "sum": 0.0}
+        snapshot = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in QUANTILES:
+            snapshot[f"p{round(q * 100)}"] = self.quantile(q)
+        return snapshot
+
+    def _clear(self) -> None:
+        """Discards the values, the lock must be held."""
+        self._buckets = [0] * self.NUMBER_OF_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+
+class _Timer:
+    """
+    Times a block of code into a histogram.
+    """
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self) -> _Timer:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Registry:
+    """
+    The metrics of a process, by their name and labels.
+
+    Attributes
+    ----------
+    enabled: bool
+        whether the timers and counters record anything
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        Initializes the registry with no metrics.
+        :param enabled: whether the timers and counters record anything
+        """
+        self.enabled = enabled
+        self._metrics: dict[tuple, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        """
+        Returns the counter with the given name and labels, creating it
+        the first time.
+        :param name: the name of the counter
+        :param labels: the labels of the counter
+        :return: the counter
+        """
+        return self._get(Counter, name, labels)
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """
+        Returns the histogram with the given name and labels, creating it
+        the first time.
+        :param name: the name of the histogram
+        :param labels: the labels of the histogram
+        :return: the histogram
+        """
+        return self._get(Histogram, name, labels)
+
+    def count(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter, if the registry is enabled.
+        :param name: the name of the counter
+        :param amount: the amount to add
+        :param labels: the labels of the counter
+        """
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def timer(self, name: str, **labels: str):
+        """
+        Returns a context manager that times its block into a histogram, if
+        the registry is enabled.
+        :param name: the name of the histogram
+        :param labels: the labels of the histogram
+        :return: the context manager
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """
+        Returns a decorator that times each call of a function into a
+        histogram, if the registry is enabled.
+        :param name: the name of the histogram
+        :param labels: the labels of the histogram
+        :return: the decorator
+        """
+
+        def decorator(func):
+            histogram = None
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                nonlocal histogram
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                if histogram is None:
+                    histogram = self.histogram(name, **labels)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        """
+        Sets every metric back to zero, keeping the metrics themselves so
+        that references to them stay valid.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the metrics as a dictionary that can be written as JSON.
+        :return: the counters and histograms by name, each a list of the
+            metrics with that name and their labels
+        """
+        snapshot = {"counters": {}, "histograms": {}}
+        for metric in self._sorted_metrics():
+            kind = "counters" if isinstance(metric, Counter) else "histograms"
+            snapshot[kind].setdefault(metric.name, []).append(
+                {"labels": metric.labels, **metric.snapshot()}
+            )
+        return snapshot
+
+    def to_json(self) -> str:
+        """Returns the snapshot of the metrics as JSON."""
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        Counters are exported as counters, and histograms as summaries of
+        their percentiles.
+        :return: the text
+        """
+        lines = []
+        previous_name = None
+        for metric in self._sorted_metrics():
+            is_counter = isinstance(metric, Counter)
+            if metric.name != previous_name:
+                kind = "counter" if is_counter else "summary"
+                lines.append(f"# TYPE {metric.name} {kind}")
+                previous_name = metric.name
+
+            if is_counter:
+                lines.append(
+                    f"{metric.name}{_labels(metric.labels)} {metric.value}"
+                )
+                continue
+            for q in QUANTILES:
+                labels = _labels({**metric.labels, "quantile": str(q)})
+                value = metric.quantile(q)
+                lines.append(f"{metric.name}{labels} {_number(value)}")
+            labels = _labels(metric.labels)
+            lines.append(f"{metric.name}_sum{labels} {_number(metric.sum)}")
+            lines.append(f"{metric.name}_count{labels} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def _get(self, kind: type, name: str, labels: dict[str, str]):
+        """
+        Returns the metric with the given name and labels, creating it the
+        first time.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = kind(name, labels)
+                    self._metrics[key] = metric
+        if not isinstance(metric, kind):
+            raise MetricTypeError(f"{name} is not a {kind.__name__}")
+        return metric
+
+    def _sorted_metrics(self) -> list[Counter | Histogram]:
+        """Returns the metrics sorted by name and labels."""
+        with self._lock:
+            return [self._metrics[key] for key in sorted(self._metrics)]
+
+
+def _labels(labels: dict[str, str]) -> str:
+    """Returns the labels in the Prometheus format."""
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{_escape(str(value))}"' for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the Prometheus format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    """Returns a number in the Prometheus format."""
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+# the metrics of the process
+registry = Registry(os.environ.get(ENVIRONMENT_VARIABLE) == "1")
+
+counter = registry.counter
+histogram = registry.histogram
+count = registry.count
+timer = registry.timer
+timed = registry.timed
+snapshot = registry.snapshot
+to_json = registry.to_json
+to_prometheus = registry.to_prometheus
+reset = registry.reset
+
+
+def enable() -> None:
+    """Starts recording the metrics of the process."""
+    registry.enabled = True
+
+
+def disable() -> None:
+    """Stops recording the metrics of the process."""
+    registry.enabled = False
+
+
+class MetricTypeError(Exception):
+    """
+    A metric was requested as a different kind of metric than it is.
+    """
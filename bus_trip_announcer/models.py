@@ -4,6 +4,10 @@ and trips.
 """
 
 import datetime
+import sys
+from collections.abc import Iterable, Sequence
+
+import numpy as np
 
 from bus_trip_announcer.utils import Coordinates, Direction, SEQDirection
 
@@ -23,6 +27,8 @@ class TripStatus:
         the current coordinates of the trip
     """
 
+    __slots__ = ("route_number", "direction", "coordinates")
+
     def __init__(
         self,
         route_number: int = 0,
@@ -53,6 +59,8 @@ class Stop:
     """
     A bus stop for a bus trip.
 
+    Stops are immutable and hashable.
+
     Attributes
     ----------
     name: str
@@ -63,6 +71,8 @@ class Stop:
         the time until the bus reaches the stop
     """
 
+    __slots__ = ("name", "coordinates", "time_until_stop")
+
     def __init__(
         self,
         name: str,
@@ -75,9 +85,18 @@ class Stop:
         :param coordinates: the location of the stop
         :param time_until_stop: the time until the bus reaches the stop
         """
-        self.name = name
-        self.coordinates = coordinates
-        self.time_until_stop = time_until_stop
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "coordinates", coordinates)
+        object.__setattr__(self, "time_until_stop", time_until_stop)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Stop objects are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Stop objects are immutable.")
+
+    def __reduce__(self):
+        return Stop, (self.name, self.coordinates, self.time_until_stop)
 
     # this method isn't used
     @classmethod
@@ -135,37 +154,286 @@ class Stop:
             and other.time_until_stop == self.time_until_stop
         )
 
+    def __hash__(self) -> int:
+        return hash((self.name, self.coordinates, self.time_until_stop))
+
+
+class StopRegistry:
+    """
+    The stops of the bus network, shared between the trips that pass them.
+
+    Trips reference the stops in the registry by their index, so the name
+    and location of a stop is only stored once however many trips pass it.
+
+    Attributes
+    ----------
+    stop_ids: tuple[str, ...]
+        the id of each stop
+    names: tuple[str, ...]
+        the name of each stop
+    latitudes: np.ndarray
+        the latitude of each stop
+    longitudes: np.ndarray
+        the longitude of each stop
+    """
+
+    __slots__ = ("stop_ids", "names", "latitudes", "longitudes", "_indices")
+
+    def __init__(
+        self,
+        stop_ids: Sequence,
+        names: Sequence[str],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+    ):
+        """
+        Initializes the registry with the given stops.
+        :param stop_ids: the id of each stop
+        :param names: the name of each stop
+        :param latitudes: the latitude of each stop
+        :param longitudes: the longitude of each stop
+        """
+        self.stop_ids = tuple(str(stop_id) for stop_id in stop_ids)
+        # interning lets trips and stops built from the registry share the
+        # same string objects for the names
+        self.names = tuple(sys.intern(str(name)) for name in names)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self._indices = {
+            stop_id: index for index, stop_id in enumerate(self.stop_ids)
+        }
+
+    def indices_of(self, stop_ids: Iterable) -> np.ndarray:
+        """
+        Returns the index in the registry of each of the given stop ids.
+        :param stop_ids: the stop ids
+        :return: the index of each stop, or -1 if the stop is not in the
+            registry
+        """
+        return np.fromiter(
+            (self._indices.get(str(stop_id), -1) for stop_id in stop_ids),
+            dtype=np.int32,
+        )
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
 
 class Trip:
     """
     A bus trip with its stops and the time it takes to reach them.
 
+    The trip references its stops in a StopRegistry and only stores the
+    scheduled time of each of its stops. The stops attribute is a view that
+    creates the Stop objects as they are accessed.
+
     Attributes
     ----------
     route_number: int
         the route number
     direction: Direction
         the direction of the route
-    stops: list[Stop]
+    stops: StopsView
         the stops of the route and the time it takes to reach them.
+    trip_id: str | None
+        the id of the trip in the transport database
+    stop_registry: StopRegistry
+        the registry the stops of the trip are in
+    stop_indices: np.ndarray
+        the index in the registry of each stop
+    cumulative_times: np.ndarray
+        the expected time of each stop in seconds, which is the scheduled
+        time plus any delay
+    scheduled_times: np.ndarray
+        the scheduled time of each stop in seconds
     """
 
+    __slots__ = (
+        "route_number",
+        "direction",
+        "trip_id",
+        "stop_registry",
+        "stop_indices",
+        "cumulative_times",
+        "_scheduled_times",
+    )
+
     def __init__(
         self,
         route_number: int,
         direction: Direction | SEQDirection,
-        stops: list[Stop],
+        stops: Sequence[Stop],
+        trip_id: str | None = None,
     ):
         """
         Initializes the trip with the given parameters.
         :param route_number: the route number
         :param direction: the direction of the trip
         :param stops: the stops of the trip
+        :param trip_id: the id of the trip in the transport database
         """
         self.route_number = route_number
         self.direction = direction
+        self.trip_id = trip_id
         self.stops = stops
 
+    @classmethod
+    def from_registry(
+        cls,
+        route_number: int,
+        direction: Direction | SEQDirection,
+        stop_registry: StopRegistry,
+        stop_indices: np.ndarray,
+        cumulative_times: np.ndarray,
+        trip_id: str | None = None,
+    ) -> "Trip":
+        """
+        Creates a trip whose stops are in the given registry.
+        :param route_number: the route number
+        :param direction: the direction of the trip
+        :param stop_registry: the registry the stops are in
+        :param stop_indices: the index in the registry of each stop
+        :param cumulative_times: the scheduled time of each stop in seconds
+        :param trip_id: the id of the trip in the transport database
+        :return: the trip
+        """
+        trip = cls.__new__(cls)
+        trip.route_number = route_number
+        trip.direction = direction
+        trip.trip_id = trip_id
+        trip._set_arrays(stop_registry, stop_indices, cumulative_times)
+        return trip
+
+    @classmethod
+    def from_arrays(
+        cls,
+        route_number: int,
+        direction: Direction | SEQDirection,
+        names: Sequence[str],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        cumulative_times: np.ndarray,
+        trip_id: str | None = None,
+    ) -> "Trip":
+        """
+        Creates a trip directly from the arrays of its stops.
+        :param route_number: the route number
+        :param direction: the direction of the trip
+        :param names: the name of each stop
+        :param latitudes: the latitude of each stop
+        :param longitudes: the longitude of each stop
+        :param cumulative_times: the scheduled time of each stop in seconds
+        :param trip_id: the id of the trip in the transport database
+        :return: the trip
+        """
+        stop_registry = StopRegistry(
+            range(len(names)), names, latitudes, longitudes
+        )
+        return cls.from_registry(
+            route_number,
+            direction,
+            stop_registry,
+            np.arange(len(names), dtype=np.int32),
+            cumulative_times,
+            trip_id,
+        )
+
+    @property
+    def stops(self) -> "StopsView":
+        """The stops of the trip."""
+        return StopsView(self, 0)
+
+    @stops.setter
+    def stops(self, stops: Sequence[Stop]) -> None:
+        """
+        Sets the stops of the trip.
+
+        The stops are put in a registry of their own.
+        :param stops: the stops of the trip
+        """
+        stop_registry = StopRegistry(
+            range(len(stops)),
+            [stop.name for stop in stops],
+            [stop.coordinates.latitude for stop in stops],
+            [stop.coordinates.longitude for stop in stops],
+        )
+        self._set_arrays(
+            stop_registry,
+            np.arange(len(stops), dtype=np.int32),
+            [
+                np.nan
+                if stop.time_until_stop is None
+                else stop.time_until_stop.total_seconds()
+                for stop in stops
+            ],
+        )
+
+    @property
+    def stop_ids(self) -> tuple[str, ...]:
+        """The id of each stop."""
+        stop_ids = self.stop_registry.stop_ids
+        return tuple(stop_ids[index] for index in self.stop_indices)
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        """The name of each stop."""
+        names = self.stop_registry.names
+        return tuple(names[index] for index in self.stop_indices)
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        """The latitude of each stop."""
+        return self.stop_registry.latitudes[self.stop_indices]
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        """The longitude of each stop."""
+        return self.stop_registry.longitudes[self.stop_indices]
+
+    @property
+    def scheduled_times(self) -> np.ndarray:
+        """The scheduled time of each stop in seconds."""
+        if self._scheduled_times is None:
+            return self.cumulative_times
+        return self._scheduled_times
+
+    def apply_delays(self, delays: np.ndarray) -> None:
+        """
+        Sets the delay of each stop from its scheduled time.
+
+        The cumulative times are replaced rather than changed in place, so
+        views of the stops taken before keep the times they were taken with.
+        :param delays: the delay of each stop in seconds
+        """
+        scheduled_times = self.scheduled_times
+        # the scheduled times are kept before the cumulative times are
+        # replaced, so a finder reading them in between does not see a
+        # delay of zero
+        self._scheduled_times = scheduled_times
+        self.cumulative_times = scheduled_times + np.asarray(
+            delays, dtype=np.float64
+        )
+
+    def _set_arrays(
+        self,
+        stop_registry: StopRegistry,
+        stop_indices: np.ndarray,
+        cumulative_times: np.ndarray,
+    ) -> None:
+        """
+        Sets the stops of the trip.
+        :param stop_registry: the registry the stops are in
+        :param stop_indices: the index in the registry of each stop
+        :param cumulative_times: the scheduled time of each stop in seconds
+        """
+        self.stop_registry = stop_registry
+        self.stop_indices = np.asarray(stop_indices, dtype=np.int32)
+        self.cumulative_times = np.asarray(cumulative_times, dtype=np.float64)
+        self._scheduled_times = None
+
+    def __len__(self) -> int:
+        return len(self.stop_indices)
+
     def __str__(self) -> str:
         """
         The string representation of the trip.
@@ -189,3 +457,135 @@ class Trip:
             and self.direction is other.direction
             and self.stops == other.stops
         )
+
+
+class StopsView(Sequence):
+    """
+    A read-only view of a range of the stops of a trip.
+
+    The view only holds the index of the first stop in the range and the time
+    offset to subtract from the scheduled times. Stop objects are created
+    when they are accessed, so the next stops of a trip can be updated
+    without allocating a Stop for every remaining stop.
+
+    Attributes
+    ----------
+    trip: Trip
+        the trip the stops belong to
+    start: int
+        the index in the trip of the first stop in the view
+    time_offset: float
+        the time in seconds subtracted from the cumulative times of the trip
+    """
+
+    __slots__ = ("trip", "start", "time_offset", "_end", "_times")
+
+    def __init__(
+        self,
+        trip: Trip,
+        start: int,
+        time_offset: float = 0.0,
+        end: int | None = None,
+        times: np.ndarray | None = None,
+    ):
+        """
+        Initializes the view with the given parameters.
+        :param trip: the trip the stops belong to
+        :param start: the index of the first stop in the view
+        :param time_offset: the time in seconds to subtract from the
+            cumulative times of the trip
+        :param end: the index after the last stop in the view, defaults to the
+            end of the trip
+        :param times: the time of each stop of the trip in seconds, defaults
+            to the cumulative times of the trip
+        """
+        self.trip = trip
+        self.start = start
+        self.time_offset = time_offset
+        self._end = len(trip) if end is None else end
+        self._times = trip.cumulative_times if times is None else times
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        """The latitude of each stop in the view."""
+        indices = self.trip.stop_indices[self.start : self._end]
+        return self.trip.stop_registry.latitudes[indices]
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        """The longitude of each stop in the view."""
+        indices = self.trip.stop_indices[self.start : self._end]
+        return self.trip.stop_registry.longitudes[indices]
+
+    @property
+    def times(self) -> np.ndarray:
+        """
+        The time of each stop of the trip in seconds that the view uses,
+        which can be modelled times rather than the cumulative times of the
+        trip.
+        """
+        return self._times
+
+    @property
+    def times_until_stops(self) -> np.ndarray:
+        """The time until each stop in the view in seconds."""
+        return self._times[self.start : self._end] - self.time_offset
+
+    def __len__(self) -> int:
+        return max(self._end - self.start, 0)
+
+    def __getitem__(self, index: int | slice) -> "Stop | StopsView":
+        """
+        Returns the stop at the given index, or a view of the stops in the
+        given slice.
+        """
+        if isinstance(index, slice):
+            start, end, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, end, step)]
+            return StopsView(
+                self.trip,
+                self.start + start,
+                self.time_offset,
+                self.start + max(end, start),
+                self._times,
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("stops index out of range")
+
+        trip_index = self.start + index
+        stop_registry = self.trip.stop_registry
+        registry_index = self.trip.stop_indices[trip_index]
+        time_until_stop = self._times[trip_index] - self.time_offset
+        return Stop(
+            stop_registry.names[registry_index],
+            Coordinates(
+                float(stop_registry.latitudes[registry_index]),
+                float(stop_registry.longitudes[registry_index]),
+            ),
+            None
+            if np.isnan(time_until_stop)
+            else datetime.timedelta(seconds=float(time_until_stop)),
+        )
+
+    def __str__(self) -> str:
+        """The string representation of the stops."""
+        return f"[{', '.join(str(stop) for stop in self)}]"
+
+    def __eq__(self, other) -> bool:
+        """
+        Checks for equality with another sequence of stops.
+
+        The view is equal with a sequence if they contain the same stops in
+        the same order.
+        :param other: the other object
+        :return: true if the other object has the same stops, false otherwise
+        """
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return False
+        return len(self) == len(other) and all(
+            stop == other_stop for stop, other_stop in zip(self, other)
+        )
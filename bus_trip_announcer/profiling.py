@@ -0,0 +1,269 @@
+"""
+Contains hooks that capture CPU profiles and memory allocations of the
+stages of the announcer from the running application.
+
+The stages are loading the tables of the CSVDatabase (database_load),
+TripFinder.get_trip (get_trip), NextStopsFinder.get_next_stops
+(get_next_stops) and the viewers showing the next stops (render). A sample
+of the calls of the chosen stages is run under cProfile, and optionally
+tracemalloc, and each capture is written to the profile directory as a
+timestamped .pstats file and an allocation diff report.
+
+Capturing is off by default. It is turned on with configure(), or with the
+environment variables:
+
+BUS_TRIP_ANNOUNCER_PROFILE: the stages to capture, separated by commas, or
+    all
+BUS_TRIP_ANNOUNCER_PROFILE_DIR: the directory of the captures, profiles by
+    default
+BUS_TRIP_ANNOUNCER_PROFILE_SAMPLE_RATE: the fraction of the calls that are
+    captured, 0.01 by default
+BUS_TRIP_ANNOUNCER_PROFILE_MEMORY: 1 to also capture the allocations
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+
+STAGES = ("database_load", "get_trip", "get_next_stops", "render")
+
+# the number of allocation sites written to an allocation diff report
+TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger(__name__)
+
+
+class _Configuration:
+    """
+    What the hooks capture.
+
+    Attributes
+    ----------
+    stages: frozenset[str]
+        the stages that are captured
+    directory: str
+        the directory the captures are written to
+    sample_every: int
+        one in this many calls of a stage is captured
+    memory: bool
+        whether allocations are captured as well as the CPU profile
+    """
+
+    def __init__(self):
+        self.stages = frozenset()
+        self.directory = "profiles"
+        self.sample_every = 100
+        self.memory = False
+        self.calls = {stage: itertools.count() for stage in STAGES}
+
+
+_configuration = _Configuration()
+# only one capture runs at a time, as cProfile profiles one thread and
+# tracemalloc traces the whole process
+_capture_lock = threading.Lock()
+
+
+def configure(
+    stages: Iterable[str] | str = STAGES,
+    directory: str = "profiles",
+    sample_rate: float = 0.01,
+    memory: bool = False,
+) -> None:
+    """
+    Starts capturing the given stages.
+    :param stages: the stages to capture, or all
+    :param directory: the directory the captures are written to
+    :param sample_rate: the fraction of the calls of a stage that are
+        captured, the first call of a stage is always captured
+    :param memory: whether allocations are captured as well
+    """
+    if stages == "all":
+        stages = STAGES
+    elif isinstance(stages, str):
+        stages = [
+            stage.strip() for stage in stages.split(",") if stage.strip()
+        ]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise UnknownStageError(", ".join(sorted(unknown)))
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be in (0, 1]")
+
+    _configuration.directory = directory
+    _configuration.sample_every = max(1, round(1 / sample_rate))
+    _configuration.memory = memory
+    _configuration.calls = {stage: itertools.count() for stage in STAGES}
+    _configuration.stages = frozenset(stages)
+
+
+def configure_from_environment() -> None:
+    """
+    Starts capturing the stages named by the environment variables, if
+    any are.
+
+    This runs when the module is imported, so a mistake in the variables
+    is logged as a warning instead of stopping the application from
+    starting: unknown stages are ignored, and a sample rate that is not
+    valid is replaced by the default.
+    """
+    stages = os.environ.get("BUS_TRIP_ANNOUNCER_PROFILE")
+    if not stages:
+        return
+    if stages != "all":
+        stages = [
+            stage.strip() for stage in stages.split(",") if stage.strip()
+        ]
+        unknown = sorted(set(stages) - set(STAGES))
+        if unknown:
+            logger.warning(
+                "ignoring the unknown stages in "
+                "BUS_TRIP_ANNOUNCER_PROFILE: %s",
+                ", ".join(unknown),
+            )
+            stages = [stage for stage in stages if stage in STAGES]
+
+    sample_rate = os.environ.get("BUS_TRIP_ANNOUNCER_PROFILE_SAMPLE_RATE")
+    try:
+        sample_rate = 0.01 if sample_rate is None else float(sample_rate)
+    except ValueError:
+        sample_rate = -1.0
+    if not 0 < sample_rate <= 1:
+        logger.warning(
+            "BUS_TRIP_ANNOUNCER_PROFILE_SAMPLE_RATE is not in (0, 1], "
+            "using 0.01"
+        )
+        sample_rate = 0.01
+
+    configure(
+        stages,
+        os.environ.get("BUS_TRIP_ANNOUNCER_PROFILE_DIR", "profiles"),
+        sample_rate,
+        os.environ.get("BUS_TRIP_ANNOUNCER_PROFILE_MEMORY") == "1",
+    )
+
+
+def disable() -> None:
+    """Stops capturing."""
+    _configuration.stages = frozenset()
+
+
+def profiled(stage: str) -> Callable:
+    """
+    Returns a decorator that captures a sample of the calls of a function
+    as the given stage.
+
+    When the stage is not captured, the only cost of a call is checking
+    the set of captured stages.
+    :param stage: the stage
+    :return: the decorator
+    """
+    if stage not in STAGES:
+        raise UnknownStageError(stage)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if stage not in _configuration.stages:
+                return func(*args, **kwargs)
+            call = next(_configuration.calls[stage])
+            if call % _configuration.sample_every or not (
+                _capture_lock.acquire(blocking=False)
+            ):
+                return func(*args, **kwargs)
+            try:
+                return _capture(stage, call, func, args, kwargs)
+            finally:
+                _capture_lock.release()
+
+        return wrapper
+
+    return decorator
+
+
+def _capture(stage: str, call: int, func: Callable, args, kwargs):
+    """
+    Runs the function under the profiler, writing the captures when it
+    returns.
+    :param stage: the stage of the function
+    :param call: the number of the call of the stage
+    :param func: the function
+    :param args: the positional arguments of the call
+    :param kwargs: the keyword arguments of the call
+    :return: what the function returns
+    """
+    memory = _configuration.memory
+    started_tracing = False
+    if memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        before = tracemalloc.take_snapshot()
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        if memory:
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+        path = _capture_path(stage, call)
+        try:
+            os.makedirs(_configuration.directory, exist_ok=True)
+            profile.dump_stats(path + ".pstats")
+            if memory:
+                _write_allocation_diff(path + ".alloc.txt", before, after)
+        except OSError:
+            logger.exception("could not write the capture of %s", stage)
+
+
+def _capture_path(stage: str, call: int) -> str:
+    """
+    Returns the path of the captures of a call, without an extension.
+    """
+    timestamp = time.strftime("%Y%m%dT%H%M%S")
+    return os.path.join(
+        _configuration.directory, f"{stage}-{timestamp}-{call}"
+    )
+
+
+def _write_allocation_diff(
+    path: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot
+) -> None:
+    """
+    Writes the allocation sites that grew the most between the snapshots.
+    :param path: the path of the report
+    :param before: the snapshot before the call
+    :param after: the snapshot after the call
+    """
+    # leave out the allocations of the profiler itself
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ]
+    differences = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    total = sum(difference.size_diff for difference in differences)
+    with open(path, "w") as file:
+        file.write(f"total size difference: {total} B\n")
+        for difference in differences[:TOP_ALLOCATIONS]:
+            file.write(f"{difference}\n")
+
+
+class UnknownStageError(Exception):
+    """
+    The stage is not one of the stages that can be captured.
+    """
+
+
+configure_from_environment()
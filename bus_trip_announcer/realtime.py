@@ -0,0 +1,249 @@
+"""
+Contains the ingestion of real-time trip updates, which delay the scheduled
+times of the trips followed by the announcers.
+
+The updates follow the TripUpdate messages of GTFS Realtime. They can be
+read from a GTFS Realtime protobuf feed, from the JSON form of a feed, or
+from a stream of feeds with one JSON feed per line, such as a socket.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+import numpy as np
+
+from bus_trip_announcer.models import Trip
+from bus_trip_announcer.sessions import SessionManager
+
+
+class StopTimeUpdate:
+    """
+    The delay of a stop of a trip.
+
+    Attributes
+    ----------
+    stop_sequence: int | None
+        the position of the stop in the trip, starting from 1
+    stop_id: str | None
+        the id of the stop
+    delay: float
+        the delay of the bus at the stop in seconds
+    """
+
+    __slots__ = ("stop_sequence", "stop_id", "delay")
+
+    def __init__(
+        self,
+        stop_sequence: int | None,
+        stop_id: str | None,
+        delay: float,
+    ):
+        """
+        Initializes the update with the given parameters.
+        :param stop_sequence: the position of the stop in the trip
+        :param stop_id: the id of the stop
+        :param delay: the delay of the bus at the stop in seconds
+        """
+        self.stop_sequence = stop_sequence
+        self.stop_id = stop_id
+        self.delay = delay
+
+
+class TripUpdate:
+    """
+    The delays of the stops of a trip.
+
+    Attributes
+    ----------
+    trip_id: str
+        the id of the trip
+    stop_time_updates: list[StopTimeUpdate]
+        the delays of the stops
+    """
+
+    __slots__ = ("trip_id", "stop_time_updates")
+
+    def __init__(self, trip_id: str, stop_time_updates: list[StopTimeUpdate]):
+        """
+        Initializes the update with the given parameters.
+        :param trip_id: the id of the trip
+        :param stop_time_updates: the delays of the stops
+        """
+        self.trip_id = trip_id
+        self.stop_time_updates = stop_time_updates
+
+    def delays(self, trip: Trip) -> np.ndarray:
+        """
+        Returns the delay of each stop of the trip.
+
+        As in GTFS Realtime, the delay at a stop also applies to the stops
+        after it, up to the next stop with an update. The stops before the
+        first update keep their scheduled times.
+        :param trip: the trip the update is for
+        :return: the delay of each stop in seconds
+        """
+        stop_indices = {}
+        for index, stop_id in enumerate(trip.stop_ids):
+            stop_indices.setdefault(stop_id, index)
+
+        updates = []
+        for update in self.stop_time_updates:
+            if update.stop_id is not None and update.stop_id in stop_indices:
+                updates.append((stop_indices[update.stop_id], update.delay))
+            elif (
+                update.stop_sequence is not None
+                and 1 <= update.stop_sequence <= len(trip)
+            ):
+                updates.append((update.stop_sequence - 1, update.delay))
+        updates.sort(key=lambda index_and_delay: index_and_delay[0])
+
+        delays = np.zeros(len(trip), dtype=np.float64)
+        for (index, delay), (next_index, _) in zip(
+            updates, updates[1:] + [(len(trip), None)]
+        ):
+            delays[index:next_index] = delay
+        return delays
+
+
+def parse_feed(feed: dict) -> list[TripUpdate]:
+    """
+    Returns the trip updates in the JSON form of a GTFS Realtime feed.
+
+    Both the camelCase and snake_case field names of the JSON form are
+    accepted. Stop time updates without an arrival or departure delay are
+    skipped.
+    :param feed: the feed message
+    :return: the trip updates
+    """
+    trip_updates = []
+    for entity in feed.get("entity", []):
+        trip_update = _field(entity, "trip_update")
+        if trip_update is None:
+            continue
+        trip_id = _field(trip_update.get("trip", {}), "trip_id")
+        if trip_id is None:
+            continue
+
+        stop_time_updates = []
+        for update in _field(trip_update, "stop_time_update") or []:
+            event = update.get("arrival") or update.get("departure") or {}
+            if event.get("delay") is None:
+                continue
+            stop_sequence = _field(update, "stop_sequence")
+            stop_id = _field(update, "stop_id")
+            stop_time_updates.append(
+                StopTimeUpdate(
+                    None if stop_sequence is None else int(stop_sequence),
+                    None if stop_id is None else str(stop_id),
+                    float(event["delay"]),
+                )
+            )
+        trip_updates.append(TripUpdate(str(trip_id), stop_time_updates))
+    return trip_updates
+
+
+def read_json_feed(path: str) -> list[TripUpdate]:
+    """
+    Reads the trip updates from a GTFS Realtime feed in JSON form.
+    :param path: the path to the feed
+    :return: the trip updates
+    """
+    with open(path, "r") as file:
+        return parse_feed(json.load(file))
+
+
+def read_protobuf_feed(path: str) -> list[TripUpdate]:
+    """
+    Reads the trip updates from a GTFS Realtime protobuf feed.
+
+    This needs the gtfs-realtime-bindings package.
+    :param path: the path to the feed
+    :return: the trip updates
+    """
+    try:
+        from google.protobuf.json_format import MessageToDict
+        from google.transit import gtfs_realtime_pb2
+    except ImportError as error:
+        raise ImportError(
+            "Reading protobuf feeds needs the gtfs-realtime-bindings package."
+        ) from error
+
+    feed = gtfs_realtime_pb2.FeedMessage()
+    with open(path, "rb") as file:
+        feed.ParseFromString(file.read())
+    return parse_feed(MessageToDict(feed))
+
+
+def read_feed_stream(stream: IO[str]) -> Iterator[list[TripUpdate]]:
+    """
+    Reads the trip updates of each feed in a stream of feeds in JSON form,
+    one feed per line, as they arrive.
+    :param stream: the stream, such as a file or socket.makefile()
+    :return: an iterator of the trip updates of each feed
+    """
+    for line in stream:
+        if line.strip():
+            yield parse_feed(json.loads(line))
+
+
+class DelayUpdater:
+    """
+    Applies trip updates to the trips of the sessions of a session manager.
+
+    The trips are found by their trip id, so only the trips with an update,
+    and the sessions on them, are touched.
+    """
+
+    def __init__(self, session_manager: SessionManager):
+        """
+        Initializes the updater with the given session manager.
+        :param session_manager: the manager of the sessions to update
+        """
+        self._session_manager = session_manager
+
+    def apply(self, trip_updates: Iterable[TripUpdate]) -> int:
+        """
+        Applies the trip updates, and updates the next stops of the sessions
+        on the updated trips.
+        :param trip_updates: the trip updates
+        :return: the number of sessions updated
+        """
+        number_of_sessions = 0
+        for trip_update in trip_updates:
+            trip = self._session_manager.get_trip(trip_update.trip_id)
+            if trip is None:
+                continue
+            trip.apply_delays(trip_update.delays(trip))
+
+            for announcer in self._session_manager.get_announcers_on_trip(
+                trip_update.trip_id
+            ):
+                if announcer.next_stops is not None:
+                    announcer.update_next_stops()
+                    number_of_sessions += 1
+        return number_of_sessions
+
+    def follow(self, stream: IO[str]) -> None:
+        """
+        Applies the feeds of a stream as they arrive, until the stream ends.
+        :param stream: the stream of feeds in JSON form, one feed per line
+        """
+        for trip_updates in read_feed_stream(stream):
+            self.apply(trip_updates)
+
+
+def _field(message: dict, name: str):
+    """
+    Returns the field of the message with the given snake_case name, or its
+    camelCase form.
+    :param message: the message
+    :param name: the snake_case name of the field
+    :return: the value of the field, or None if it is not in the message
+    """
+    if name in message:
+        return message[name]
+    first, *rest = name.split("_")
+    return message.get(first + "".join(word.title() for word in rest))
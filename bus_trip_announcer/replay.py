@@ -0,0 +1,376 @@
+"""
+Contains the headless replay of recorded GPS traces through the announcer.
+
+The fixes of a trace are fed through the TripFinder, TripAnnouncer and
+NextStopsFinder on a simulated clock, which can run at the speed of the
+recording, faster, or as fast as possible. The announcements are written
+as NDJSON, one JSON object per line, and the throughput and the latency of
+each stage are reported at the end.
+
+Usage: python -m bus_trip_announcer.replay TRACE --route 66 --direction 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from datetime import timedelta
+from typing import IO
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import TripFinder
+from bus_trip_announcer.events import AnnouncementEvent
+from bus_trip_announcer.models import TripStatus
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.traces import (
+    SCHEDULE_TIME_ZONE,
+    GPSFix,
+    read_agency_time_zone,
+    read_trace,
+)
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+from bus_trip_announcer.utils import SEQDirection
+
+
+class SimulatedClock:
+    """
+    The clock of a replay, which follows the times of the trace.
+
+    Attributes
+    ----------
+    speed: float | None
+        how many times faster than real time the trace is replayed, or None
+        to replay it as fast as possible
+    now: float | None
+        the current time of the trace in seconds since midnight, or None
+        before the first fix
+    """
+
+    def __init__(
+        self,
+        speed: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initializes the clock with the given speed.
+        :param speed: how many times faster than real time the trace is
+            replayed, or None to replay it as fast as possible
+        :param clock: the real clock
+        :param sleep: the function that waits for the real clock
+        """
+        self.speed = speed
+        self.now = None
+        self._clock = clock
+        self._sleep = sleep
+        self._trace_start = None
+        self._real_start = None
+
+    def advance_to(self, trace_time: float) -> None:
+        """
+        Moves the clock to the given time of the trace, waiting until that
+        time is due at the speed of the clock.
+        :param trace_time: the time of the trace in seconds since midnight
+        """
+        self.now = trace_time
+        if self._trace_start is None:
+            self._trace_start = trace_time
+            self._real_start = self._clock()
+            return
+        if self.speed is None:
+            return
+
+        due = self._real_start + (trace_time - self._trace_start) / self.speed
+        delay = due - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+
+class ReplayReport:
+    """
+    The throughput and the latencies of a replay.
+
+    Attributes
+    ----------
+    fixes: int
+        the number of fixes replayed
+    announcements: int
+        the number of announcements written
+    elapsed: float
+        the real time the replay took in seconds
+    stage_latencies: dict[str, np.ndarray]
+        the latency in seconds of each run of each stage
+    """
+
+    def __init__(
+        self,
+        fixes: int,
+        announcements: int,
+        elapsed: float,
+        stage_latencies: dict[str, np.ndarray],
+    ):
+        """
+        Initializes the report with the given parameters.
+        :param fixes: the number of fixes replayed
+        :param announcements: the number of announcements written
+        :param elapsed: the real time the replay took in seconds
+        :param stage_latencies: the latencies of each stage in seconds
+        """
+        self.fixes = fixes
+        self.announcements = announcements
+        self.elapsed = elapsed
+        self.stage_latencies = stage_latencies
+
+    @property
+    def fixes_per_second(self) -> float:
+        """The number of fixes replayed per real second."""
+        if self.elapsed <= 0:
+            return float("inf") if self.fixes else 0.0
+        return self.fixes / self.elapsed
+
+    def summary(self) -> dict:
+        """
+        Returns the report as a dictionary that can be written as JSON, with
+        the latencies of the stages in milliseconds.
+        """
+        stages = {}
+        for stage, latencies in self.stage_latencies.items():
+            if not len(latencies):
+                continue
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            stages[stage] = {
+                "count": len(latencies),
+                "mean_ms": float(latencies.mean() * 1000),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(latencies.max() * 1000),
+            }
+        return {
+            "fixes": self.fixes,
+            "announcements": self.announcements,
+            "elapsed_s": self.elapsed,
+            "fixes_per_second": self.fixes_per_second,
+            "stages": stages,
+        }
+
+    def __str__(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{self.fixes} fixes, {self.announcements} announcements in "
+            f"{self.elapsed:.3f}s ({self.fixes_per_second:.0f} fixes/s)",
+            f"{'stage':<12}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}"
+            f"{'p99':>10}{'max':>10}  (ms)",
+        ]
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"{stage:<12}{stats['count']:>8}{stats['mean_ms']:>10.3f}"
+                f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+                f"{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+            )
+        return "\n".join(lines)
+
+
+class ReplayEngine:
+    """
+    Replays the fixes of a trace through the announcer of a bus trip.
+
+    The trip is found from the first fix of the trace. Each fix then
+    updates the next stops of the announcer, and every announcement is
+    written to the output as a line of JSON.
+
+    The stages whose latencies are measured are reading a fix from the
+    trace, finding the trip, finding the next stops and writing the
+    announcements.
+    """
+
+    STAGES = ("read", "find_trip", "next_stops", "write")
+
+    def __init__(
+        self,
+        trip_finder: TripFinder,
+        route_number: int,
+        direction: SEQDirection,
+        output: IO[str],
+        clock: SimulatedClock | None = None,
+        travel_times: SegmentTravelTimes | None = None,
+    ):
+        """
+        Initializes the engine with the given parameters.
+        :param trip_finder: the finder of the trip of the trace
+        :param route_number: the route number of the bus
+        :param direction: the direction of the bus
+        :param output: where the announcements are written
+        :param clock: the clock of the replay, by default as fast as possible
+        :param travel_times: the model of the travel times of the segments
+        """
+        self._trip_finder = trip_finder
+        self._route_number = route_number
+        self._direction = direction
+        self._output = output
+        self.clock = clock if clock is not None else SimulatedClock()
+        self._travel_times = travel_times
+
+    def replay(self, fixes: Iterable[GPSFix]) -> ReplayReport:
+        """
+        Replays the given fixes.
+        :param fixes: the fixes, in the order of the trace
+        :return: the report of the replay
+        """
+        latencies = {stage: array("d") for stage in self.STAGES}
+        events: list[AnnouncementEvent] = []
+        announcer = None
+        number_of_fixes = 0
+        number_of_announcements = 0
+
+        replay_start = time.perf_counter()
+        iterator = iter(fixes)
+        while True:
+            start = time.perf_counter()
+            fix = next(iterator, None)
+            if fix is None:
+                break
+            latencies["read"].append(time.perf_counter() - start)
+            number_of_fixes += 1
+            self.clock.advance_to(fix.time)
+
+            if announcer is None:
+                start = time.perf_counter()
+                announcer = self._create_announcer(fix)
+                announcer.subscribe(events.extend)
+                latencies["find_trip"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            announcer.trip_status.coordinates = fix.coordinates
+            announcer.update_next_stops()
+            latencies["next_stops"].append(time.perf_counter() - start)
+
+            if events:
+                start = time.perf_counter()
+                for event in events:
+                    self._write_announcement(fix, event)
+                number_of_announcements += len(events)
+                events.clear()
+                latencies["write"].append(time.perf_counter() - start)
+
+        return ReplayReport(
+            number_of_fixes,
+            number_of_announcements,
+            time.perf_counter() - replay_start,
+            {
+                stage: np.frombuffer(values, dtype=np.float64)
+                for stage, values in latencies.items()
+            },
+        )
+
+    def _create_announcer(self, fix: GPSFix) -> TripAnnouncer:
+        """
+        Creates the announcer for the trip the bus is on at the given fix.
+        :param fix: the first fix of the trace
+        :return: the announcer
+        """
+        trip = self._trip_finder.get_trip(
+            self._route_number,
+            self._direction,
+            fix.coordinates,
+            timedelta(seconds=fix.time),
+        )
+        announcer = TripAnnouncer(
+            TripStatus(self._route_number, self._direction, fix.coordinates)
+        )
+        announcer.next_stops_finder = NextStopsFinder(
+            trip, self._travel_times
+        )
+        return announcer
+
+    def _write_announcement(
+        self, fix: GPSFix, event: AnnouncementEvent
+    ) -> None:
+        """
+        Writes the announcement of an event as a line of JSON.
+        :param fix: the fix that caused the event
+        :param event: the event
+        """
+        announcement = {"time": fix.time, **event.to_dict()}
+        announcement["latitude"] = fix.coordinates.latitude
+        announcement["longitude"] = fix.coordinates.longitude
+        self._output.write(json.dumps(announcement))
+        self._output.write("\n")
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """
+    Replays a trace from the command line, writing the announcements to
+    the output and the report to stderr.
+    :param arguments: the command line arguments, by default sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description="Replay a GPS trace through the bus trip announcer."
+    )
+    parser.add_argument("trace", help="a CSV, GPX or NMEA trace")
+    parser.add_argument("--route", type=int, required=True)
+    parser.add_argument("--direction", type=int, choices=(0, 1), default=0)
+    parser.add_argument("--data", default="useful_data")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=None,
+        help="times faster than real time, as fast as possible by default",
+    )
+    parser.add_argument("--output", default="-", help="NDJSON output file")
+    parser.add_argument("--travel-times", default=None)
+    parser.add_argument(
+        "--time-zone",
+        default=None,
+        help="the time zone of the schedule, by default from the agency "
+        "table of the data",
+    )
+    parser.add_argument(
+        "--json-report", action="store_true", help="report as JSON"
+    )
+    options = parser.parse_args(arguments)
+
+    travel_times = None
+    if options.travel_times is not None:
+        travel_times = SegmentTravelTimes.load(options.travel_times)
+
+    if options.time_zone is not None:
+        time_zone = ZoneInfo(options.time_zone)
+    else:
+        time_zone = read_agency_time_zone(options.data) or SCHEDULE_TIME_ZONE
+
+    output = (
+        sys.stdout
+        if options.output == "-"
+        else open(options.output, "w", encoding="utf-8")
+    )
+    try:
+        engine = ReplayEngine(
+            TripFinder(CSVDatabase(options.data)),
+            options.route,
+            SEQDirection(options.direction),
+            output,
+            SimulatedClock(options.speed),
+            travel_times,
+        )
+        report = engine.replay(read_trace(options.trace, time_zone))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if options.json_report:
+        print(json.dumps(report.summary()), file=sys.stderr)
+    else:
+        print(report, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Module that encodes trips and their next stops in a compact binary format.
+
+An encoded trip has a fixed size header, followed by the arrays of the stops
+and a table of the strings used by the trip:
+
+- the header (see _HEADER and _VIEW)
+- latitudes: float64[number of stops]
+- longitudes: float64[number of stops]
+- cumulative times: float64[number of stops]
+- name indices: uint32[number of stops]
+- stop id indices: uint32[number of stops]
+- string offsets: uint32[number of strings + 1]
+- the utf-8 encoded strings
+
+All the numbers are little-endian. The numeric arrays of a decoded trip are
+read directly from the buffer without copying it. A trip can also be
+decoded onto a stop registry, such as the one from
+finders.get_stop_registry, so that it shares its stops with the other trips
+of the registry.
+"""
+
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+from bus_trip_announcer.models import Stop, StopRegistry, StopsView, Trip
+from bus_trip_announcer.utils import Direction, SEQDirection
+
+MAGIC = b"BTAS"
+FORMAT_VERSION = 1
+
+# the kinds of objects that can be encoded
+TRIP = 1
+STOPS = 2
+
+# magic, version, kind, direction type, route number, direction value,
+# number of stops, number of strings, size of the strings, trip id index
+_HEADER = struct.Struct("<4sHBBqiIIIi4x")
+# the start, end, and time offset of a view of the stops of the trip
+_VIEW = struct.Struct("<IId")
+
+_DIRECTION_TYPES = (Direction, SEQDirection)
+
+_FLOAT64 = np.dtype("<f8")
+_UINT32 = np.dtype("<u4")
+
+
+class SerializationError(Exception):
+    """
+    The buffer does not contain a valid encoding.
+    """
+
+
+def encode_trip(trip: Trip) -> bytes:
+    """
+    Encodes the trip.
+    :param trip: the trip
+    :return: the encoded trip
+    """
+    return _encode(TRIP, trip, trip.cumulative_times, 0, len(trip), 0.0)
+
+
+def decode_trip(
+    buffer: bytes | memoryview, stop_registry: StopRegistry | None = None
+) -> Trip:
+    """
+    Decodes a trip encoded by encode_trip.
+
+    The arrays of the trip reference the buffer, so the buffer must not be
+    modified while the trip is in use.
+    :param buffer: the encoded trip
+    :param stop_registry: the registry the stops of the trip are in, by
+        default a new registry of the stops in the buffer
+    :return: the trip
+    """
+    kind, trip, _, _, _ = _decode(buffer, stop_registry)
+    if kind != TRIP:
+        raise SerializationError("The buffer does not contain a trip.")
+    return trip
+
+
+def encode_stops(stops: Sequence[Stop]) -> bytes:
+    """
+    Encodes a sequence of stops, such as the next stops of a trip.
+
+    A view of the stops of a trip is encoded with the stops of its trip, so
+    it can be decoded into the same view. The times of the view are
+    encoded as the cumulative times of the trip, so the stops keep the
+    times they were found with, such as the times of a model of the travel
+    times.
+    :param stops: the stops
+    :return: the encoded stops
+    """
+    if not isinstance(stops, StopsView):
+        stops = Trip(0, Direction.NORTH, stops).stops
+    end = stops.start + len(stops)
+    return _encode(
+        STOPS, stops.trip, stops.times, stops.start, end, stops.time_offset
+    )
+
+
+def decode_stops(
+    buffer: bytes | memoryview, stop_registry: StopRegistry | None = None
+) -> StopsView:
+    """
+    Decodes stops encoded by encode_stops.
+    :param buffer: the encoded stops
+    :param stop_registry: the registry the stops are in, by default a new
+        registry of the stops in the buffer
+    :return: a view of the stops
+    """
+    kind, trip, start, end, time_offset = _decode(buffer, stop_registry)
+    if kind != STOPS:
+        raise SerializationError("The buffer does not contain stops.")
+    return StopsView(trip, start, time_offset, end)
+
+
+def _encode(
+    kind: int,
+    trip: Trip,
+    times: np.ndarray,
+    start: int,
+    end: int,
+    time_offset: float,
+) -> bytes:
+    """
+    Encodes the trip and a view of its stops.
+    :param kind: the kind of object being encoded
+    :param trip: the trip
+    :param times: the time of each stop of the trip in seconds
+    :param start: the index of the first stop of the view
+    :param end: the index after the last stop of the view
+    :param time_offset: the time offset of the view
+    :return: the encoding
+    """
+    strings = {}
+    name_indices = [
+        strings.setdefault(name, len(strings)) for name in trip.names
+    ]
+    stop_id_indices = [
+        strings.setdefault(stop_id, len(strings)) for stop_id in trip.stop_ids
+    ]
+    trip_id_index = (
+        -1
+        if trip.trip_id is None
+        else strings.setdefault(str(trip.trip_id), len(strings))
+    )
+
+    encoded_strings = [string.encode("utf-8") for string in strings]
+    string_offsets = np.zeros(len(encoded_strings) + 1, dtype=_UINT32)
+    np.cumsum(
+        [len(string) for string in encoded_strings], out=string_offsets[1:]
+    )
+    direction_type = _DIRECTION_TYPES.index(type(trip.direction))
+
+    return b"".join(
+        (
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                kind,
+                direction_type,
+                trip.route_number,
+                trip.direction.value,
+                len(trip),
+                len(encoded_strings),
+                int(string_offsets[-1]),
+                trip_id_index,
+            ),
+            _VIEW.pack(start, end, time_offset),
+            trip.latitudes.astype(_FLOAT64).tobytes(),
+            trip.longitudes.astype(_FLOAT64).tobytes(),
+            np.asarray(times).astype(_FLOAT64).tobytes(),
+            np.array(name_indices, dtype=_UINT32).tobytes(),
+            np.array(stop_id_indices, dtype=_UINT32).tobytes(),
+            string_offsets.tobytes(),
+            *encoded_strings,
+        )
+    )
+
+
+def _decode(
+    buffer: bytes | memoryview, stop_registry: StopRegistry | None
+) -> tuple[int, Trip, int, int, float]:
+    """
+    Decodes the trip and the view of its stops.
+    :param buffer: the encoding
+    :param stop_registry: the registry the stops are in, or None to create
+        one from the stops in the buffer
+    :return: a tuple of the kind of object, the trip, and the start, end,
+        and time offset of the view:
+        (kind, trip, start, end, time_offset)
+    """
+    buffer = memoryview(buffer).cast("B")
+    if len(buffer) < _HEADER.size + _VIEW.size:
+        raise SerializationError("The buffer is too small.")
+    (
+        magic,
+        version,
+        kind,
+        direction_type,
+        route_number,
+        direction_value,
+        number_of_stops,
+        number_of_strings,
+        strings_size,
+        trip_id_index,
+    ) = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SerializationError("The buffer is not an encoded trip.")
+    if version != FORMAT_VERSION:
+        raise SerializationError(f"Unsupported format version {version}.")
+    if direction_type >= len(_DIRECTION_TYPES):
+        raise SerializationError("The direction of the trip is not valid.")
+    start, end, time_offset = _VIEW.unpack_from(buffer, _HEADER.size)
+    if not start <= end <= number_of_stops:
+        raise SerializationError("The view of the stops is out of range.")
+
+    offset = _HEADER.size + _VIEW.size
+    expected_size = (
+        offset
+        + number_of_stops * 32
+        + (number_of_strings + 1) * 4
+        + strings_size
+    )
+    if len(buffer) != expected_size:
+        raise SerializationError("The buffer has the wrong size.")
+
+    def read(dtype: np.dtype, count: int) -> np.ndarray:
+        nonlocal offset
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += dtype.itemsize * count
+        return array
+
+    latitudes = read(_FLOAT64, number_of_stops)
+    longitudes = read(_FLOAT64, number_of_stops)
+    cumulative_times = read(_FLOAT64, number_of_stops)
+    name_indices = read(_UINT32, number_of_stops)
+    stop_id_indices = read(_UINT32, number_of_stops)
+    string_offsets = read(_UINT32, number_of_strings + 1)
+    if (
+        string_offsets[0] != 0
+        or string_offsets[-1] != strings_size
+        or np.any(np.diff(string_offsets.astype(np.int64)) < 0)
+    ):
+        raise SerializationError("The string offsets are not valid.")
+    if np.any(name_indices >= number_of_strings) or np.any(
+        stop_id_indices >= number_of_strings
+    ):
+        raise SerializationError("A string index is out of range.")
+    if not -1 <= trip_id_index < number_of_strings:
+        raise SerializationError("The trip id index is out of range.")
+
+    encoded_strings = buffer[offset:]
+    string_offsets = string_offsets.tolist()
+    try:
+        strings = [
+            str(encoded_strings[string_start:string_end], "utf-8")
+            for string_start, string_end in zip(
+                string_offsets, string_offsets[1:]
+            )
+        ]
+        direction = _DIRECTION_TYPES[direction_type](direction_value)
+    except ValueError as error:
+        raise SerializationError(str(error)) from error
+
+    stop_ids = [strings[index] for index in stop_id_indices]
+    if stop_registry is None:
+        stop_registry = StopRegistry(
+            stop_ids,
+            [strings[index] for index in name_indices],
+            latitudes,
+            longitudes,
+        )
+        stop_indices = np.arange(number_of_stops, dtype=np.int32)
+    else:
+        stop_indices = stop_registry.indices_of(stop_ids)
+        if np.any(stop_indices < 0):
+            raise SerializationError(
+                "A stop of the trip is not in the stop registry."
+            )
+    trip = Trip.from_registry(
+        route_number,
+        direction,
+        stop_registry,
+        stop_indices,
+        cumulative_times,
+        None if trip_id_index < 0 else strings[trip_id_index],
+    )
+    return kind, trip, start, end, time_offset
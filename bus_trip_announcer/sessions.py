@@ -0,0 +1,266 @@
+"""
+Contains the session manager that hosts the announcers of many riders in one
+process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.models import StopsView, Trip, TripStatus
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+from bus_trip_announcer.utils import Coordinates
+
+
+class _SharedTrip:
+    """
+    A trip, and its finder, shared by the sessions riding it.
+    """
+
+    __slots__ = ("trip", "next_stops_finder", "rider_ids")
+
+    def __init__(self, trip: Trip, travel_times: SegmentTravelTimes | None):
+        self.trip = trip
+        self.next_stops_finder = NextStopsFinder(trip, travel_times)
+        self.rider_ids = set()
+
+
+class AnnouncerSession:
+    """
+    The announcer session of a rider.
+
+    Attributes
+    ----------
+    rider_id: Hashable
+        the id of the rider
+    announcer: TripAnnouncer
+        the announcer of the rider's trip
+    trip_key: Hashable
+        the key of the shared trip the rider is on
+    last_active: float
+        the time the session was last used
+    """
+
+    __slots__ = ("rider_id", "announcer", "trip_key", "last_active")
+
+    def __init__(
+        self,
+        rider_id: Hashable,
+        announcer: TripAnnouncer,
+        trip_key: Hashable,
+        last_active: float,
+    ):
+        """
+        Initializes the session with the given parameters.
+        :param rider_id: the id of the rider
+        :param announcer: the announcer of the rider's trip
+        :param trip_key: the key of the shared trip the rider is on
+        :param last_active: the time the session was last used
+        """
+        self.rider_id = rider_id
+        self.announcer = announcer
+        self.trip_key = trip_key
+        self.last_active = last_active
+
+
+class SessionManager:
+    """
+    Hosts the announcer sessions of many riders.
+
+    Sessions are keyed by rider id. Riders on the same trip share the Trip
+    object and its NextStopsFinder, so a session only holds the rider's own
+    trip status and next stops. Sessions that are not used for idle_timeout
+    seconds are closed by expire_idle_sessions.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 15 * 60,
+        clock: Callable[[], float] = time.monotonic,
+        travel_times: SegmentTravelTimes | None = None,
+    ):
+        """
+        Initializes the manager with no sessions.
+        :param idle_timeout: the time in seconds after which an unused
+            session expires
+        :param clock: the clock that times the sessions
+        :param travel_times: the model of the travel times the finders of the
+            trips use
+        """
+        self.idle_timeout = idle_timeout
+        self._travel_times = travel_times
+        self._clock = clock
+        self._lock = threading.Lock()
+        # ordered from the least to the most recently active session
+        self._sessions: OrderedDict[Hashable, AnnouncerSession] = OrderedDict()
+        self._trips: dict[Hashable, _SharedTrip] = {}
+
+    def open_session(
+        self,
+        rider_id: Hashable,
+        trip: Trip,
+        trip_status: TripStatus | None = None,
+    ) -> TripAnnouncer:
+        """
+        Opens a session for the rider on the given trip.
+
+        If another session is on a trip with the same trip id, the trip
+        object and finder of that session are shared. An existing session
+        of the rider is replaced.
+        :param rider_id: the id of the rider
+        :param trip: the trip the rider is on
+        :param trip_status: the status of the rider's trip
+        :return: the announcer of the session
+        """
+        if trip_status is None:
+            trip_status = TripStatus(trip.route_number, trip.direction)
+        trip_key = trip.trip_id if trip.trip_id is not None else id(trip)
+
+        with self._lock:
+            self._expire_idle_sessions()
+            if rider_id in self._sessions:
+                self._remove_session(rider_id)
+
+            shared_trip = self._trips.get(trip_key)
+            if shared_trip is None:
+                shared_trip = _SharedTrip(trip, self._travel_times)
+                self._trips[trip_key] = shared_trip
+            shared_trip.rider_ids.add(rider_id)
+
+            announcer = TripAnnouncer(trip_status)
+            announcer.next_stops_finder = shared_trip.next_stops_finder
+            self._sessions[rider_id] = AnnouncerSession(
+                rider_id, announcer, trip_key, self._clock()
+            )
+        return announcer
+
+    def get_announcer(self, rider_id: Hashable) -> TripAnnouncer:
+        """
+        Returns the announcer of the rider's session.
+        :param rider_id: the id of the rider
+        :return: the announcer
+        """
+        with self._lock:
+            return self._touch(rider_id).announcer
+
+    def update_location(
+        self, rider_id: Hashable, coordinates: Coordinates
+    ) -> StopsView:
+        """
+        Updates the location of the rider and the next stops of their
+        session.
+        :param rider_id: the id of the rider
+        :param coordinates: the current location of the rider
+        :return: the next stops of the rider
+        """
+        with self._lock:
+            announcer = self._touch(rider_id).announcer
+        announcer.trip_status.coordinates = coordinates
+        announcer.update_next_stops()
+        return announcer.next_stops
+
+    def close_session(self, rider_id: Hashable) -> None:
+        """
+        Closes the rider's session.
+        :param rider_id: the id of the rider
+        """
+        with self._lock:
+            if rider_id not in self._sessions:
+                raise SessionNotFoundError(rider_id)
+            self._remove_session(rider_id)
+
+    def expire_idle_sessions(self) -> list[Hashable]:
+        """
+        Closes the sessions that have not been used for idle_timeout seconds.
+        :return: the ids of the riders whose sessions were closed
+        """
+        with self._lock:
+            return self._expire_idle_sessions()
+
+    def get_trip(self, trip_id: Hashable) -> Trip | None:
+        """
+        Returns the shared trip with the given trip id.
+        :param trip_id: the trip id
+        :return: the trip, or None if no session is on the trip
+        """
+        with self._lock:
+            shared_trip = self._trips.get(trip_id)
+            return None if shared_trip is None else shared_trip.trip
+
+    def get_announcers_on_trip(self, trip_id: Hashable) -> list[TripAnnouncer]:
+        """
+        Returns the announcers of the sessions on the trip with the given
+        trip id.
+        :param trip_id: the trip id
+        :return: the announcers
+        """
+        with self._lock:
+            shared_trip = self._trips.get(trip_id)
+            if shared_trip is None:
+                return []
+            return [
+                self._sessions[rider_id].announcer
+                for rider_id in shared_trip.rider_ids
+            ]
+
+    @property
+    def number_of_trips(self) -> int:
+        """The number of distinct trips the sessions are on."""
+        return len(self._trips)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, rider_id: Hashable) -> bool:
+        return rider_id in self._sessions
+
+    def _touch(self, rider_id: Hashable) -> AnnouncerSession:
+        """
+        Marks the rider's session as active now.
+        :param rider_id: the id of the rider
+        :return: the session
+        """
+        session = self._sessions.get(rider_id)
+        if session is None:
+            raise SessionNotFoundError(rider_id)
+        session.last_active = self._clock()
+        self._sessions.move_to_end(rider_id)
+        return session
+
+    def _remove_session(self, rider_id: Hashable) -> None:
+        """
+        Removes the rider's session, and its trip if no other session is on
+        it.
+        :param rider_id: the id of the rider
+        """
+        session = self._sessions.pop(rider_id)
+        shared_trip = self._trips[session.trip_key]
+        shared_trip.rider_ids.discard(rider_id)
+        if not shared_trip.rider_ids:
+            del self._trips[session.trip_key]
+
+    def _expire_idle_sessions(self) -> list[Hashable]:
+        """
+        Closes the idle sessions. The lock must be held by the caller.
+        :return: the ids of the riders whose sessions were closed
+        """
+        expiry_time = self._clock() - self.idle_timeout
+        expired = []
+        # the sessions are ordered by activity, so stop at the first
+        # session that is still active
+        for rider_id, session in self._sessions.items():
+            if session.last_active > expiry_time:
+                break
+            expired.append(rider_id)
+        for rider_id in expired:
+            self._remove_session(rider_id)
+        return expired
+
+
+class SessionNotFoundError(Exception):
+    """
+    There is no session for the rider.
+    """
@@ -2,8 +2,54 @@
 Module that contains classes that computes the next stops of the trip.
 """
 
-from bus_trip_announcer.models import Trip, Stop
-from bus_trip_announcer.utils import Coordinates, Line
+from collections.abc import Sequence
+
+import numpy as np
+
+from bus_trip_announcer import metrics, profiling
+from bus_trip_announcer.models import StopsView, Trip, Stop
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+from bus_trip_announcer.utils import Coordinates
+
+
+def _project_onto_segments(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    location_latitude: float | np.ndarray,
+    location_longitude: float | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Projects the location(s) onto each segment between successive stops.
+
+    The stop arrays describe the segments of the route, so a route of n stops
+    has n - 1 segments. The location arguments broadcast against the
+    segments, which allows many locations to be projected at once.
+
+    See the following link for the equations:
+    https://math.stackexchange.com/questions/2248617/shortest-distance-between-a-point-and-a-line-segment
+    :param latitudes: the latitudes of the stops
+    :param longitudes: the longitudes of the stops
+    :param location_latitude: the latitude(s) of the location(s)
+    :param location_longitude: the longitude(s) of the location(s)
+    :return: a tuple of the minimum distances to each segment and the
+        proportion along each segment of the closest point:
+        (distances, proportions)
+    """
+    x1, y1 = longitudes[:-1], latitudes[:-1]
+    dx, dy = np.diff(longitudes), np.diff(latitudes)
+    squared_lengths = dx**2 + dy**2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (
+            (location_longitude - x1) * dx + (location_latitude - y1) * dy
+        ) / squared_lengths
+    # segments of zero length have their closest point at the start
+    t = np.clip(np.where(squared_lengths == 0, 0.0, t), 0.0, 1.0)
+
+    distances = np.hypot(
+        x1 + t * dx - location_longitude, y1 + t * dy - location_latitude
+    )
+    return distances, t
 
 
 class NextStopsFinder:
@@ -11,16 +57,49 @@ class NextStopsFinder:
     A finder that finds the next stops of the trip.
     """
 
-    def __init__(self, trip: Trip):
+    # the number of locations evaluated together in get_trajectory_estimates
+    TRAJECTORY_CHUNK_SIZE = 4096
+
+    def __init__(
+        self, trip: Trip, travel_times: SegmentTravelTimes | None = None
+    ):
         """
         Initializes the finder with the given trip.
+
+        If a model of the travel times is given, the times of the stops come
+        from the typical travel times of the segments at the time of day of
+        the trip, instead of the trip's own schedule. The schedule is used
+        for the segments the model does not know.
         :param trip: the trip
+        :param travel_times: the model of the travel times of the segments
         """
         self._trip = trip
+        # the stop locations are gathered from the stop registry once per trip
+        self._latitudes = trip.latitudes
+        self._longitudes = trip.longitudes
+
+        self._modelled_times = None
+        if travel_times is not None and len(trip) > 0:
+            scheduled_times = trip.scheduled_times
+            segment_times = travel_times.trip_travel_times(
+                trip.stop_ids, scheduled_times
+            )
+            segment_times = np.where(
+                np.isnan(segment_times),
+                np.diff(scheduled_times),
+                segment_times,
+            )
+            self._modelled_times = scheduled_times[0] + np.concatenate(
+                ([0.0], np.cumsum(segment_times))
+            )
+        # the cumulative times of the trip and the times of the stops
+        # computed from them, set together as the finder can be shared by
+        # threads
+        self._delayed_times = (None, None)
 
     @classmethod
     def get_in_between_stops(
-        cls, stops: list[Stop], location: Coordinates
+        cls, stops: Sequence[Stop], location: Coordinates
     ) -> tuple[Stop, Stop]:
         """
         Finds the two stops in the list of stops that the location is most
@@ -35,87 +114,203 @@ class NextStopsFinder:
         :return: a tuple of the two stops:
             (previous_stop, next_stops)
         """
-        distances = []
-        for i in range(len(stops) - 1):
-            stop1 = stops[i]
-            stop2 = stops[i + 1]
-            direct_line = Line(stop1.coordinates, stop2.coordinates)
-            distance_to_line = Line.minimum_distance(direct_line, location)
-            distances.append(distance_to_line)
+        if isinstance(stops, StopsView):
+            latitudes, longitudes = stops.latitudes, stops.longitudes
+        else:
+            latitudes = np.array([stop.coordinates.latitude for stop in stops])
+            longitudes = np.array(
+                [stop.coordinates.longitude for stop in stops]
+            )
+        distances, _ = _project_onto_segments(
+            latitudes, longitudes, location.latitude, location.longitude
+        )
 
-        previous_stop_index = distances.index(min(distances))
+        previous_stop_index = int(np.argmin(distances))
         return (stops[previous_stop_index], stops[previous_stop_index + 1])
 
-    def get_next_stops(self, location: Coordinates) -> list[Stop]:
+    @metrics.timed("next_stops_finder_seconds", method="get_next_stops")
+    @profiling.profiled("get_next_stops")
+    def get_next_stops(self, location: Coordinates) -> StopsView:
         """
         Gets the next stops on the route based on the given location.
+
+        The stops are returned as a view over the trip, so a Stop is only
+        created for the stops that are accessed.
         :param location: the current location
         :return: the next stops
         """
-        previous_stop, next_stop = self.get_in_between_stops(
-            self._trip.stops, location
+        segment_index, proportion = self._locate(
+            location.latitude, location.longitude
         )
         time_since_trip_start = self._time_since_trip_start(
-            previous_stop, next_stop, location
+            segment_index, proportion
+        )
+        return StopsView(
+            self._trip,
+            int(segment_index) + 1,
+            float(time_since_trip_start),
+            times=self._stop_times(),
         )
-        next_stop_index = self._trip.stops.index(next_stop)
-
-        # for each of the next stops, update the time until stop
-        next_stops = []
-        for stop in self._trip.stops[next_stop_index:]:
-            updated_stop = Stop(
-                stop.name,
-                stop.coordinates,
-                stop.time_until_stop - time_since_trip_start,
-            )
-            next_stops.append(updated_stop)
-        return next_stops
 
-    @classmethod
-    def _proportion_travelled(
-        cls, previous_stop: Stop, next_stop: Stop, location: Coordinates
-    ) -> float:
+    def get_trajectory_estimates(
+        self, locations: np.ndarray, timestamps: np.ndarray | None = None
+    ) -> "TrajectoryEstimates":
         """
-        Returns the proportion travelled between the two stops.
+        Estimates the progress of the trip for a trace of locations.
 
-        This is estimated using the following expression:
-
-        $$
-        distance(previous_stop, location)
-        /
-        [distance(previous_stop, location) + distane(location, next_stop)]
-        $$
-        :param previous_stop: the previous stop
-        :param next_stop: the next stop
-        :param location: the current location
-        :return: the proportion travelled between the two stops
+        This gives the same estimates as calling get_next_stops for each
+        location, but all the locations are evaluated together against the
+        segments of the trip. The locations are processed in chunks of
+        TRAJECTORY_CHUNK_SIZE to bound the memory used.
+        :param locations: an array of shape (n, 2) of the latitude and
+            longitude of each location
+        :param timestamps: the time of each location in seconds, on the same
+            clock as the times of the trip
+        :return: the estimates for each location
         """
-        distance_from_previous = Coordinates.distance_between(
-            location, previous_stop.coordinates
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        segment_indices = np.empty(len(locations), dtype=np.intp)
+        proportions = np.empty(len(locations), dtype=np.float64)
+        for start in range(0, len(locations), self.TRAJECTORY_CHUNK_SIZE):
+            chunk = locations[start : start + self.TRAJECTORY_CHUNK_SIZE]
+            (
+                segment_indices[start : start + len(chunk)],
+                proportions[start : start + len(chunk)],
+            ) = self._locate(chunk[:, 0], chunk[:, 1])
+
+        times_since_trip_start = self._time_since_trip_start(
+            segment_indices, proportions
         )
-        distance_to_next = Coordinates.distance_between(
-            location, next_stop.coordinates
+        times_until_next_stop = (
+            self._stop_times()[segment_indices + 1]
+            - times_since_trip_start
         )
-        return distance_from_previous / (
-            distance_from_previous + distance_to_next
+        return TrajectoryEstimates(
+            segment_indices,
+            proportions,
+            times_since_trip_start,
+            times_until_next_stop,
+            None
+            if timestamps is None
+            else np.asarray(timestamps, dtype=np.float64)
+            + times_until_next_stop,
         )
 
-    @classmethod
-    def _time_since_trip_start(
-        cls, previous_stop: Stop, next_stop: Stop, location: Coordinates
-    ):
+    def _stop_times(self) -> np.ndarray:
         """
-        Estimates the time it took for the bus to get to its current location.
-        :param previous_stop: the previous stop
-        :param next_stop: the next stop
-        :param location: the current location
-        :return: the time it took for the bus to reach its current location
+        Returns the expected time of each stop of the trip in seconds.
+
+        These are the cumulative times of the trip, or the modelled times
+        if there is a model of the travel times. Any delays of the trip are
+        added to the modelled times.
+        :return: the time of each stop
         """
-        proportion_travelled = cls._proportion_travelled(
-            previous_stop, next_stop, location
+        cumulative_times = self._trip.cumulative_times
+        if self._modelled_times is None:
+            return cumulative_times
+        source, times = self._delayed_times
+        if source is not cumulative_times:
+            times = self._modelled_times + (
+                cumulative_times - self._trip.scheduled_times
+            )
+            self._delayed_times = (cumulative_times, times)
+        return times
+
+    def _locate(
+        self,
+        latitudes: float | np.ndarray,
+        longitudes: float | np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the segment of the trip that each location is on, and how far
+        along that segment the location is.
+
+        The locations are linearly referenced to the route by projecting them
+        onto the closest segment between successive stops.
+        :param latitudes: the latitude(s) of the location(s)
+        :param longitudes: the longitude(s) of the location(s)
+        :return: a tuple of the index of the stop at the start of each segment
+            and the proportion travelled along each segment:
+            (segment_indices, proportions)
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)[..., np.newaxis]
+        longitudes = np.asarray(longitudes, dtype=np.float64)[..., np.newaxis]
+        distances, proportions = _project_onto_segments(
+            self._latitudes, self._longitudes, latitudes, longitudes
         )
+        segment_indices = np.argmin(distances, axis=-1)
+        proportions = np.take_along_axis(
+            proportions, segment_indices[..., np.newaxis], axis=-1
+        )[..., 0]
+        return segment_indices, proportions
+
+    def _time_since_trip_start(
+        self,
+        segment_indices: int | np.ndarray,
+        proportions: float | np.ndarray,
+    ) -> np.ndarray:
+        """
+        Estimates the scheduled time at the bus's current location(s).
+
+        The time is linearly interpolated between the times of the stops at
+        the ends of the segment, by the proportion travelled along it.
+        :param segment_indices: the index of the stop at the start of each
+            segment
+        :param proportions: the proportion travelled along each segment
+        :return: the scheduled time at each location in seconds
+        """
+        times = self._stop_times()
         time_between_stops = (
-            next_stop.time_until_stop - previous_stop.time_until_stop
+            times[segment_indices + 1] - times[segment_indices]
         )
-        time_since_last_stop = proportion_travelled * time_between_stops
-        return previous_stop.time_until_stop + time_since_last_stop
+        return times[segment_indices] + proportions * time_between_stops
+
+
+class TrajectoryEstimates:
+    """
+    The estimated progress of a trip for each location in a trace.
+
+    Attributes
+    ----------
+    segment_indices: np.ndarray
+        the index of the stop at the start of the segment each location is on
+    proportions: np.ndarray
+        the proportion travelled along the segment at each location
+    times_since_trip_start: np.ndarray
+        the scheduled time at each location in seconds
+    times_until_next_stop: np.ndarray
+        the time until the next stop from each location in seconds
+    next_stop_arrival_times: np.ndarray | None
+        the estimated arrival time at the next stop for each location, if the
+        timestamps of the locations were given
+    """
+
+    def __init__(
+        self,
+        segment_indices: np.ndarray,
+        proportions: np.ndarray,
+        times_since_trip_start: np.ndarray,
+        times_until_next_stop: np.ndarray,
+        next_stop_arrival_times: np.ndarray | None,
+    ):
+        """
+        Initializes the estimates with the given parameters.
+        :param segment_indices: the segment index of each location
+        :param proportions: the proportion travelled along each segment
+        :param times_since_trip_start: the scheduled time at each location
+        :param times_until_next_stop: the time until the next stop
+        :param next_stop_arrival_times: the arrival time at the next stop
+        """
+        self.segment_indices = segment_indices
+        self.proportions = proportions
+        self.times_since_trip_start = times_since_trip_start
+        self.times_until_next_stop = times_until_next_stop
+        self.next_stop_arrival_times = next_stop_arrival_times
+
+    @property
+    def next_stop_indices(self) -> np.ndarray:
+        """The index in the trip of the next stop for each location."""
+        return self.segment_indices + 1
+
+    def __len__(self) -> int:
+        return len(self.segment_indices)
@@ -0,0 +1,479 @@
+"""
+Contains the GPS fixes of a bus and the readers of the files that record
+them.
+
+Traces can be read from CSV files with a time, latitude and longitude
+column, from GPX track logs, or from logs of NMEA 0183 sentences. Live
+feeds of NMEA sentences or line-delimited JSON fixes can be read from a
+file, a pipe or a socket. All the readers are generators, so a trace is
+never held in memory as a whole.
+
+The times of the fixes are the times of day in the time zone of the
+schedule, as in GTFS. Times with a UTC offset, such as the times of GPX
+files and NMEA sentences, which are in UTC, are converted to that time zone.
+It is Australia/Brisbane by default, and can be set with the environment
+variable BUS_TRIP_ANNOUNCER_TIME_ZONE or read from the agency table of the
+data.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import socket
+import sys
+import xml.etree.ElementTree as ElementTree
+from collections.abc import Iterator
+from datetime import date, datetime, timezone, tzinfo
+from datetime import time as time_of_day
+from typing import IO
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from bus_trip_announcer.utils import Coordinates
+
+_LATITUDE_COLUMNS = ("latitude", "lat")
+_LONGITUDE_COLUMNS = ("longitude", "lon", "lng")
+_TIME_COLUMNS = ("time", "timestamp")
+
+DEFAULT_TIME_ZONE = "Australia/Brisbane"
+
+logger = logging.getLogger(__name__)
+
+
+def _time_zone_from_environment() -> tzinfo:
+    """
+    Returns the time zone named by the environment variable
+    BUS_TRIP_ANNOUNCER_TIME_ZONE, or the default time zone.
+
+    This runs when the module is imported, so a time zone that is not known
+    is logged as a warning instead of stopping the application from
+    starting, and the default is used.
+    """
+    name = os.environ.get("BUS_TRIP_ANNOUNCER_TIME_ZONE", DEFAULT_TIME_ZONE)
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(
+            "unknown time zone in BUS_TRIP_ANNOUNCER_TIME_ZONE: %s, using %s",
+            name,
+            DEFAULT_TIME_ZONE,
+        )
+        return ZoneInfo(DEFAULT_TIME_ZONE)
+
+
+# the time zone the times of the schedule are in
+SCHEDULE_TIME_ZONE = _time_zone_from_environment()
+
+
+class GPSFix:
+    """
+    The location of the bus at a point in time.
+
+    Attributes
+    ----------
+    time: float | None
+        the time of the fix in seconds since midnight, or None if the source
+        of the fix does not tell it
+    coordinates: Coordinates
+        the location of the bus
+    """
+
+    __slots__ = ("time", "coordinates")
+
+    def __init__(self, time: float | None, coordinates: Coordinates):
+        """
+        Initializes the fix with the given parameters.
+        :param time: the time of the fix in seconds since midnight, or None
+        :param coordinates: the location of the bus
+        """
+        self.time = time
+        self.coordinates = coordinates
+
+    def __repr__(self) -> str:
+        return f"GPSFix({self.time}, {self.coordinates})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GPSFix):
+            return False
+        return (
+            self.time == other.time and self.coordinates == other.coordinates
+        )
+
+
+def parse_time(
+    value: str | float, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> float:
+    """
+    Returns the time of day in seconds since midnight for the given time.
+
+    The time can be a number of seconds, a time such as 08:15:30, or an
+    ISO 8601 date and time, of which only the time of day is kept. A date
+    and time with a UTC offset, or Z for UTC, is converted to the time zone
+    of the schedule first.
+    :param value: the time
+    :param time_zone: the time zone of the schedule
+    :return: the seconds since midnight
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    if "T" in value or "-" in value[1:]:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return _seconds_since_midnight(moment, time_zone)
+
+    # times after midnight can go past 24:00:00, as in GTFS
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_nmea_sentence(
+    sentence: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> GPSFix | None:
+    """
+    Returns the fix in the given NMEA sentence.
+
+    Only RMC and GGA sentences from any talker carry a fix. Other sentences,
+    sentences without a valid fix and sentences with a wrong checksum are
+    ignored. The UTC time of the sentence is converted to the time zone of
+    the schedule, on the date of an RMC sentence, or today for GGA.
+    :param sentence: the sentence
+    :param time_zone: the time zone of the schedule
+    :return: the fix, or None if the sentence does not have a valid fix
+    """
+    sentence = sentence.strip()
+    if not sentence.startswith("$"):
+        return None
+
+    body, _, checksum = sentence[1:].partition("*")
+    if checksum:
+        expected = 0
+        for char in body:
+            expected ^= ord(char)
+        try:
+            if int(checksum[:2], 16) != expected:
+                return None
+        except ValueError:
+            return None
+
+    fields = body.split(",")
+    sentence_type = fields[0][2:]
+    try:
+        if sentence_type == "RMC":
+            if fields[2] != "A":
+                return None
+            time, latitude, longitude = fields[1], fields[3:5], fields[5:7]
+            day = fields[9]
+        elif sentence_type == "GGA":
+            if fields[6] in ("", "0"):
+                return None
+            time, latitude, longitude = fields[1], fields[2:4], fields[4:6]
+            day = ""
+        else:
+            return None
+
+        seconds = float(time[4:])
+        moment = datetime.combine(
+            (
+                date(2000 + int(day[4:6]), int(day[2:4]), int(day[:2]))
+                if day
+                else datetime.now(timezone.utc).date()
+            ),
+            time_of_day(
+                int(time[:2]),
+                int(time[2:4]),
+                int(seconds),
+                round(seconds % 1 * 1e6),
+            ),
+            timezone.utc,
+        )
+        return GPSFix(
+            _seconds_since_midnight(moment, time_zone),
+            Coordinates(
+                _nmea_degrees(*latitude, 2), _nmea_degrees(*longitude, 3)
+            ),
+        )
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_json_fix(
+    line: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> GPSFix | None:
+    """
+    Returns the fix in the given line of JSON.
+
+    The object needs a latitude or lat and a longitude, lon or lng, and can
+    have a time or timestamp. Lines that are not such an object are ignored.
+    :param line: the line
+    :param time_zone: the time zone of the schedule
+    :return: the fix, or None if the line does not have a fix
+    """
+    try:
+        message = json.loads(line)
+        latitude = _first_of(message, _LATITUDE_COLUMNS)
+        longitude = _first_of(message, _LONGITUDE_COLUMNS)
+        time = _first_of(message, _TIME_COLUMNS)
+        if latitude is None or longitude is None:
+            return None
+        return GPSFix(
+            None if time is None else parse_time(time, time_zone),
+            Coordinates(float(latitude), float(longitude)),
+        )
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def parse_fix_line(
+    line: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> GPSFix | None:
+    """
+    Returns the fix in a line of a live feed, which is either an NMEA
+    sentence or a JSON object.
+    :param line: the line
+    :param time_zone: the time zone of the schedule
+    :return: the fix, or None if the line does not have a fix
+    """
+    line = line.strip()
+    if line.startswith("$"):
+        return parse_nmea_sentence(line, time_zone)
+    if line.startswith("{"):
+        return parse_json_fix(line, time_zone)
+    return None
+
+
+def read_fix_stream(
+    stream: IO[str], time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> Iterator[GPSFix]:
+    """
+    Reads the fixes of a live feed as they arrive, one line at a time.
+
+    Lines without a fix are skipped, and when a receiver sends several
+    sentences for the same fix, only the first is kept.
+    :param stream: the feed, such as a pipe or a socket file
+    :param time_zone: the time zone of the schedule
+    :return: the fixes, until the feed ends
+    """
+    previous = None
+    for line in stream:
+        fix = parse_fix_line(line, time_zone)
+        if fix is not None and fix != previous:
+            previous = fix
+            yield fix
+
+
+def open_fix_source(address: str) -> IO[str]:
+    """
+    Opens the source of a live feed of fixes for reading.
+
+    The address is - for the standard input, unix:PATH for a local socket,
+    tcp:HOST:PORT for a TCP socket, or the path of a file or named pipe.
+    :param address: the address of the source
+    :return: the source as a text stream
+    """
+    if address == "-":
+        return sys.stdin
+    if address.startswith("unix:"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(address.removeprefix("unix:"))
+        return _socket_file(connection)
+    if address.startswith("tcp:"):
+        host, _, port = address.removeprefix("tcp:").rpartition(":")
+        return _socket_file(socket.create_connection((host, int(port))))
+    return open(address, encoding="ascii", errors="replace")
+
+
+def read_nmea_trace(
+    path: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> Iterator[GPSFix]:
+    """
+    Reads the fixes of a log of NMEA sentences, one sentence per line.
+
+    When a receiver sends both an RMC and a GGA sentence for the same fix,
+    only the first is kept.
+    :param path: the path of the log
+    :param time_zone: the time zone of the schedule
+    :return: the fixes, in the order of the log
+    """
+    with open(path, encoding="ascii", errors="replace") as file:
+        previous = None
+        for line in file:
+            fix = parse_nmea_sentence(line, time_zone)
+            if fix is not None and fix != previous:
+                previous = fix
+                yield fix
+
+
+def read_gpx_trace(
+    path: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> Iterator[GPSFix]:
+    """
+    Reads the fixes of the track points of a GPX file.
+
+    Track points without a time are skipped.
+    :param path: the path of the GPX file
+    :param time_zone: the time zone of the schedule
+    :return: the fixes, in the order of the file
+    """
+    for _, element in ElementTree.iterparse(path):
+        if _local_name(element.tag) != "trkpt":
+            continue
+        time = None
+        for child in element:
+            if _local_name(child.tag) == "time":
+                time = child.text
+        if time is not None:
+            yield GPSFix(
+                parse_time(time, time_zone),
+                Coordinates(
+                    float(element.attrib["lat"]), float(element.attrib["lon"])
+                ),
+            )
+        element.clear()
+
+
+def read_csv_trace(
+    path: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> Iterator[GPSFix]:
+    """
+    Reads the fixes of a CSV file with a header.
+
+    The file needs a time or timestamp column, a latitude or lat column and
+    a longitude, lon or lng column.
+    :param path: the path of the CSV file
+    :param time_zone: the time zone of the schedule
+    :return: the fixes, in the order of the file
+    """
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        columns = {name.strip().lower(): name for name in reader.fieldnames}
+        time = _find_column(columns, _TIME_COLUMNS, path)
+        latitude = _find_column(columns, _LATITUDE_COLUMNS, path)
+        longitude = _find_column(columns, _LONGITUDE_COLUMNS, path)
+        for row in reader:
+            yield GPSFix(
+                parse_time(row[time], time_zone),
+                Coordinates(float(row[latitude]), float(row[longitude])),
+            )
+
+
+def read_trace(
+    path: str, time_zone: tzinfo = SCHEDULE_TIME_ZONE
+) -> Iterator[GPSFix]:
+    """
+    Reads the fixes of the given trace, choosing the reader from the file
+    extension.
+
+    Files ending in .gpx are read as GPX, files ending in .csv as CSV, and
+    any other file as a log of NMEA sentences.
+    :param path: the path of the trace
+    :param time_zone: the time zone of the schedule
+    :return: the fixes, in the order of the trace
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gpx":
+        return read_gpx_trace(path, time_zone)
+    if extension == ".csv":
+        return read_csv_trace(path, time_zone)
+    return read_nmea_trace(path, time_zone)
+
+
+def read_agency_time_zone(data_directory: str) -> tzinfo | None:
+    """
+    Returns the time zone of the schedule from the agency table of the
+    data, agency.csv or the agency.txt of a GTFS feed.
+    :param data_directory: the directory of the tables
+    :return: the time zone, or None if there is no agency table
+    """
+    for name in ("agency.csv", "agency.txt"):
+        path = os.path.join(data_directory, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for row in csv.DictReader(file):
+                if row.get("agency_timezone"):
+                    return ZoneInfo(row["agency_timezone"].strip())
+    return None
+
+
+def _seconds_since_midnight(moment: datetime, time_zone: tzinfo) -> float:
+    """
+    Returns the time of day of the moment in seconds since midnight, in the
+    time zone of the schedule if the moment has a UTC offset.
+    """
+    if moment.utcoffset() is not None:
+        moment = moment.astimezone(time_zone)
+    return (
+        moment.hour * 3600
+        + moment.minute * 60
+        + moment.second
+        + moment.microsecond / 1e6
+    )
+
+
+def _nmea_degrees(value: str, hemisphere: str, degree_digits: int) -> float:
+    """
+    Returns the degrees of an NMEA latitude or longitude.
+    :param value: the value, in degrees and decimal minutes
+    :param hemisphere: N, S, E or W
+    :param degree_digits: the number of digits of the degrees
+    :return: the signed degrees
+    """
+    degrees = int(value[:degree_digits]) + float(value[degree_digits:]) / 60
+    if hemisphere in ("S", "W"):
+        return -degrees
+    return degrees
+
+
+def _first_of(message: dict, names: tuple):
+    """
+    Returns the value of the first of the given keys in the message.
+    """
+    for name in names:
+        if name in message:
+            return message[name]
+    return None
+
+
+def _socket_file(connection: socket.socket) -> IO[str]:
+    """
+    Returns a text stream that reads from the socket and closes it when
+    the stream is closed.
+    """
+    file = connection.makefile("r", encoding="ascii", errors="replace")
+    # the file holds its own reference, so the socket closes with the file
+    connection.close()
+    return file
+
+
+def _local_name(tag: str) -> str:
+    """
+    Returns the name of the XML tag without its namespace.
+    """
+    return tag.rpartition("}")[2]
+
+
+def _find_column(columns: dict[str, str], names: tuple, path: str) -> str:
+    """
+    Returns the column of the CSV header with one of the given names.
+    :param columns: the columns by their lower case name
+    :param names: the possible names
+    :param path: the path of the CSV file, for the error message
+    :return: the column
+    """
+    for name in names:
+        if name in columns:
+            return columns[name]
+    raise TraceFormatError(f"{path} has no {names[0]} column")
+
+
+class TraceFormatError(Exception):
+    """
+    The trace does not have the expected format.
+    """
@@ -0,0 +1,212 @@
+"""
+Contains the model of the travel times between successive stops, built from
+the scheduled times of all the trips in stop_times.
+
+The scheduled times of a single trip can be far from how long the bus
+usually takes, so the model gives the distribution of the travel time of
+each segment between two stops for each time of the day.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class SegmentTravelTimes:
+    """
+    A lookup table of the travel times of the segments between successive
+    stops.
+
+    The day is split into buckets of bucket_size seconds. For each segment
+    and bucket, the table has the QUANTILES of the travel times of the trips
+    that start the segment in the bucket, or NaN if there are none.
+
+    Attributes
+    ----------
+    segments: tuple[tuple[str, str], ...]
+        the from and to stop ids of each segment
+    travel_times: np.ndarray
+        the quantiles of the travel times in seconds, of shape
+        (number of segments, number of buckets, number of quantiles)
+    bucket_size: int
+        the length of the buckets of the day in seconds
+    """
+
+    QUANTILES = (0.1, 0.5, 0.9)
+
+    def __init__(
+        self,
+        segments: list[tuple[str, str]],
+        travel_times: np.ndarray,
+        bucket_size: int,
+    ):
+        """
+        Initializes the table with the given parameters.
+        :param segments: the from and to stop ids of each segment
+        :param travel_times: the quantiles of the travel times in seconds
+        :param bucket_size: the length of the buckets of the day in seconds
+        """
+        self.segments = tuple(
+            (str(from_stop_id), str(to_stop_id))
+            for from_stop_id, to_stop_id in segments
+        )
+        self.travel_times = np.asarray(travel_times, dtype=np.float32)
+        self.bucket_size = bucket_size
+        self._segment_indices = {
+            segment: index for index, segment in enumerate(self.segments)
+        }
+
+    @classmethod
+    def from_stop_times(
+        cls, stop_times: pd.DataFrame, bucket_size: int = 60 * 60
+    ) -> SegmentTravelTimes:
+        """
+        Builds the table from the stop_times table.
+        :param stop_times: the stop_times table, with the trip_id, stop_id,
+            arrival_time, and stop_sequence columns
+        :param bucket_size: the length of the buckets of the day in seconds
+        :return: the table
+        """
+        import pandas as pd
+
+        stop_times = stop_times.sort_values(["trip_id", "stop_sequence"])
+        trip_ids = stop_times["trip_id"].to_numpy()
+        stop_ids = stop_times["stop_id"].astype(str).to_numpy()
+        times = (
+            pd.to_timedelta(stop_times["arrival_time"])
+            .dt.total_seconds()
+            .to_numpy()
+        )
+
+        # the successive stops of the same trip are the segments
+        is_segment = trip_ids[1:] == trip_ids[:-1]
+        segments = pd.DataFrame(
+            {
+                "from_stop_id": stop_ids[:-1][is_segment],
+                "to_stop_id": stop_ids[1:][is_segment],
+                "bucket": (
+                    times[:-1][is_segment] % SECONDS_PER_DAY // bucket_size
+                ).astype(np.int64),
+                "travel_time": np.diff(times)[is_segment],
+            }
+        )
+        quantiles = (
+            segments.groupby(["from_stop_id", "to_stop_id", "bucket"])[
+                "travel_time"
+            ]
+            .quantile(list(cls.QUANTILES))
+            .unstack()
+        )
+
+        segment_index = quantiles.index.droplevel("bucket").unique()
+        number_of_buckets = -(-SECONDS_PER_DAY // bucket_size)
+        travel_times = np.full(
+            (len(segment_index), number_of_buckets, len(cls.QUANTILES)),
+            np.nan,
+            dtype=np.float32,
+        )
+        rows = segment_index.get_indexer(
+            quantiles.index.droplevel("bucket")
+        )
+        buckets = quantiles.index.get_level_values("bucket").to_numpy()
+        travel_times[rows, buckets] = quantiles.to_numpy()
+        return cls(list(segment_index), travel_times, bucket_size)
+
+    @classmethod
+    def load(cls, path: str) -> SegmentTravelTimes:
+        """
+        Loads a table saved by save.
+        :param path: the path to the file
+        :return: the table
+        """
+        with np.load(path) as data:
+            return cls(
+                list(zip(data["from_stop_ids"], data["to_stop_ids"])),
+                data["travel_times"],
+                int(data["bucket_size"]),
+            )
+
+    def save(self, path: str) -> None:
+        """
+        Saves the table to a compressed numpy file.
+        :param path: the path to the file
+        """
+        np.savez_compressed(
+            path,
+            from_stop_ids=np.array([s[0] for s in self.segments], dtype=str),
+            to_stop_ids=np.array([s[1] for s in self.segments], dtype=str),
+            travel_times=self.travel_times,
+            bucket_size=self.bucket_size,
+        )
+
+    def lookup(
+        self,
+        from_stop_id: str,
+        to_stop_id: str,
+        time: float,
+        quantile: float = 0.5,
+    ) -> float:
+        """
+        Returns the travel time of the segment for a bus starting it at the
+        given time.
+        :param from_stop_id: the id of the stop at the start of the segment
+        :param to_stop_id: the id of the stop at the end of the segment
+        :param time: the time the bus starts the segment in seconds
+        :param quantile: the quantile of the travel time, one of QUANTILES
+        :return: the travel time in seconds, or NaN if it is not known
+        """
+        segment = (str(from_stop_id), str(to_stop_id))
+        index = self._segment_indices.get(segment)
+        if index is None:
+            return np.nan
+        return float(
+            self.travel_times[
+                index, self._bucket(time), self.QUANTILES.index(quantile)
+            ]
+        )
+
+    def trip_travel_times(
+        self,
+        stop_ids: tuple[str, ...],
+        times: np.ndarray,
+        quantile: float = 0.5,
+    ) -> np.ndarray:
+        """
+        Returns the travel time of each segment of a trip.
+        :param stop_ids: the id of each stop of the trip
+        :param times: the scheduled time of each stop in seconds
+        :param quantile: the quantile of the travel times, one of QUANTILES
+        :return: the travel time of each segment in seconds, or NaN where it
+            is not known
+        """
+        indices = np.array(
+            [
+                self._segment_indices.get(segment, -1)
+                for segment in zip(stop_ids, stop_ids[1:])
+            ],
+            dtype=np.intp,
+        )
+        travel_times = np.full(len(indices), np.nan)
+        is_known = indices >= 0
+        travel_times[is_known] = self.travel_times[
+            indices[is_known],
+            self._bucket(np.asarray(times[:-1])[is_known]),
+            self.QUANTILES.index(quantile),
+        ]
+        return travel_times
+
+    def _bucket(self, time: float | np.ndarray) -> int | np.ndarray:
+        """
+        Returns the bucket of the day of the given time(s).
+        :param time: the time(s) in seconds
+        :return: the bucket(s)
+        """
+        bucket = np.asarray(time) % SECONDS_PER_DAY // self.bucket_size
+        return bucket.astype(np.intp)
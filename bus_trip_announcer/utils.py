@@ -4,8 +4,8 @@ Contains utility classes for this application.
 
 import math
 from enum import Enum
-from functools import wraps
-from time import time
+
+from bus_trip_announcer import metrics
 
 
 class Direction(Enum):
@@ -26,6 +26,8 @@ class Coordinates:
     """
     A latitude and longitude coordinates.
 
+    Coordinates are immutable and hashable.
+
     Attributes
     ----------
     latitude: float
@@ -34,9 +36,20 @@ class Coordinates:
         the longitude coordinate
     """
 
+    __slots__ = ("latitude", "longitude")
+
     def __init__(self, latitude: float, longitude: float):
-        self.latitude = latitude
-        self.longitude = longitude
+        object.__setattr__(self, "latitude", latitude)
+        object.__setattr__(self, "longitude", longitude)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Coordinates are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Coordinates are immutable.")
+
+    def __reduce__(self):
+        return Coordinates, (self.latitude, self.longitude)
 
     @classmethod
     def distance_between(
@@ -97,8 +110,13 @@ class Coordinates:
             and self.longitude == other.longitude
         )
 
+    def __hash__(self) -> int:
+        return hash((self.latitude, self.longitude))
+
 
 class Line:
+    __slots__ = ("start", "end")
+
     def __init__(self, start: Coordinates, end: Coordinates):
         self.start = start
         self.end = end
@@ -134,14 +152,12 @@ class Line:
 
 
 def timing(f):
-    @wraps(f)
-    def wrap(*args, **kwargs):
-        ts = time()
-        result = f(*args, **kwargs)
-        te = time()
-        print(
-            f"func:{f.__name__} args:[{args}, {kwargs}] took: {te-ts: 2.4f}s"
-        )
-        return result
+    """
+    Times each call of the function into the function_seconds histogram of
+    the metrics, labelled with the name of the function.
 
-    return wrap
+    Nothing is recorded unless the metrics are enabled.
+    :param f: the function
+    :return: the timed function
+    """
+    return metrics.timed("function_seconds", function=f.__qualname__)(f)
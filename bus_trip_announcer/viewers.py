@@ -2,15 +2,23 @@
 Contains the classes that display the trip information.
 """
 
-import datetime
-from typing import Protocol
+from __future__ import annotations
 
-import flet as ft
+import datetime
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Protocol
 
+from bus_trip_announcer import profiling
 from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.events import AnnouncementEvent
 from bus_trip_announcer.models import TripStatus
 from bus_trip_announcer.utils import Coordinates
 
+if TYPE_CHECKING:
+    import flet as ft
+
 
 class TripViewer(Protocol):
     """
@@ -48,6 +56,7 @@ class CommandLineTripViewer(TripViewer):
         """
         self._trip_announcer = trip_announcer
 
+    @profiling.profiled("render")
     def show_next_stops(self) -> None:
         """Displays the next stops on the commandline."""
         stops_display = "\n".join(
@@ -65,6 +74,14 @@ class CommandLineTripViewer(TripViewer):
 
 
 class FletTripViewer(TripViewer):
+    """
+    Displays the next stops on a Flet page.
+
+    The controls are created once, and each call to show_next_stops only
+    changes the values of the texts that differ from what is displayed, so
+    the page update sent to the client is proportional to what changed.
+    """
+
     NUM_STOPS_DISPLAYED = 5
 
     def __init__(
@@ -72,37 +89,165 @@ class FletTripViewer(TripViewer):
         announcer: TripAnnouncer,
         page: ft.Page,
     ):
+        """
+        Initializes the viewer with the given announcer and page.
+        :param announcer: the announcer that tells the next stops and their
+            times
+        :param page: the page to display the next stops on
+        """
+        import flet as ft
+
         self._trip_announcer = announcer
         self._page = page
 
         if self._page.controls:
             self._page.controls.pop()
 
-    def show_next_stops(self) -> None:
-        if len(self._page.controls) > 1:
-            self._page.controls.pop()
-        next_stops = self._trip_announcer.next_stops
-
-        stop_names = [stop.name for stop in next_stops]
-        stop_times = [
-            self._time_until_stop_format(stop.time_until_stop)
-            for stop in next_stops
+        self._name_texts = [
+            ft.Text(visible=False) for _ in range(self.NUM_STOPS_DISPLAYED)
         ]
-
-        information = ft.Row(
+        self._time_texts = [
+            ft.Text(visible=False) for _ in range(self.NUM_STOPS_DISPLAYED)
+        ]
+        self._display = ft.Column(
             controls=[
-                ft.Column(controls=[ft.Text(name) for name in stop_names]),
-                ft.Column(controls=[ft.Text(time) for time in stop_times]),
+                ft.Text("Next Stops"),
+                ft.Row(
+                    controls=[
+                        ft.Column(controls=self._name_texts),
+                        ft.Column(controls=self._time_texts),
+                    ]
+                ),
             ]
         )
+        self._displayed = False
 
-        self._page.add(
-            ft.Column(
-                controls=[
-                    ft.Text("Next Stops"),
-                    information,
-                ]
-            )
-        )
+    @profiling.profiled("render")
+    def show_next_stops(self) -> None:
+        """Displays the next stops on the page."""
+        next_stops = self._trip_announcer.next_stops
+        next_stops = next_stops[: self.NUM_STOPS_DISPLAYED]
+
+        changed = False
+        for i in range(self.NUM_STOPS_DISPLAYED):
+            if i < len(next_stops):
+                stop = next_stops[i]
+                name = stop.name
+                stop_time = self._time_until_stop_format(
+                    stop.time_until_stop
+                )
+            else:
+                name = stop_time = None
+            changed |= self._set_text(self._name_texts[i], name)
+            changed |= self._set_text(self._time_texts[i], stop_time)
+
+        if not self._displayed:
+            self._displayed = True
+            self._page.add(self._display)
+        elif changed:
+            self._page.update()
+
+    @staticmethod
+    def _set_text(text: ft.Text, value: str | None) -> bool:
+        """
+        Sets the value of the text control, hiding it if there is no value.
+        :param text: the text control
+        :param value: the new value, or None to hide the text
+        :return: whether the control changed
+        """
+        visible = value is not None
+        if text.value == value and text.visible == visible:
+            return False
+        text.value = value
+        text.visible = visible
+        return True
 
 
+class RenderScheduler:
+    """
+    Redraws a viewer only when the next stops of its announcer change, at
+    most max_fps times a second.
+
+    The scheduler subscribes to the announcer, so an update that the rider
+    would not notice does not cause a redraw. Changes that arrive within
+    the same frame are drawn together. While nothing changes the render
+    thread sleeps on an event and costs nothing.
+
+    Attributes
+    ----------
+    max_fps: float
+        the maximum number of redraws a second
+    frames_rendered: int
+        the number of redraws so far
+    """
+
+    def __init__(
+        self,
+        viewer: TripViewer,
+        announcer: TripAnnouncer,
+        max_fps: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes the scheduler with the given parameters.
+        :param viewer: the viewer that is redrawn
+        :param announcer: the announcer whose changes cause redraws
+        :param max_fps: the maximum number of redraws a second
+        :param clock: the clock that times the frames
+        """
+        self._viewer = viewer
+        self.max_fps = max_fps
+        self._clock = clock
+        self.frames_rendered = 0
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._stop_lock = threading.Lock()
+        # the first frame shows the next stops the announcer already has
+        self._changed.set()
+        self._unsubscribe = announcer.subscribe(self._on_events)
+
+    def _on_events(self, _: list[AnnouncementEvent]) -> None:
+        """
+        Marks the viewer as needing a redraw.
+        """
+        self._changed.set()
+
+    def request_render(self) -> None:
+        """
+        Asks for a redraw in the next frame, whether or not the next stops
+        have changed.
+        """
+        self._changed.set()
+
+    def run(self) -> None:
+        """
+        Redraws the viewer whenever it needs it until stop is called.
+
+        Blocks the calling thread.
+        """
+        frame_interval = 1 / self.max_fps
+        while True:
+            self._changed.wait()
+            if self._stopped.is_set():
+                break
+            self._changed.clear()
+            frame_start = self._clock()
+            self._viewer.show_next_stops()
+            self.frames_rendered += 1
+
+            remaining = frame_interval - (self._clock() - frame_start)
+            if remaining > 0 and self._stopped.wait(remaining):
+                break
+
+    def stop(self, _=None) -> None:
+        """
+        Stops the render loop and unsubscribes from the announcer.
+
+        Can be used directly as the page's close handler.
+        """
+        with self._stop_lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+        self._changed.set()
+        self._unsubscribe()
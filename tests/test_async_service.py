@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import os
+import threading
+
+from bus_trip_announcer.async_service import AsyncAnnouncerService
+from bus_trip_announcer.database.database import CSVDatabase, Query
+from bus_trip_announcer.sessions import SessionManager
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+class BlockingDatabase:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get(self, query):
+        self.calls += 1
+        self.release.wait(5)
+        return query.table_name
+
+
+class TestAsyncAnnouncerService:
+    def test_find_trip_and_update_location(self):
+        async def run():
+            async with AsyncAnnouncerService(
+                SessionManager(), CSVDatabase(TEST_NETWORK)
+            ) as service:
+                trip = await service.find_trip(
+                    66,
+                    SEQDirection.ZERO,
+                    Coordinates(-27.485, 153.027),
+                    datetime.timedelta(hours=8, minutes=30),
+                )
+                service.open_session("rider", trip)
+                return await service.update_location(
+                    "rider", Coordinates(-27.4970, 153.0250)
+                )
+
+        next_stops = asyncio.run(run())
+        assert [stop.name for stop in next_stops] == ["UQ Lakes"]
+
+    def test_timeout(self):
+        database = BlockingDatabase()
+
+        async def run():
+            service = AsyncAnnouncerService(SessionManager(), database)
+            try:
+                await service.get(Query("stops"), timeout=0.01)
+            except asyncio.TimeoutError:
+                timed_out = True
+            else:
+                timed_out = False
+            database.release.set()
+            result = await service.get(Query("stops"), timeout=1)
+            service.close()
+            return timed_out, result
+
+        assert asyncio.run(run()) == (True, "stops")
+
+    def test_timeout_when_full(self):
+        database = BlockingDatabase()
+
+        async def run():
+            service = AsyncAnnouncerService(
+                SessionManager(), database, max_pending=1
+            )
+            first = asyncio.ensure_future(service.get(Query("a")))
+            await asyncio.sleep(0.01)
+            # the second call cannot get a pending slot before its timeout
+            try:
+                await service.get(Query("b"), timeout=0.05)
+            except asyncio.TimeoutError:
+                timed_out = True
+            else:
+                timed_out = False
+            database.release.set()
+            await first
+            service.close()
+            return timed_out
+
+        assert asyncio.run(run())
+        assert database.calls == 1
+
+    def test_cancelled_calls_do_not_start(self):
+        database = BlockingDatabase()
+
+        async def run():
+            service = AsyncAnnouncerService(
+                SessionManager(), database, max_workers=1
+            )
+            first = asyncio.ensure_future(service.get(Query("a")))
+            second = asyncio.ensure_future(service.get(Query("b")))
+            await asyncio.sleep(0.05)
+            second.cancel()
+            await asyncio.sleep(0.05)
+            database.release.set()
+            await first
+            service.close()
+
+        asyncio.run(run())
+        assert database.calls == 1
+
+    def test_loop_is_not_blocked(self):
+        database = BlockingDatabase()
+
+        async def run():
+            service = AsyncAnnouncerService(SessionManager(), database)
+            slow = asyncio.ensure_future(service.get(Query("stops")))
+            await asyncio.sleep(0.01)
+            # the loop still runs other work while the query blocks
+            assert not slow.done()
+            database.release.set()
+            await slow
+            service.close()
+
+        asyncio.run(run())
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from bus_trip_announcer.benchmarks import (
+    BENCHMARKS,
+    compare,
+    main,
+    mann_whitney_u,
+    run_benchmarks,
+    time_function,
+)
+
+
+def results(samples):
+    return {
+        "results": {
+            name: {
+                "samples": values,
+                "median": sorted(values)[len(values) // 2],
+            }
+            for name, values in samples.items()
+        }
+    }
+
+
+class TestMannWhitneyU:
+    def test_slower(self):
+        baseline = [1.0 + i / 100 for i in range(15)]
+        current = [1.5 + i / 100 for i in range(15)]
+        assert mann_whitney_u(baseline, current) < 0.001
+
+    def test_faster_is_not_slower(self):
+        baseline = [1.5 + i / 100 for i in range(15)]
+        current = [1.0 + i / 100 for i in range(15)]
+        assert mann_whitney_u(baseline, current) > 0.99
+
+    def test_same(self):
+        samples = [1.0 + i / 100 for i in range(15)]
+        assert mann_whitney_u(samples, samples) == pytest.approx(0.5, abs=0.1)
+
+    def test_ties(self):
+        assert mann_whitney_u([1.0] * 10, [1.0] * 10) == 0.5
+
+
+class TestCompare:
+    def test_flags_significant_slowdowns(self):
+        baseline = results(
+            {
+                "slower": [1.0 + i / 100 for i in range(15)],
+                "noisy": [1.0 + i / 100 for i in range(15)],
+            }
+        )
+        current = results(
+            {
+                "slower": [1.5 + i / 100 for i in range(15)],
+                "noisy": [1.01 + i / 100 for i in range(15)],
+                "new": [1.0] * 15,
+            }
+        )
+        comparisons = {
+            comparison["name"]: comparison
+            for comparison in compare(baseline, current)
+        }
+
+        assert comparisons["slower"]["regressed"]
+        assert comparisons["slower"]["ratio"] == pytest.approx(1.5, rel=0.05)
+        assert not comparisons["noisy"]["regressed"]
+        assert "new" not in comparisons
+
+    def test_main_exit_status(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        current = tmp_path / "current.json"
+        baseline.write_text(json.dumps(results({"a": [1.0, 1.1] * 8})))
+        current.write_text(json.dumps(results({"a": [2.0, 2.1] * 8})))
+
+        assert main(["compare", str(baseline), str(baseline)]) == 0
+        assert main(["compare", str(baseline), str(current)]) == 1
+
+
+class TestRunBenchmarks:
+    def test_time_function(self):
+        samples = time_function(lambda: None, repeat=3, min_time=0.001)
+        assert len(samples) == 3
+        assert all(sample > 0 for sample in samples)
+
+    def test_every_benchmark_runs(self, tmp_path):
+        output = run_benchmarks(
+            ["small"], repeat=2, min_time=0, data_directory=str(tmp_path)
+        )
+        assert set(output["results"]) == {
+            f"{name}[small]" for name in BENCHMARKS
+        }
+        assert output["metadata"]["sizes"] == ["small"]
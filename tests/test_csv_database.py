@@ -0,0 +1,158 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+from bus_trip_announcer.database.database import (
+    CSVDatabase,
+    Query,
+    get_shared_database,
+)
+from bus_trip_announcer.database.finders import TripFinder, get_stop_registry
+from bus_trip_announcer.utils import SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+def trip_stop_times_query():
+    return (
+        Query("trips")
+        .where(lambda row: row["route_id"] == "66-1")
+        .select("trip_id")
+        .join("stop_times", "trip_id")
+        .order_by("arrival_time")
+        .select(["trip_id", "stop_id"])
+    )
+
+
+class TestCSVDatabaseProfile:
+    def test_profile_matches_result(self):
+        database = CSVDatabase(TEST_NETWORK)
+        result, profile = database.get_with_profile(trip_stop_times_query())
+
+        assert result.equals(database.get(trip_stop_times_query()))
+        assert [operation.operation for operation in profile.operations] == [
+            "SCAN",
+            "WHERE",
+            "SELECT",
+            "JOIN",
+            "ORDER_BY",
+            "SELECT",
+        ]
+        assert profile.operations[-1].output_rows == len(result)
+        assert profile.operations[1].input_rows == 4
+        assert profile.operations[1].output_rows == 3
+        assert profile.operations[3].detail == "stop_times on trip_id"
+        assert profile.elapsed > 0
+        assert profile.slowest in profile.operations
+
+    def test_source(self):
+        database = CSVDatabase(TEST_NETWORK)
+        _, first = database.get_with_profile(trip_stop_times_query())
+        _, second = database.get_with_profile(trip_stop_times_query())
+
+        assert first.operations[0].source == "disk"
+        assert first.operations[3].source == "disk"
+        assert second.operations[3].source == "cache"
+        assert second.operations[4].source == "memory"
+
+    def test_logged_when_profiling(self, caplog):
+        database = CSVDatabase(TEST_NETWORK, profile_queries=True)
+        with caplog.at_level(
+            logging.DEBUG, logger="bus_trip_announcer.database.database"
+        ):
+            database.get(Query("routes").select("route_id"))
+
+        (record,) = caplog.records
+        assert record.query_plan["table"] == "routes"
+        assert "SCAN routes [disk]" in record.getMessage()
+
+
+class CountingDatabase(CSVDatabase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    def _read_table(self, table_name):
+        self.reads.append(table_name)
+        # give the other threads time to ask for the table as well
+        time.sleep(0.05)
+        return super()._read_table(table_name)
+
+
+class TestCSVDatabaseCache:
+    def test_table_read_once_by_many_threads(self):
+        database = CountingDatabase(TEST_NETWORK)
+        results = []
+
+        def query():
+            results.append(database.get(Query("stop_times")))
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert database.reads == ["stop_times"]
+        assert len(results) == 8
+        assert all(result.equals(results[0]) for result in results)
+
+    def test_uncached_tables_read_every_time(self):
+        database = CountingDatabase(TEST_NETWORK)
+        database.get(Query("routes"))
+        database.get(Query("routes"))
+        assert database.reads == ["routes", "routes"]
+
+    def test_cached_table_not_changed_by_queries(self):
+        database = CSVDatabase(TEST_NETWORK)
+        table = database.get(Query("stop_times"))
+        table["stop_id"] = "changed"
+        table["new_column"] = 1
+
+        table = database.get(Query("stop_times"))
+        assert "new_column" not in table.columns
+        assert (table["stop_id"] != "changed").all()
+
+    def test_preload(self):
+        database = CountingDatabase(
+            TEST_NETWORK, cached_tables=["stops", "trips"]
+        )
+        database.preload()
+        database.get(Query("stops"))
+        database.get(Query("trips"))
+        assert database.reads == ["stops", "trips"]
+
+
+class TestGetSharedDatabase:
+    def test_shared_by_directory(self):
+        database = get_shared_database(TEST_NETWORK)
+        same = get_shared_database(os.path.join(TEST_NETWORK, "."))
+        assert database is same
+
+    def test_relative_directory_after_chdir(self, tmp_path, monkeypatch):
+        shutil.copytree(TEST_NETWORK, tmp_path / "network")
+        (tmp_path / "elsewhere").mkdir()
+        monkeypatch.chdir(tmp_path)
+        database = get_shared_database("network")
+        monkeypatch.chdir(tmp_path / "elsewhere")
+        assert len(database.get(Query("routes"))) > 0
+
+    def test_sessions_share_stops_and_tables(self):
+        finders = [
+            TripFinder(get_shared_database(TEST_NETWORK)) for _ in range(3)
+        ]
+        trips = [
+            finder._create_trip("T1", 66, SEQDirection.ZERO)
+            for finder in finders
+        ]
+        database = get_shared_database(TEST_NETWORK)
+
+        assert all(
+            trip.stop_registry is get_stop_registry(database) for trip in trips
+        )
+        _, source = database._load_table("stop_times")
+        assert source == "cache"
@@ -0,0 +1,153 @@
+import datetime
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.events import (
+    AnnouncementEvent,
+    AnnouncementEventType,
+    DebouncedSubscriber,
+)
+from bus_trip_announcer.models import Stop, Trip, TripStatus
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.utils import Coordinates, Direction
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _announcer() -> TripAnnouncer:
+    trip = Trip(
+        100,
+        Direction.NORTH,
+        [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+            Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=10)),
+            Stop("c", Coordinates(0, 2), datetime.timedelta(minutes=20)),
+            Stop("d", Coordinates(0, 3), datetime.timedelta(minutes=30)),
+        ],
+    )
+    announcer = TripAnnouncer(TripStatus())
+    announcer.next_stops_finder = NextStopsFinder(trip)
+    return announcer
+
+
+def _move(announcer: TripAnnouncer, longitude: float) -> None:
+    announcer.trip_status.coordinates = Coordinates(0.01, longitude)
+    announcer.update_next_stops()
+
+
+def _types(events):
+    return [(event.type, event.stop.name) for event in events]
+
+
+class TestAnnouncementEvent:
+    def test_to_dict(self):
+        event = AnnouncementEvent(
+            AnnouncementEventType.NEXT_STOP_CHANGED,
+            Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=2)),
+            1,
+        )
+        assert event.to_dict() == {
+            "event": "NEXT_STOP_CHANGED",
+            "stop_index": 1,
+            "stop": "b",
+            "seconds_until_stop": 120.0,
+        }
+
+    def test_to_dict_without_stop(self):
+        event = AnnouncementEvent(
+            AnnouncementEventType.NEXT_STOP_CHANGED, None, 4
+        )
+        assert event.to_dict()["stop"] is None
+        assert event.to_dict()["seconds_until_stop"] is None
+
+
+class TestTripAnnouncerEvents:
+    def test_first_update(self):
+        announcer = _announcer()
+        received = []
+        announcer.subscribe(received.append)
+        _move(announcer, 0.5)
+        assert _types(received[0]) == [
+            (AnnouncementEventType.NEXT_STOP_CHANGED, "b")
+        ]
+
+    def test_no_events_without_visible_change(self):
+        announcer = _announcer()
+        received = []
+        _move(announcer, 0.49)
+        announcer.subscribe(received.append)
+        # 5 minutes until b both times
+        _move(announcer, 0.491)
+        assert received == []
+
+    def test_eta_minute_changed(self):
+        announcer = _announcer()
+        received = []
+        _move(announcer, 0.5)
+        announcer.subscribe(received.append)
+        _move(announcer, 0.6)
+        assert _types(received[0]) == [
+            (AnnouncementEventType.ETA_MINUTE_CHANGED, "b")
+        ]
+
+    def test_stops_passed(self):
+        announcer = _announcer()
+        received = []
+        _move(announcer, 0.5)
+        announcer.subscribe(received.append)
+        _move(announcer, 2.5)
+        assert _types(received[0]) == [
+            (AnnouncementEventType.STOP_PASSED, "b"),
+            (AnnouncementEventType.STOP_PASSED, "c"),
+            (AnnouncementEventType.NEXT_STOP_CHANGED, "d"),
+        ]
+
+    def test_unsubscribe(self):
+        announcer = _announcer()
+        received = []
+        unsubscribe = announcer.subscribe(received.append)
+        unsubscribe()
+        _move(announcer, 0.5)
+        assert received == []
+
+
+class TestDebouncedSubscriber:
+    def test_coalesces_within_interval(self):
+        announcer = _announcer()
+        clock = FakeClock()
+        received = []
+        subscriber = DebouncedSubscriber(received.append, 10, clock)
+        announcer.subscribe(subscriber)
+
+        _move(announcer, 0.5)
+        assert len(received) == 1
+
+        clock.now = 1
+        _move(announcer, 0.6)
+        _move(announcer, 1.5)
+        _move(announcer, 1.7)
+        assert len(received) == 1
+
+        subscriber.flush()
+        subscriber.close()
+        assert _types(received[1]) == [
+            (AnnouncementEventType.STOP_PASSED, "b"),
+            (AnnouncementEventType.NEXT_STOP_CHANGED, "c"),
+            (AnnouncementEventType.ETA_MINUTE_CHANGED, "c"),
+        ]
+
+    def test_delivers_after_interval(self):
+        clock = FakeClock()
+        received = []
+        subscriber = DebouncedSubscriber(received.append, 0.01, clock)
+        announcer = _announcer()
+        announcer.subscribe(subscriber)
+        _move(announcer, 0.5)
+        clock.now = 1
+        _move(announcer, 0.6)
+        assert len(received) == 2
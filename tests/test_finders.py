@@ -0,0 +1,79 @@
+import datetime
+import logging
+import os
+import shutil
+
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import (
+    DirectionFinder,
+    TripFinder,
+    get_stop_registry,
+)
+from bus_trip_announcer.models import Stop
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+class TestDirectionFinder:
+    def test_get_headsigns(self):
+        finder = DirectionFinder(CSVDatabase(TEST_NETWORK))
+        assert sorted(finder.get_headsigns(66)) == ["RBWH", "UQ Lakes"]
+
+    def test_get_direction(self):
+        finder = DirectionFinder(CSVDatabase(TEST_NETWORK))
+        assert finder.get_direction(66, "RBWH") == SEQDirection.ONE
+
+
+class TestTripFinder:
+    def test_get_trip(self):
+        finder = TripFinder(CSVDatabase(TEST_NETWORK))
+        trip = finder.get_trip(
+            66,
+            SEQDirection.ZERO,
+            Coordinates(-27.485, 153.027),
+            datetime.timedelta(hours=8, minutes=30),
+        )
+        assert trip.trip_id == "T2"
+        assert trip.names == (
+            "Cultural Centre",
+            "South Bank",
+            "Boggo Road",
+            "UQ Lakes",
+        )
+        assert trip.stops[1] == Stop(
+            "South Bank",
+            Coordinates(-27.48, 153.025),
+            datetime.timedelta(hours=9, minutes=5),
+        )
+
+    def test_get_trip_by_id(self):
+        finder = TripFinder(CSVDatabase(TEST_NETWORK))
+        trip = finder.get_trip_by_id("T3", 66, SEQDirection.ONE)
+        assert trip.trip_id == "T3"
+        assert trip.direction == SEQDirection.ONE
+        assert list(trip.stop_ids) == ["4", "3", "2", "1"]
+
+    def test_trips_share_stop_registry(self):
+        database = CSVDatabase(TEST_NETWORK)
+        finder = TripFinder(database)
+        trip1 = finder._create_trip("T1", 66, SEQDirection.ZERO)
+        trip2 = finder._create_trip("T3", 66, SEQDirection.ONE)
+        assert trip1.stop_registry is trip2.stop_registry
+        assert trip1.stop_registry is get_stop_registry(database)
+        assert trip1.names[0] is trip2.names[-1]
+        assert list(trip2.stop_ids) == ["4", "3", "2", "1"]
+
+    def test_unknown_stops_are_logged(self, tmp_path, caplog):
+        shutil.copytree(TEST_NETWORK, tmp_path, dirs_exist_ok=True)
+        with open(tmp_path / "stop_times.csv", "a") as file:
+            file.write("99,T1,99,08:30:00,99\n")
+        finder = TripFinder(CSVDatabase(str(tmp_path)))
+        with caplog.at_level(logging.WARNING):
+            trip = finder._create_trip("T1", 66, SEQDirection.ZERO)
+
+        assert "99" not in trip.stop_ids
+        assert len(trip) == 4
+        assert "T1" in caplog.text and "99" in caplog.text
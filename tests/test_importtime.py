@@ -0,0 +1,58 @@
+from bus_trip_announcer.importtime import (
+    ImportRecord,
+    ImportReport,
+    measure,
+    parse_importtime,
+)
+
+OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   _io
+import time:        50 |       1000 |     numpy.core
+import time:       200 |       1500 |   numpy
+import time:       300 |       2000 | bus_trip_announcer.models
+Traceback lines are ignored
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(OUTPUT)
+
+    assert [record.module for record in records] == [
+        "_io",
+        "numpy.core",
+        "numpy",
+        "bus_trip_announcer.models",
+    ]
+    assert [record.depth for record in records] == [1, 2, 1, 0]
+    assert records[2].self_time == 200e-6
+    assert records[2].cumulative_time == 1500e-6
+
+
+class TestImportReport:
+    def test_report(self):
+        report = ImportReport(
+            "bus_trip_announcer.models", parse_importtime(OUTPUT)
+        )
+
+        assert report.total_time == 2000e-6
+        assert report.slowest(2)[1].module == "numpy"
+        assert report.heavy_modules() == []
+        assert "bus_trip_announcer.models: 2.0 ms" in report.format()
+
+    def test_heavy_modules(self):
+        records = [
+            ImportRecord("pandas", 0.1, 0.3, 0),
+            ImportRecord("x", 0, 0, 0),
+        ]
+        report = ImportReport("x", records)
+        assert report.heavy_modules() == ["pandas"]
+
+
+def test_measure():
+    report = measure("bus_trip_announcer.metrics")
+
+    assert "bus_trip_announcer.metrics" in report.modules
+    # the modules imported when the interpreter starts are left out
+    assert "site" not in report.modules
+    assert report.total_time > 0
@@ -0,0 +1,119 @@
+import threading
+
+from bus_trip_announcer.ingestion import FixIngestor
+from bus_trip_announcer.utils import Coordinates
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFixIngestor:
+    def test_drain(self):
+        processed = []
+        ingestor = FixIngestor(lambda *fix: processed.append(fix), max_rate=20)
+        ingestor.start()
+        try:
+            for longitude in range(3):
+                ingestor.submit("rider", Coordinates(0, longitude))
+                assert ingestor.drain(1)
+        finally:
+            ingestor.stop()
+        assert processed[-1] == ("rider", Coordinates(0, 2))
+        assert ingestor.processed_fixes == len(processed)
+
+    def test_coalesces_fixes(self):
+        processed = []
+        ingestor = FixIngestor(lambda *fix: processed.append(fix))
+        for longitude in range(5):
+            ingestor.submit("rider1", Coordinates(0, longitude))
+        ingestor.submit("rider2", Coordinates(1, 1))
+        assert ingestor.process_pending() == 2
+        assert processed == [
+            ("rider1", Coordinates(0, 4)),
+            ("rider2", Coordinates(1, 1)),
+        ]
+        assert ingestor.coalesced_fixes == 4
+
+    def test_rate_limit(self):
+        clock = FakeClock()
+        processed = []
+        ingestor = FixIngestor(
+            lambda *fix: processed.append(fix), max_rate=1, clock=clock
+        )
+        ingestor.submit("rider", Coordinates(0, 0))
+        ingestor.process_pending()
+        ingestor.submit("rider", Coordinates(0, 1))
+        ingestor.submit("rider", Coordinates(0, 2))
+        assert ingestor.process_pending() == 0
+        clock.now = 1
+        assert ingestor.process_pending() == 1
+        assert processed[-1] == ("rider", Coordinates(0, 2))
+
+    def test_backpressure(self):
+        ingestor = FixIngestor(lambda *_: None, max_queued_sessions=1)
+        assert ingestor.submit("rider1", Coordinates(0, 0))
+        # fixes of a waiting session are still accepted
+        assert ingestor.submit("rider1", Coordinates(0, 1))
+        assert not ingestor.submit("rider2", Coordinates(0, 0), block=False)
+        assert not ingestor.submit("rider2", Coordinates(0, 0), timeout=0.01)
+        assert ingestor.rejected_fixes == 2
+        ingestor.process_pending()
+        assert ingestor.submit("rider2", Coordinates(0, 0), block=False)
+
+    def test_worker(self):
+        done = threading.Event()
+        processed = []
+
+        def process(session_id, coordinates):
+            processed.append(session_id)
+            done.set()
+
+        ingestor = FixIngestor(process)
+        ingestor.start()
+        ingestor.submit("rider", Coordinates(0, 0))
+        assert done.wait(5)
+        ingestor.stop(5)
+        assert processed == ["rider"]
+
+    def test_stop_keeps_waiting_fixes(self):
+        started = threading.Event()
+        release = threading.Event()
+        processed = []
+
+        def process(session_id, coordinates):
+            processed.append(session_id)
+            started.set()
+            release.wait(5)
+
+        ingestor = FixIngestor(process)
+        ingestor.start()
+        ingestor.submit("rider1", Coordinates(0, 0))
+        assert started.wait(5)
+        # these fixes wait while the worker is busy with the first one
+        ingestor.submit("rider2", Coordinates(0, 1))
+        ingestor.submit("rider3", Coordinates(0, 2))
+
+        stopper = threading.Thread(target=ingestor.stop, args=(5,))
+        stopper.start()
+        while ingestor._running:
+            stopper.join(0.001)
+        release.set()
+        stopper.join(5)
+
+        assert processed == ["rider1"]
+        assert ingestor.number_waiting == 2
+        assert ingestor.process_pending() == 2
+        assert processed == ["rider1", "rider2", "rider3"]
+
+    def test_forget(self):
+        processed = []
+        ingestor = FixIngestor(lambda *fix: processed.append(fix))
+        ingestor.submit("rider", Coordinates(0, 0))
+        ingestor.forget("rider")
+        assert ingestor.process_pending() == 0
+        assert ingestor.number_waiting == 0
@@ -0,0 +1,123 @@
+import datetime
+import io
+import threading
+
+import pytest
+
+from bus_trip_announcer.announcer import TripAnnouncer
+from bus_trip_announcer.inputs import (
+    EndOfFeedError,
+    FletInputDevice,
+    NoDirectionError,
+    StreamInputDevice,
+)
+from bus_trip_announcer.models import TripStatus
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+
+class FakePage:
+    def __init__(self):
+        self.controls = []
+        self.added = threading.Event()
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        self.added.set()
+
+
+class TestFletInputDevice:
+    def test_input_route_number_wakes_on_click(self):
+        page = FakePage()
+        announcer = TripAnnouncer(TripStatus())
+        device = FletInputDevice(None, announcer, page)
+
+        thread = threading.Thread(target=device.input_route_number)
+        thread.start()
+        assert page.added.wait(5)
+        _, field, button = page.controls[0].controls
+        field.value = "66"
+        button.on_click(None)
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert announcer.trip_status.route_number == 66
+        assert page.controls == []
+
+    def test_input_coordinates_wakes_on_click(self):
+        page = FakePage()
+        announcer = TripAnnouncer(TripStatus())
+        device = FletInputDevice(None, announcer, page)
+
+        thread = threading.Thread(target=device.input_coordinates)
+        thread.start()
+        assert page.added.wait(5)
+        row1, row2, button = page.controls[0].controls
+        row1.controls[1].value = "-27.5"
+        row2.controls[1].value = "153.0"
+        button.on_click(None)
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert announcer.trip_status.coordinates == Coordinates(-27.5, 153.0)
+
+
+class FakeIngestor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, session_id, coordinates):
+        self.submitted.append(coordinates)
+
+
+FEED = (
+    '{"lat": -27.475, "lon": 153.021, "time": "08:01:00"}\n'
+    "not a fix\n"
+    '{"lat": -27.476, "lon": 153.022, "time": "08:01:01"}\n'
+    '{"lat": -27.477, "lon": 153.023}\n'
+)
+
+
+class TestStreamInputDevice:
+    def test_input_all(self):
+        announcer = TripAnnouncer(TripStatus())
+        device = StreamInputDevice(
+            None, announcer, io.StringIO(FEED), 66, SEQDirection.ZERO
+        )
+        device.input_route_number()
+        device.input_direction()
+        device.input_coordinates()
+        device.input_time()
+
+        assert announcer.trip_status.route_number == 66
+        assert announcer.trip_status.direction == SEQDirection.ZERO
+        assert announcer.trip_status.coordinates == Coordinates(
+            -27.475, 153.021
+        )
+        assert device.time == datetime.timedelta(hours=8, minutes=1)
+
+    def test_update_pushes_every_fix(self):
+        announcer = TripAnnouncer(TripStatus())
+        device = StreamInputDevice(None, announcer, io.StringIO(FEED))
+        device.fix_ingestor = FakeIngestor()
+        device.input_coordinates()
+        device.input_coordinates(update=True)
+
+        assert device.fix_ingestor.submitted == [
+            Coordinates(-27.476, 153.022),
+            Coordinates(-27.477, 153.023),
+        ]
+        assert device.fixes_read == 3
+
+    def test_end_of_feed(self):
+        device = StreamInputDevice(
+            None, TripAnnouncer(TripStatus()), io.StringIO("")
+        )
+        with pytest.raises(EndOfFeedError):
+            device.input_coordinates()
+
+    def test_no_direction(self):
+        device = StreamInputDevice(
+            None, TripAnnouncer(TripStatus()), io.StringIO(FEED), 66
+        )
+        with pytest.raises(NoDirectionError):
+            device.input_direction()
@@ -0,0 +1,121 @@
+import gc
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from bus_trip_announcer.load_test import (
+    GCMonitor,
+    LoadTest,
+    create_riders,
+    current_rss,
+    main,
+)
+from bus_trip_announcer.sessions import SessionManager
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+class TestRider:
+    def test_stays_near_trip(self):
+        rider = create_riders(TEST_NETWORK, 1, seed=1)[0]
+        trip = rider.trip
+        duration = trip.scheduled_times[-1] - trip.scheduled_times[0]
+        for _ in range(20):
+            coordinates = rider.next_fix(60)
+            assert 0 <= rider.trip_time < duration
+            assert (
+                trip.latitudes.min() - 0.001
+                <= coordinates.latitude
+                <= trip.latitudes.max() + 0.001
+            )
+
+    def test_riders_share_trips(self):
+        riders = create_riders(TEST_NETWORK, 20, number_of_trips=2)
+        assert len({rider.trip.trip_id for rider in riders}) == 2
+
+    def test_seed(self):
+        first = create_riders(TEST_NETWORK, 5, seed=3)
+        second = create_riders(TEST_NETWORK, 5, seed=3)
+        assert [rider.trip_time for rider in first] == [
+            rider.trip_time for rider in second
+        ]
+        assert np.isclose(
+            first[0].next_fix(10).latitude, second[0].next_fix(10).latitude
+        )
+
+    def test_no_usable_trips(self, tmp_path):
+        shutil.copytree(TEST_NETWORK, tmp_path, dirs_exist_ok=True)
+        (tmp_path / "stop_times.csv").write_text(
+            ",trip_id,stop_id,arrival_time,stop_sequence\n"
+            "0,T1,1,08:00:00,1\n"
+        )
+        with pytest.raises(ValueError):
+            create_riders(str(tmp_path), 5)
+
+
+class TestGCMonitor:
+    def test_pauses(self):
+        monitor = GCMonitor()
+        monitor.install()
+        try:
+            gc.collect()
+        finally:
+            monitor.uninstall()
+        pauses, collections = monitor.drain()
+
+        assert collections >= 1
+        assert len(pauses) == collections
+        assert monitor.drain() == ([], 0)
+
+
+def test_current_rss():
+    assert current_rss() > 0
+
+
+class TestLoadTest:
+    def test_run(self):
+        riders = create_riders(TEST_NETWORK, 10)
+        test = LoadTest(SessionManager(), riders, fix_rate=20, workers=2)
+        samples = []
+        summary = test.run(0.5, 0.1, samples.append)
+
+        assert len(samples) >= 4
+        assert summary["fixes"] > 0
+        assert summary["fixes"] >= sum(sample["fixes"] for sample in samples)
+        assert summary["latency"]["p50"] <= summary["latency"]["p99"]
+        for sample in samples:
+            assert {
+                "fixes_per_second",
+                "latency",
+                "rss_bytes",
+                "rss_growth_bytes",
+                "gc_pause_max_s",
+                "max_lag_s",
+            } <= sample.keys()
+
+
+def test_main(tmp_path, capsys):
+    output = tmp_path / "samples.ndjson"
+    main(
+        [
+            TEST_NETWORK,
+            "--riders",
+            "4",
+            "--duration",
+            "0.3",
+            "--sample-interval",
+            "0.1",
+            "--output",
+            str(output),
+        ]
+    )
+    samples = [json.loads(line) for line in output.read_text().splitlines()]
+    summary = json.loads(capsys.readouterr().err)
+
+    assert samples
+    assert summary["riders"] == 4
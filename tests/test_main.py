@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from bus_trip_announcer.main import main, run_headless
+from bus_trip_announcer.utils import SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+FEED = "\n".join(
+    json.dumps({"time": time, "lat": latitude, "lon": longitude})
+    for time, latitude, longitude in [
+        ("08:01:00", -27.4750, 153.0214),
+        ("08:01:01", -27.4751, 153.0215),
+        ("08:06:40", -27.4850, 153.0267),
+        ("08:15:00", -27.4970, 153.0250),
+    ]
+)
+
+
+class TestRunHeadless:
+    def test_announcements(self):
+        output = io.StringIO()
+        fixes = run_headless(
+            io.StringIO(FEED), 66, SEQDirection.ZERO, output, TEST_NETWORK
+        )
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        assert fixes == 4
+        # the fixes of the feed arrive faster than they are processed, so
+        # some of them are coalesced, but every stop passed is announced
+        passed = [
+            line["stop"] for line in lines if line["event"] == "STOP_PASSED"
+        ]
+        assert passed == ["South Bank", "Boggo Road"]
+        assert (lines[0]["event"], lines[0]["stop"]) == (
+            "NEXT_STOP_CHANGED",
+            "South Bank",
+        )
+        assert (lines[-1]["event"], lines[-1]["stop"]) == (
+            "NEXT_STOP_CHANGED",
+            "UQ Lakes",
+        )
+
+    def test_main(self, tmp_path, capsys):
+        feed = tmp_path / "feed.ndjson"
+        feed.write_text(FEED)
+        main(
+            ["headless", str(feed), "--route", "66", "--data", TEST_NETWORK]
+        )
+        assert "UQ Lakes" in capsys.readouterr().out
+
+
+def test_entry_points_do_not_import_flet_or_pandas():
+    code = (
+        "import sys, bus_trip_announcer.main; "
+        "print('flet' in sys.modules, 'pandas' in sys.modules)"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+    )
+    assert process.stdout.split() == ["False", "False"]
@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import threading
+
+import pytest
+
+from bus_trip_announcer import metrics
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import DirectionFinder
+from bus_trip_announcer.metrics import Histogram, MetricTypeError, Registry
+from bus_trip_announcer.utils import timing
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+class TestHistogram:
+    def test_quantiles(self):
+        histogram = Histogram("latency", {})
+        for i in range(1, 1001):
+            histogram.observe(i / 1000)
+
+        assert histogram.count == 1000
+        assert histogram.sum == pytest.approx(500.5)
+        assert histogram.quantile(0.5) == pytest.approx(0.5, rel=0.2)
+        assert histogram.quantile(0.99) == pytest.approx(0.99, rel=0.2)
+        assert histogram.quantile(1) == 1
+        assert histogram.quantile(0) == pytest.approx(0.001)
+
+    def test_single_value(self):
+        histogram = Histogram("latency", {})
+        histogram.observe(0.25)
+        assert histogram.quantile(0.5) == 0.25
+
+    def test_empty(self):
+        histogram = Histogram("latency", {})
+        assert math.isnan(histogram.quantile(0.5))
+        assert histogram.snapshot() == {"count": 0, "sum": 0.0}
+
+    def test_snapshot_and_reset(self):
+        histogram = Histogram("latency", {})
+        histogram.observe(0.25)
+        snapshot = histogram.snapshot_and_reset()
+        assert snapshot["count"] == 1
+        assert snapshot["p50"] == 0.25
+        assert histogram.snapshot() == {"count": 0, "sum": 0.0}
+
+    def test_snapshot_and_reset_keeps_concurrent_values(self):
+        histogram = Histogram("latency", {})
+        done = threading.Event()
+
+        def observe():
+            for _ in range(20000):
+                histogram.observe(0.001)
+            done.set()
+
+        thread = threading.Thread(target=observe)
+        thread.start()
+        total = 0
+        while not done.is_set():
+            total += histogram.snapshot_and_reset()["count"]
+        thread.join()
+        total += histogram.snapshot_and_reset()["count"]
+        assert total == 20000
+
+
+class TestRegistry:
+    def test_disabled_records_nothing(self):
+        registry = Registry()
+        with registry.timer("query_seconds"):
+            pass
+        registry.count("queries_total")
+
+        @registry.timed("call_seconds")
+        def call():
+            return 1
+
+        assert call() == 1
+        assert registry.snapshot() == {"counters": {}, "histograms": {}}
+
+    def test_enabled_records(self):
+        registry = Registry(enabled=True)
+        with registry.timer("query_seconds", table="stops"):
+            pass
+        registry.count("queries_total", 2, table="stops")
+
+        @registry.timed("call_seconds")
+        def call():
+            return 1
+
+        call()
+        call()
+        snapshot = registry.snapshot()
+
+        assert snapshot["counters"]["queries_total"] == [
+            {"labels": {"table": "stops"}, "value": 2}
+        ]
+        assert snapshot["histograms"]["query_seconds"][0]["count"] == 1
+        assert snapshot["histograms"]["call_seconds"][0]["count"] == 2
+        assert json.loads(registry.to_json()) == snapshot
+
+    def test_prometheus(self):
+        registry = Registry(enabled=True)
+        registry.histogram("query_seconds", table="stops").observe(0.5)
+        registry.count("queries_total", table='a "b"')
+        text = registry.to_prometheus()
+
+        assert "# TYPE query_seconds summary\n" in text
+        assert 'query_seconds{table="stops",quantile="0.5"} 0.5\n' in text
+        assert 'query_seconds_count{table="stops"} 1\n' in text
+        assert "# TYPE queries_total counter\n" in text
+        assert 'queries_total{table="a \\"b\\""} 1\n' in text
+
+    def test_reset_keeps_metrics(self):
+        registry = Registry(enabled=True)
+        counter = registry.counter("queries_total")
+        counter.inc()
+        registry.reset()
+        assert counter.value == 0
+        assert registry.counter("queries_total") is counter
+
+    def test_metric_type(self):
+        registry = Registry()
+        registry.counter("queries_total")
+        with pytest.raises(MetricTypeError):
+            registry.histogram("queries_total")
+
+
+class TestInstrumentation:
+    def setup_method(self):
+        metrics.enable()
+        metrics.reset()
+
+    def teardown_method(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_finder_and_database_are_timed(self):
+        DirectionFinder(CSVDatabase(TEST_NETWORK)).get_headsigns(66)
+        snapshot = metrics.snapshot()["histograms"]
+
+        assert snapshot["direction_finder_seconds"][0]["count"] == 1
+        assert {
+            entry["labels"]["table"]
+            for entry in snapshot["database_query_seconds"]
+            if entry["count"]
+        } == {"routes"}
+
+    def test_timing(self):
+        @timing
+        def add(a, b):
+            return a + b
+
+        assert add(1, 2) == 3
+        histograms = metrics.snapshot()["histograms"]["function_seconds"]
+        assert [entry["count"] for entry in histograms if entry["count"]] == [
+            1
+        ]
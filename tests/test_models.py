@@ -1,3 +1,4 @@
+import pickle
 
 from bus_trip_announcer.models import *
 from bus_trip_announcer.utils import Coordinates
@@ -129,6 +130,26 @@ class TestStop:
         )
 
 
+    def test_stop_is_immutable(self):
+        stop = Stop("name", Coordinates(0, 0), datetime.timedelta())
+        try:
+            stop.name = "other"
+        except AttributeError:
+            pass
+        else:
+            assert False
+
+    def test_stop_hash(self):
+        stop1 = Stop("name", Coordinates(0, 0), datetime.timedelta(minutes=1))
+        stop2 = Stop("name", Coordinates(0, 0), datetime.timedelta(minutes=1))
+        assert hash(stop1) == hash(stop2)
+        assert len({stop1, stop2}) == 1
+
+    def test_stop_pickle(self):
+        stop = Stop("name", Coordinates(0, 0), datetime.timedelta(minutes=1))
+        assert pickle.loads(pickle.dumps(stop)) == stop
+
+
 class TestRoute:
     def test_eq_same(self):
         assert Route(
@@ -161,3 +182,110 @@ class TestRoute:
             Direction.NORTH,
             [Stop("name2", Coordinates(1, 1), datetime.timedelta(minutes=1))],
         )
+
+
+class TestTrip:
+    def test_cumulative_times(self):
+        trip = Trip(
+            100,
+            Direction.NORTH,
+            [
+                Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+                Stop("b", Coordinates(3, 4), datetime.timedelta(minutes=2)),
+                Stop("c", Coordinates(3, 5), datetime.timedelta(minutes=3)),
+            ],
+        )
+        assert list(trip.cumulative_times) == [0, 120, 180]
+
+    def test_cumulative_times_empty(self):
+        trip = Trip(100, Direction.NORTH, [])
+        assert len(trip.cumulative_times) == 0
+
+    def test_stops_view(self):
+        stops = [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+            Stop("b", Coordinates(3, 4), None),
+        ]
+        trip = Trip(100, Direction.NORTH, stops)
+        assert isinstance(trip.stops, StopsView)
+        assert trip.names == ("a", "b")
+        assert trip.stops == stops
+        assert trip == Trip(100, Direction.NORTH, list(trip.stops))
+
+    def test_from_arrays(self):
+        trip = Trip.from_arrays(
+            100, Direction.NORTH, ["a"], np.array([1.0]), [2.0], [60.0]
+        )
+        assert trip.stops == [
+            Stop("a", Coordinates(1, 2), datetime.timedelta(minutes=1))
+        ]
+
+
+class TestStopsView:
+    def _trip(self):
+        return Trip(
+            100,
+            Direction.NORTH,
+            [
+                Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+                Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=2)),
+                Stop("c", Coordinates(0, 2), datetime.timedelta(minutes=5)),
+            ],
+        )
+
+    def test_getitem_offsets_time(self):
+        next_stops = StopsView(self._trip(), 1, 60)
+        assert len(next_stops) == 2
+        assert next_stops[0] == Stop(
+            "b", Coordinates(0, 1), datetime.timedelta(minutes=1)
+        )
+        assert next_stops[-1] == Stop(
+            "c", Coordinates(0, 2), datetime.timedelta(minutes=4)
+        )
+
+    def test_getitem_out_of_range(self):
+        next_stops = StopsView(self._trip(), 2)
+        try:
+            next_stops[1]
+        except IndexError:
+            pass
+        else:
+            assert False
+
+    def test_slice_is_view(self):
+        first = StopsView(self._trip(), 0, 60)[:1]
+        assert isinstance(first, StopsView)
+        assert first == [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=-1))
+        ]
+
+    def test_times_until_stops(self):
+        assert list(StopsView(self._trip(), 1, 60).times_until_stops) == [
+            60,
+            240,
+        ]
+
+    def test_eq_empty(self):
+        assert StopsView(self._trip(), 3) == []
+
+
+class TestStopRegistry:
+    def test_indices_of(self):
+        registry = StopRegistry(
+            [10, "11"], ["a", "b"], np.array([0.0, 1.0]), np.array([0.0, 1.0])
+        )
+        assert list(registry.indices_of(["11", 10, 12])) == [1, 0, -1]
+
+    def test_from_registry(self):
+        registry = StopRegistry(
+            [10, 11], ["a", "b"], np.array([0.0, 1.0]), np.array([2.0, 3.0])
+        )
+        trip = Trip.from_registry(
+            100, Direction.NORTH, registry, [1, 0], [0.0, 60.0], "T1"
+        )
+        assert trip.trip_id == "T1"
+        assert trip.stop_ids == ("11", "10")
+        assert trip.stops == [
+            Stop("b", Coordinates(1, 3), datetime.timedelta()),
+            Stop("a", Coordinates(0, 2), datetime.timedelta(minutes=1)),
+        ]
@@ -0,0 +1,76 @@
+import logging
+import os
+import pstats
+
+import pytest
+
+from bus_trip_announcer import profiling
+from bus_trip_announcer.database.database import CSVDatabase, Query
+from bus_trip_announcer.profiling import UnknownStageError, profiled
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+@profiled("get_trip")
+def find(value):
+    return [value] * 1000
+
+
+class TestProfiled:
+    def teardown_method(self):
+        profiling.disable()
+
+    def test_disabled_writes_nothing(self, tmp_path):
+        profiling.configure([], str(tmp_path))
+        assert find(1) == [1] * 1000
+        assert os.listdir(tmp_path) == []
+
+    def test_sampled_captures(self, tmp_path):
+        profiling.configure("get_trip", str(tmp_path), sample_rate=0.5)
+        for _ in range(4):
+            find(1)
+
+        captures = sorted(os.listdir(tmp_path))
+        assert len(captures) == 2
+        assert all(capture.startswith("get_trip-") for capture in captures)
+        stats = pstats.Stats(str(tmp_path / captures[0]))
+        assert any(name == "find" for _, _, name in stats.stats)
+
+    def test_memory_capture(self, tmp_path):
+        profiling.configure(
+            ["get_trip"], str(tmp_path), sample_rate=1, memory=True
+        )
+        find(1)
+
+        (report,) = [
+            name for name in os.listdir(tmp_path) if name.endswith(".txt")
+        ]
+        assert (tmp_path / report).read_text().startswith("total size")
+
+    def test_database_load(self, tmp_path):
+        profiling.configure("database_load", str(tmp_path), sample_rate=1)
+        CSVDatabase(TEST_NETWORK).get(Query("routes"))
+
+        (capture,) = os.listdir(tmp_path)
+        assert capture.startswith("database_load-")
+
+    def test_unknown_stage(self):
+        with pytest.raises(UnknownStageError):
+            profiling.configure("parse")
+        with pytest.raises(UnknownStageError):
+            profiled("parse")
+
+    def test_environment_unknown_stage(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.setenv("BUS_TRIP_ANNOUNCER_PROFILE", "get_trip,gettrip")
+        monkeypatch.setenv("BUS_TRIP_ANNOUNCER_PROFILE_DIR", str(tmp_path))
+        monkeypatch.setenv("BUS_TRIP_ANNOUNCER_PROFILE_SAMPLE_RATE", "x")
+        with caplog.at_level(logging.WARNING):
+            profiling.configure_from_environment()
+
+        assert "gettrip" in caplog.text
+        assert "SAMPLE_RATE" in caplog.text
+        find(1)
+        (capture,) = os.listdir(tmp_path)
+        assert capture.startswith("get_trip-")
@@ -0,0 +1,149 @@
+import datetime
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from bus_trip_announcer.models import Stop, Trip
+from bus_trip_announcer.realtime import (
+    DelayUpdater,
+    StopTimeUpdate,
+    TripUpdate,
+    parse_feed,
+)
+from bus_trip_announcer.sessions import SessionManager
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+FEED = {
+    "header": {"gtfsRealtimeVersion": "2.0"},
+    "entity": [
+        {
+            "id": "1",
+            "tripUpdate": {
+                "trip": {"tripId": "T1"},
+                "stopTimeUpdate": [
+                    {"stopSequence": 2, "arrival": {"delay": 120}},
+                    {"stopId": "2", "departure": {"delay": 60}},
+                    {"stopSequence": 4, "scheduleRelationship": "NO_DATA"},
+                ],
+            },
+        },
+        {"id": "2", "vehicle": {"trip": {"tripId": "T1"}}},
+        {
+            "id": "3",
+            "trip_update": {
+                "trip": {"trip_id": "T9"},
+                "stop_time_update": [{"stop_id": "1", "arrival": {"delay": 5}}],
+            },
+        },
+    ],
+}
+
+
+def _example_trip() -> Trip:
+    trip = Trip(
+        66,
+        SEQDirection.ZERO,
+        [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+            Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=10)),
+            Stop("c", Coordinates(0, 2), datetime.timedelta(minutes=20)),
+            Stop("d", Coordinates(0, 3), datetime.timedelta(minutes=30)),
+        ],
+        "T1",
+    )
+    return trip
+
+
+class TestParseFeed:
+    def test_parse_feed(self):
+        trip_updates = parse_feed(FEED)
+        assert [update.trip_id for update in trip_updates] == ["T1", "T9"]
+        updates = trip_updates[0].stop_time_updates
+        assert [(u.stop_sequence, u.stop_id, u.delay) for u in updates] == [
+            (2, None, 120),
+            (None, "2", 60),
+        ]
+
+
+class TestTripUpdate:
+    def test_delays_propagate(self):
+        trip = _example_trip()
+        # the stop ids of a trip built from stops are their positions
+        update = TripUpdate(
+            "T1",
+            [StopTimeUpdate(None, "2", 60), StopTimeUpdate(2, None, 120)],
+        )
+        assert list(update.delays(trip)) == [0, 120, 60, 60]
+
+
+class TestDelayUpdater:
+    def test_apply_updates_sessions_on_trip(self):
+        manager = SessionManager()
+        announcer = manager.open_session("rider1", _example_trip())
+        other_trip = _example_trip()
+        other_trip.trip_id = "T2"
+        other = manager.open_session("rider2", other_trip)
+        manager.update_location("rider1", Coordinates(0, 1.5))
+        manager.update_location("rider2", Coordinates(0, 1.5))
+
+        updater = DelayUpdater(manager)
+        assert updater.apply(parse_feed(FEED)) == 1
+        # rider1's trip is 2 minutes late at b, then 1 minute late from c
+        assert announcer.next_stops[0].time_until_stop == datetime.timedelta(
+            minutes=4, seconds=30
+        )
+        assert other.next_stops[0].time_until_stop == datetime.timedelta(
+            minutes=5
+        )
+
+    def test_apply_is_idempotent(self):
+        trip = _example_trip()
+        updates = parse_feed(FEED)
+        trip.apply_delays(updates[0].delays(trip))
+        trip.apply_delays(updates[0].delays(trip))
+        assert list(trip.cumulative_times) == [0, 720, 1260, 1860]
+        assert list(trip.scheduled_times) == [0, 600, 1200, 1800]
+
+    def test_apply_to_modelled_finder(self):
+        trip = _example_trip()
+        # the model expects 5 minutes between each stop instead of 10
+        travel_times = SegmentTravelTimes.from_stop_times(
+            pd.DataFrame(
+                {
+                    "trip_id": ["X"] * 4,
+                    "stop_id": [0, 1, 2, 3],
+                    "arrival_time": [
+                        "00:00:00",
+                        "00:05:00",
+                        "00:10:00",
+                        "00:15:00",
+                    ],
+                    "stop_sequence": [1, 2, 3, 4],
+                }
+            )
+        )
+        finder = NextStopsFinder(trip, travel_times)
+        location = Coordinates(0, 1.5)
+        next_stop = finder.get_next_stops(location)[0]
+        assert next_stop.time_until_stop == datetime.timedelta(
+            minutes=2, seconds=30
+        )
+
+        trip.apply_delays(parse_feed(FEED)[0].delays(trip))
+        # b is 2 minutes late and c is 1 minute late, so c is 4 minutes
+        # after b instead of 5
+        next_stop = finder.get_next_stops(location)[0]
+        assert next_stop.time_until_stop == datetime.timedelta(minutes=2)
+
+    def test_follow_stream(self):
+        manager = SessionManager()
+        manager.open_session("rider", _example_trip())
+        stream = io.StringIO(json.dumps(FEED) + "\n\n")
+        DelayUpdater(manager).follow(stream)
+        assert np.array_equal(
+            manager.get_trip("T1").cumulative_times, [0, 720, 1260, 1860]
+        )
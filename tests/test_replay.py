@@ -0,0 +1,117 @@
+import io
+import json
+import os
+
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import TripFinder
+from bus_trip_announcer.replay import ReplayEngine, SimulatedClock, main
+from bus_trip_announcer.traces import GPSFix
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+FIXES = [
+    GPSFix(8 * 3600 + 60, Coordinates(-27.4750, 153.0214)),
+    GPSFix(8 * 3600 + 61, Coordinates(-27.4751, 153.0215)),
+    GPSFix(8 * 3600 + 400, Coordinates(-27.4850, 153.0267)),
+    GPSFix(8 * 3600 + 900, Coordinates(-27.4970, 153.0250)),
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestSimulatedClock:
+    def test_speed(self):
+        clock = FakeClock()
+        simulated = SimulatedClock(10, clock, clock.sleep)
+        simulated.advance_to(100)
+        simulated.advance_to(150)
+        clock.now += 1
+        simulated.advance_to(200)
+
+        assert clock.sleeps == [5, 4]
+        assert simulated.now == 200
+
+    def test_as_fast_as_possible(self):
+        clock = FakeClock()
+        simulated = SimulatedClock(None, clock, clock.sleep)
+        simulated.advance_to(100)
+        simulated.advance_to(1000)
+        assert clock.sleeps == []
+
+
+class TestReplayEngine:
+    def replay(self):
+        output = io.StringIO()
+        engine = ReplayEngine(
+            TripFinder(CSVDatabase(TEST_NETWORK)),
+            66,
+            SEQDirection.ZERO,
+            output,
+        )
+        report = engine.replay(FIXES)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        return report, lines
+
+    def test_announcements(self):
+        _, lines = self.replay()
+        events = [(line["event"], line["stop"]) for line in lines]
+        assert events == [
+            ("NEXT_STOP_CHANGED", "South Bank"),
+            ("STOP_PASSED", "South Bank"),
+            ("NEXT_STOP_CHANGED", "Boggo Road"),
+            ("STOP_PASSED", "Boggo Road"),
+            ("NEXT_STOP_CHANGED", "UQ Lakes"),
+        ]
+        assert lines[0]["time"] == FIXES[0].time
+
+    def test_report(self):
+        report, lines = self.replay()
+        summary = report.summary()
+
+        assert report.fixes == 4
+        assert report.announcements == len(lines)
+        assert summary["stages"]["read"]["count"] == 4
+        assert summary["stages"]["find_trip"]["count"] == 1
+        assert summary["stages"]["next_stops"]["count"] == 4
+        assert report.fixes_per_second > 0
+
+    def test_main(self, tmp_path, capsys):
+        trace = tmp_path / "trace.csv"
+        trace.write_text(
+            "time,latitude,longitude\n"
+            + "".join(
+                f"{fix.time},{fix.coordinates.latitude},"
+                f"{fix.coordinates.longitude}\n"
+                for fix in FIXES
+            )
+        )
+        output = tmp_path / "announcements.ndjson"
+        main(
+            [
+                str(trace),
+                "--route",
+                "66",
+                "--data",
+                TEST_NETWORK,
+                "--output",
+                str(output),
+                "--json-report",
+            ]
+        )
+
+        assert len(output.read_text().splitlines()) == 5
+        assert json.loads(capsys.readouterr().err)["fixes"] == 4
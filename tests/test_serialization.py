@@ -0,0 +1,176 @@
+import datetime
+import pickle
+
+import numpy as np
+
+from bus_trip_announcer.models import Stop, StopRegistry, Trip
+from bus_trip_announcer.serialization import (
+    _HEADER,
+    _VIEW,
+    SerializationError,
+    decode_stops,
+    decode_trip,
+    encode_stops,
+    encode_trip,
+)
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.utils import Coordinates, Direction, SEQDirection
+
+
+def _example_trip() -> Trip:
+    return Trip(
+        66,
+        SEQDirection.ONE,
+        [
+            Stop("Cultural Centre", Coordinates(-27.47, 153.02), None),
+            Stop(
+                "South Bank",
+                Coordinates(-27.48, 153.025),
+                datetime.timedelta(minutes=5),
+            ),
+            Stop(
+                "Cultural Centre",
+                Coordinates(-27.47, 153.02),
+                datetime.timedelta(minutes=9),
+            ),
+        ],
+        trip_id="T1",
+    )
+
+
+class TestTripEncoding:
+    def test_round_trip(self):
+        trip = _example_trip()
+        decoded = decode_trip(encode_trip(trip))
+        assert decoded == trip
+        assert decoded.trip_id == "T1"
+        assert decoded.direction is SEQDirection.ONE
+
+    def test_round_trip_without_trip_id(self):
+        trip = Trip(100, Direction.NORTH, [])
+        decoded = decode_trip(encode_trip(trip))
+        assert decoded == trip
+        assert decoded.trip_id is None
+
+    def test_decode_is_zero_copy(self):
+        buffer = bytearray(encode_trip(_example_trip()))
+        decoded = decode_trip(memoryview(buffer))
+        assert np.shares_memory(
+            decoded.cumulative_times, np.frombuffer(buffer, dtype=np.uint8)
+        )
+
+    def test_smaller_than_pickle(self):
+        trip = _example_trip()
+        stops = list(trip.stops)
+        assert len(encode_trip(trip)) < len(pickle.dumps(stops))
+
+    def test_decode_bad_magic(self):
+        buffer = bytearray(encode_trip(_example_trip()))
+        buffer[0:4] = b"XXXX"
+        try:
+            decode_trip(buffer)
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+    def test_decode_truncated(self):
+        try:
+            decode_trip(encode_trip(_example_trip())[:-1])
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+    def test_decode_wrong_kind(self):
+        try:
+            decode_trip(encode_stops(_example_trip().stops))
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+    def test_decode_bad_string_index(self):
+        buffer = bytearray(encode_trip(_example_trip()))
+        # the first name index, after the three float64 arrays of 3 stops
+        name_indices_offset = _HEADER.size + _VIEW.size + 3 * 3 * 8
+        buffer[name_indices_offset : name_indices_offset + 4] = bytes(
+            [255, 0, 0, 0]
+        )
+        try:
+            decode_trip(buffer)
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+    def test_decode_bad_string_offsets(self):
+        buffer = bytearray(encode_trip(_example_trip()))
+        # the first string offset, after the arrays and indices of 3 stops
+        string_offsets_offset = _HEADER.size + _VIEW.size + 3 * 32
+        buffer[string_offsets_offset : string_offsets_offset + 4] = bytes(
+            [255, 0, 0, 0]
+        )
+        try:
+            decode_trip(buffer)
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+    def test_decode_onto_registry(self):
+        registry = StopRegistry(
+            ["9", "2", "1", "0"],
+            ["Other", "Cultural Centre", "South Bank", "Cultural Centre"],
+            np.array([0, -27.47, -27.48, -27.47]),
+            np.array([0, 153.02, 153.025, 153.02]),
+        )
+        trip = _example_trip()
+        decoded = decode_trip(encode_trip(trip), registry)
+        assert decoded.stop_registry is registry
+        assert decoded == trip
+
+    def test_decode_onto_registry_unknown_stop(self):
+        registry = StopRegistry(["0"], ["Cultural Centre"], [-27.47], [153.02])
+        try:
+            decode_trip(encode_trip(_example_trip()), registry)
+        except SerializationError:
+            pass
+        else:
+            assert False
+
+
+class TestStopsEncoding:
+    def test_round_trip_view(self):
+        next_stops = _example_trip().stops[1:2]
+        next_stops.time_offset = 60
+        decoded = decode_stops(encode_stops(next_stops))
+        assert decoded == next_stops
+        assert decoded.start == 1
+
+    def test_round_trip_modelled_times(self):
+        class TravelTimes:
+            # every segment takes 100 seconds
+            def trip_travel_times(self, stop_ids, scheduled_times):
+                return np.full(len(stop_ids) - 1, 100.0)
+
+        trip = Trip.from_arrays(
+            66,
+            SEQDirection.ONE,
+            ["a", "b", "c", "d"],
+            np.zeros(4),
+            np.arange(4.0),
+            np.array([0.0, 300.0, 600.0, 900.0]),
+        )
+        finder = NextStopsFinder(trip, TravelTimes())
+        next_stops = finder.get_next_stops(Coordinates(0, 0.25))
+        decoded = decode_stops(encode_stops(next_stops))
+        assert decoded == next_stops
+        assert list(decoded.times_until_stops) == [75, 175, 275]
+
+    def test_round_trip_list(self):
+        stops = [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=1)),
+            Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=2)),
+        ]
+        assert decode_stops(encode_stops(stops)) == stops
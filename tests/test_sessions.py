@@ -0,0 +1,89 @@
+import datetime
+
+from bus_trip_announcer.models import Stop, Trip
+from bus_trip_announcer.sessions import SessionManager, SessionNotFoundError
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _example_trip(trip_id="T1") -> Trip:
+    return Trip(
+        66,
+        SEQDirection.ZERO,
+        [
+            Stop("a", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+            Stop("b", Coordinates(0, 1), datetime.timedelta(minutes=10)),
+            Stop("c", Coordinates(0, 2), datetime.timedelta(minutes=20)),
+        ],
+        trip_id,
+    )
+
+
+class TestSessionManager:
+    def test_update_location(self):
+        manager = SessionManager()
+        manager.open_session("rider", _example_trip())
+        next_stops = manager.update_location("rider", Coordinates(0, 1.5))
+        assert [stop.name for stop in next_stops] == ["c"]
+        assert next_stops[0].time_until_stop == datetime.timedelta(minutes=5)
+        assert manager.get_announcer("rider").next_stops is next_stops
+
+    def test_sessions_share_trip(self):
+        manager = SessionManager()
+        announcer1 = manager.open_session("rider1", _example_trip())
+        announcer2 = manager.open_session("rider2", _example_trip())
+        assert manager.number_of_trips == 1
+        assert announcer1.next_stops_finder is announcer2.next_stops_finder
+        assert announcer1.trip_status is not announcer2.trip_status
+        assert len(manager.get_announcers_on_trip("T1")) == 2
+
+        manager.update_location("rider1", Coordinates(0, 0.5))
+        manager.update_location("rider2", Coordinates(0, 1.5))
+        assert len(announcer1.next_stops) == 2
+        assert len(announcer2.next_stops) == 1
+
+    def test_close_session_removes_trip(self):
+        manager = SessionManager()
+        manager.open_session("rider1", _example_trip())
+        manager.open_session("rider2", _example_trip())
+        manager.close_session("rider1")
+        assert manager.get_trip("T1") is not None
+        manager.close_session("rider2")
+        assert manager.get_trip("T1") is None
+        assert len(manager) == 0
+
+    def test_reopen_session(self):
+        manager = SessionManager()
+        manager.open_session("rider", _example_trip("T1"))
+        manager.open_session("rider", _example_trip("T2"))
+        assert len(manager) == 1
+        assert manager.get_trip("T1") is None
+        assert manager.get_trip("T2") is not None
+
+    def test_unknown_session(self):
+        try:
+            SessionManager().update_location("rider", Coordinates(0, 0))
+        except SessionNotFoundError:
+            pass
+        else:
+            assert False
+
+    def test_expire_idle_sessions(self):
+        clock = FakeClock()
+        manager = SessionManager(idle_timeout=60, clock=clock)
+        manager.open_session("rider1", _example_trip())
+        clock.now = 30
+        manager.open_session("rider2", _example_trip())
+        clock.now = 50
+        manager.update_location("rider1", Coordinates(0, 0))
+        clock.now = 100
+        assert manager.expire_idle_sessions() == ["rider2"]
+        assert "rider1" in manager
+        assert "rider2" not in manager
@@ -1,31 +1,50 @@
+import csv
+import datetime
+import os
 
-from old_database import LocalDatabase
+import numpy as np
 
 from bus_trip_announcer.stops_finder import *
+from bus_trip_announcer.utils import Direction
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def _trip_from_file(
+    file_name: str, route_number: int, direction: Direction
+) -> Trip:
+    """
+    Reads the stops of the trip of a route in the given direction from one
+    of the test stop files.
+    """
+    stops = []
+    with open(os.path.join(DATA_DIRECTORY, file_name)) as file:
+        for row in csv.DictReader(file):
+            if (
+                int(row["route_number"]) != route_number
+                or row["direction"] != direction.name
+            ):
+                continue
+            hours, minutes = row["time_until_stop"].split(":")
+            stops.append(
+                Stop(
+                    row["stop_name"],
+                    Coordinates(
+                        float(row["latitude"]), float(row["longitude"])
+                    ),
+                    datetime.timedelta(hours=int(hours), minutes=int(minutes)),
+                )
+            )
+    return Trip(route_number, direction, stops)
 
 
 class TestNextStopsFinder:
-    # get_next_stops tests also tests for _get_next_stop_index
-    def test_get_next_stops_empty(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database1.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(12345, Direction.NORTH, Coordinates(45.6, 123.4))
-        stops = stops_finder.get_next_stops(user)
-        assert stops == []
-
-    def test_get_next_stops_full(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database1.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.NORTH, Coordinates(45.6, 123.4))
-        stops = stops_finder.get_next_stops(user)
+    # get_next_stops tests also tests for _locate
+    def test_get_next_stops_at_start(self):
+        trip = _trip_from_file("test_database1.csv", 200, Direction.NORTH)
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.6, 123.4))
+        # the first stop has been reached, so it is not a next stop
         assert stops == [
-            Stop(
-                "Brisbane Street",
-                Coordinates(45.6, 123.4),
-                datetime.timedelta(minutes=0),
-            ),
             Stop(
                 "Marble Mountains",
                 Coordinates(45.8, 124.0),
@@ -39,11 +58,8 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_at_stop(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database1.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.NORTH, Coordinates(45.8, 124.0))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file("test_database1.csv", 200, Direction.NORTH)
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.8, 124.0))
         assert stops == [
             Stop(
                 "Marble Mountains",
@@ -58,11 +74,8 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_between_stops(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database1.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.NORTH, Coordinates(45.7, 123.4))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file("test_database1.csv", 200, Direction.NORTH)
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.7, 123.7))
         assert stops == [
             Stop(
                 "Marble Mountains",
@@ -79,25 +92,22 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_past_end(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database1.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.NORTH, Coordinates(46.4, 123.4))
-        stops = stops_finder.get_next_stops(user)
-        assert stops == []
-
-    def test_get_next_stops_direction_north(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database_direction.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(100, Direction.NORTH, Coordinates(45.6, 123.4))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file("test_database1.csv", 200, Direction.NORTH)
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(46.4, 123.4))
         assert stops == [
             Stop(
-                "Stop A",
-                Coordinates(45.6, 123.4),
+                "World's Best Banh Mi Shop",
+                Coordinates(46.3, 123.4),
                 datetime.timedelta(minutes=0),
             ),
+        ]
+
+    def test_get_next_stops_direction_north(self):
+        trip = _trip_from_file(
+            "test_database_direction.csv", 100, Direction.NORTH
+        )
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.6, 123.4))
+        assert stops == [
             Stop(
                 "Stop B",
                 Coordinates(45.8, 123.5),
@@ -106,17 +116,11 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_direction_south(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database_direction.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(100, Direction.SOUTH, Coordinates(45.8, 123.5))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file(
+            "test_database_direction.csv", 100, Direction.SOUTH
+        )
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.8, 123.5))
         assert stops == [
-            Stop(
-                "Stop B",
-                Coordinates(45.8, 123.5),
-                datetime.timedelta(minutes=0),
-            ),
             Stop(
                 "Stop A",
                 Coordinates(45.6, 123.4),
@@ -125,17 +129,11 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_direction_east(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database_direction.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.EAST, Coordinates(45.6, 123.4))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file(
+            "test_database_direction.csv", 200, Direction.EAST
+        )
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.6, 123.4))
         assert stops == [
-            Stop(
-                "Stop A",
-                Coordinates(45.6, 123.4),
-                datetime.timedelta(minutes=0),
-            ),
             Stop(
                 "Stop C",
                 Coordinates(45.5, 124.0),
@@ -144,20 +142,102 @@ class TestNextStopsFinder:
         ]
 
     def test_get_next_stops_direction_west(self):
-        database = LocalDatabase()
-        database.set_database_file("../data/test_database_direction.csv")
-        stops_finder = NextStopsFinder(database)
-        user = TripStatus(200, Direction.WEST, Coordinates(45.5, 124.0))
-        stops = stops_finder.get_next_stops(user)
+        trip = _trip_from_file(
+            "test_database_direction.csv", 200, Direction.WEST
+        )
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(45.5, 124.0))
         assert stops == [
-            Stop(
-                "Stop C",
-                Coordinates(45.5, 124.0),
-                datetime.timedelta(minutes=0),
-            ),
             Stop(
                 "Stop A",
                 Coordinates(45.6, 123.4),
                 datetime.timedelta(minutes=5),
             ),
         ]
+
+
+def _example_trip() -> Trip:
+    return Trip(
+        200,
+        Direction.NORTH,
+        [
+            Stop("Stop A", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+            Stop("Stop B", Coordinates(0, 1), datetime.timedelta(minutes=10)),
+            Stop("Stop C", Coordinates(0, 3), datetime.timedelta(minutes=20)),
+        ],
+    )
+
+
+class TestNextStopsFinderLinearReferencing:
+    def test_get_in_between_stops(self):
+        trip = _example_trip()
+        previous_stop, next_stop = NextStopsFinder.get_in_between_stops(
+            trip.stops, Coordinates(0.1, 2)
+        )
+        assert previous_stop == trip.stops[1]
+        assert next_stop == trip.stops[2]
+
+    def test_get_next_stops_at_start(self):
+        stops = NextStopsFinder(_example_trip()).get_next_stops(
+            Coordinates(0, 0)
+        )
+        assert [stop.name for stop in stops] == ["Stop B", "Stop C"]
+        assert [stop.time_until_stop for stop in stops] == [
+            datetime.timedelta(minutes=10),
+            datetime.timedelta(minutes=20),
+        ]
+
+    def test_get_next_stops_along_segment(self):
+        stops = NextStopsFinder(_example_trip()).get_next_stops(
+            Coordinates(0.1, 2.5)
+        )
+        # three quarters of the way between the second and third stops
+        assert stops == [
+            Stop(
+                "Stop C",
+                Coordinates(0, 3),
+                datetime.timedelta(minutes=2, seconds=30),
+            )
+        ]
+
+    def test_get_next_stops_repeated_stop(self):
+        trip = Trip(
+            200,
+            Direction.NORTH,
+            [
+                Stop("A", Coordinates(0, 0), datetime.timedelta(minutes=0)),
+                Stop("A", Coordinates(0, 0), datetime.timedelta(minutes=1)),
+                Stop("B", Coordinates(0, 1), datetime.timedelta(minutes=5)),
+            ],
+        )
+        stops = NextStopsFinder(trip).get_next_stops(Coordinates(0, 0.5))
+        assert stops == [
+            Stop("B", Coordinates(0, 1), datetime.timedelta(minutes=2)),
+        ]
+
+    def test_get_trajectory_estimates(self):
+        finder = NextStopsFinder(_example_trip())
+        locations = np.array([[0, 0], [0.1, 0.5], [0.1, 2.5], [0, 3]])
+        estimates = finder.get_trajectory_estimates(
+            locations, np.array([0, 400, 1000, 1300])
+        )
+        assert list(estimates.segment_indices) == [0, 0, 1, 1]
+        assert list(estimates.next_stop_indices) == [1, 1, 2, 2]
+        assert np.allclose(estimates.proportions, [0, 0.5, 0.75, 1])
+        assert np.allclose(estimates.times_until_next_stop, [600, 300, 150, 0])
+        assert np.allclose(
+            estimates.next_stop_arrival_times, [600, 700, 1150, 1300]
+        )
+
+    def test_get_trajectory_estimates_matches_get_next_stops(self):
+        finder = NextStopsFinder(_example_trip())
+        finder.TRAJECTORY_CHUNK_SIZE = 2
+        locations = np.random.default_rng(0).uniform(-1, 4, size=(9, 2))
+        estimates = finder.get_trajectory_estimates(locations)
+        assert estimates.next_stop_arrival_times is None
+        for location, time_until_next_stop in zip(
+            locations, estimates.times_until_next_stop
+        ):
+            next_stop = finder.get_next_stops(Coordinates(*location))[0]
+            assert np.isclose(
+                next_stop.time_until_stop.total_seconds(), time_until_next_stop
+            )
@@ -0,0 +1,89 @@
+import datetime
+import filecmp
+
+import pandas as pd
+
+from bus_trip_announcer.data_managers.synthetic_data_generator import (
+    SyntheticNetworkGenerator,
+)
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import DirectionFinder, TripFinder
+from bus_trip_announcer.utils import Coordinates
+
+TABLES = ("routes", "trips", "stops", "stop_times")
+
+
+def generate(directory, seed=0):
+    generator = SyntheticNetworkGenerator(
+        number_of_routes=12, trips_per_direction=4, stops_per_trip=6, seed=seed
+    )
+    return generator.write(str(directory))
+
+
+class TestSyntheticNetworkGenerator:
+    def test_row_counts(self, tmp_path):
+        rows = generate(tmp_path)
+
+        assert rows["routes"] == 12
+        assert rows["trips"] == 12 * 2 * 4
+        assert rows["stop_times"] == 12 * 2 * 4 * 6
+        for table in TABLES:
+            assert len(pd.read_csv(tmp_path / f"{table}.csv")) == rows[table]
+
+    def test_deterministic(self, tmp_path):
+        generate(tmp_path / "a", seed=3)
+        generate(tmp_path / "b", seed=3)
+        generate(tmp_path / "c", seed=4)
+
+        for table in TABLES:
+            assert filecmp.cmp(
+                tmp_path / "a" / f"{table}.csv",
+                tmp_path / "b" / f"{table}.csv",
+                shallow=False,
+            )
+        assert not filecmp.cmp(
+            tmp_path / "a" / "stop_times.csv",
+            tmp_path / "c" / "stop_times.csv",
+            shallow=False,
+        )
+
+    def test_useful_data_format(self, tmp_path):
+        generate(tmp_path)
+        stop_times = pd.read_csv(tmp_path / "stop_times.csv", index_col=0)
+
+        assert list(stop_times.columns) == [
+            "trip_id",
+            "stop_id",
+            "arrival_time",
+            "stop_sequence",
+        ]
+        times = pd.to_timedelta(stop_times["arrival_time"])
+        for _, trip in stop_times.assign(time=times).groupby("trip_id"):
+            assert trip["time"].is_monotonic_increasing
+            assert list(trip["stop_sequence"]) == list(range(1, 7))
+
+    def test_finders(self, tmp_path):
+        generate(tmp_path)
+        database = CSVDatabase(str(tmp_path))
+        direction_finder = DirectionFinder(database)
+        headsigns = direction_finder.get_headsigns(100)
+        direction = direction_finder.get_direction(100, headsigns[0])
+
+        trips = pd.read_csv(tmp_path / "trips.csv")
+        stop_times = pd.read_csv(tmp_path / "stop_times.csv")
+        stops = pd.read_csv(tmp_path / "stops.csv")
+        trip_id = trips[
+            (trips["route_id"] == "100-1")
+            & (trips["direction_id"] == direction.value)
+        ]["trip_id"].iloc[0]
+        first_stop = stop_times[stop_times["trip_id"] == trip_id].iloc[0]
+        stop = stops[stops["stop_id"] == first_stop["stop_id"]].iloc[0]
+
+        trip = TripFinder(database).get_trip(
+            100,
+            direction,
+            Coordinates(stop["stop_lat"], stop["stop_lon"]),
+            datetime.timedelta(hours=5),
+        )
+        assert trip.trip_id == trip_id
+        assert len(trip) == 6
@@ -0,0 +1,207 @@
+import io
+import logging
+import socket
+import threading
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from bus_trip_announcer import traces
+from bus_trip_announcer.traces import (
+    GPSFix,
+    TraceFormatError,
+    open_fix_source,
+    parse_fix_line,
+    parse_nmea_sentence,
+    parse_time,
+    read_agency_time_zone,
+    read_fix_stream,
+    read_trace,
+)
+from bus_trip_announcer.utils import Coordinates
+
+
+RMC = "GPRMC,220130.00,A,2728.590,S,15301.350,E,10.0,180.0,290224,,"
+GGA = "GNGGA,220130.00,2728.590,S,15301.350,E,1,08,0.9,20.0,M,,M,,"
+
+
+def nmea(body):
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+    return f"${body}*{checksum:02X}"
+
+
+class TestParseTime:
+    def test_clock_time(self):
+        assert parse_time("08:15:30") == 8 * 3600 + 15 * 60 + 30
+
+    def test_past_midnight(self):
+        assert parse_time("25:00:00") == 25 * 3600
+
+    def test_iso_datetime_in_utc(self):
+        # UTC times are converted to the time of day in Brisbane
+        assert parse_time("2024-02-29T22:15:30.5Z") == 29730.5
+
+    def test_iso_datetime_with_offset(self):
+        assert parse_time("2024-03-01T08:15:30+10:00") == 29730
+
+    def test_iso_datetime_without_offset(self):
+        assert parse_time("2024-03-01T08:15:30") == 29730
+
+    def test_time_zone(self):
+        time = parse_time("2024-03-01T08:15:30Z", ZoneInfo("UTC"))
+        assert time == 29730
+
+    def test_seconds(self):
+        assert parse_time("29730") == 29730.0
+
+
+class TestParseNmeaSentence:
+    def test_rmc(self):
+        fix = parse_nmea_sentence(nmea(RMC))
+        assert fix.time == 8 * 3600 + 90
+        assert fix.coordinates.latitude == pytest.approx(-27.4765)
+        assert fix.coordinates.longitude == pytest.approx(153.0225)
+
+    def test_rmc_time_zone(self):
+        fix = parse_nmea_sentence(nmea(RMC), ZoneInfo("UTC"))
+        assert fix.time == 22 * 3600 + 90
+
+    def test_gga(self):
+        fix = parse_nmea_sentence(nmea(GGA))
+        assert fix.coordinates.latitude == pytest.approx(-27.4765)
+
+    def test_invalid_fix(self):
+        assert (
+            parse_nmea_sentence(
+                nmea("GPRMC,080130.00,V,2728.590,S,15301.350,E,,,010324,,")
+            )
+            is None
+        )
+
+    def test_wrong_checksum(self):
+        sentence = nmea("GPRMC,080130.00,A,2728.590,S,15301.350,E,,,010324,,")
+        assert parse_nmea_sentence(sentence[:-2] + "00") is None
+
+    def test_other_sentence(self):
+        assert parse_nmea_sentence(nmea("GPGSV,1,1,00")) is None
+
+
+class TestReadTrace:
+    def test_csv(self, tmp_path):
+        path = tmp_path / "trace.csv"
+        path.write_text("Time,Lat,Lon\n08:01:00,-27.47,153.02\n")
+        assert list(read_trace(str(path))) == [
+            GPSFix(8 * 3600 + 60, Coordinates(-27.47, 153.02))
+        ]
+
+    def test_csv_missing_column(self, tmp_path):
+        path = tmp_path / "trace.csv"
+        path.write_text("time,lat\n08:01:00,-27.47\n")
+        with pytest.raises(TraceFormatError):
+            list(read_trace(str(path)))
+
+    def test_gpx(self, tmp_path):
+        path = tmp_path / "trace.gpx"
+        path.write_text(
+            '<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+            '<trkpt lat="-27.47" lon="153.02">'
+            "<time>2024-02-29T22:01:00Z</time></trkpt>"
+            '<trkpt lat="-27.48" lon="153.03"></trkpt>'
+            "</trkseg></trk></gpx>"
+        )
+        assert list(read_trace(str(path))) == [
+            GPSFix(8 * 3600 + 60, Coordinates(-27.47, 153.02))
+        ]
+
+    def test_nmea_keeps_one_fix_per_epoch(self, tmp_path):
+        path = tmp_path / "trace.nmea"
+        path.write_text(
+            "\n".join(
+                [
+                    nmea(RMC),
+                    nmea(GGA),
+                    "garbage",
+                    nmea(RMC.replace("220130", "220131")),
+                ]
+            )
+        )
+        assert [fix.time for fix in read_trace(str(path))] == [28890, 28891]
+
+
+class TestParseFixLine:
+    def test_json(self):
+        assert parse_fix_line('{"latitude": -27.47, "lng": 153.02}') == (
+            GPSFix(None, Coordinates(-27.47, 153.02))
+        )
+
+    def test_json_without_location(self):
+        assert parse_fix_line('{"lat": -27.47}') is None
+        assert parse_fix_line("{not json") is None
+
+    def test_nmea(self):
+        assert parse_fix_line(nmea(RMC) + "\r\n").time == 28890
+
+
+class TestReadFixStream:
+    def test_mixed_feed(self):
+        stream = io.StringIO(
+            nmea(RMC) + "\n" + nmea(GGA) + "\n" + '{"lat": 1, "lon": 2}\n'
+        )
+        fixes = list(read_fix_stream(stream))
+        assert len(fixes) == 2
+        assert fixes[1] == GPSFix(None, Coordinates(1, 2))
+
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / "gps.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+
+        def send():
+            connection, _ = server.accept()
+            with connection:
+                connection.sendall(b'{"lat": 1, "lon": 2}\n')
+                connection.sendall(b'{"lat": 3, "lon": 4}\n')
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        with open_fix_source("unix:" + path) as stream:
+            fixes = list(read_fix_stream(stream))
+        thread.join(5)
+        server.close()
+
+        assert [fix.coordinates for fix in fixes] == [
+            Coordinates(1, 2),
+            Coordinates(3, 4),
+        ]
+
+
+class TestReadAgencyTimeZone:
+    def test_agency_table(self, tmp_path):
+        (tmp_path / "agency.txt").write_text(
+            "agency_id,agency_name,agency_timezone\n"
+            "TL,Translink,Australia/Sydney\n"
+        )
+        assert read_agency_time_zone(str(tmp_path)) == ZoneInfo(
+            "Australia/Sydney"
+        )
+
+    def test_no_agency_table(self, tmp_path):
+        assert read_agency_time_zone(str(tmp_path)) is None
+
+
+class TestTimeZoneFromEnvironment:
+    def test_time_zone(self, monkeypatch):
+        monkeypatch.setenv("BUS_TRIP_ANNOUNCER_TIME_ZONE", "Australia/Perth")
+        assert traces._time_zone_from_environment() == ZoneInfo(
+            "Australia/Perth"
+        )
+
+    def test_unknown_time_zone(self, monkeypatch, caplog):
+        monkeypatch.setenv("BUS_TRIP_ANNOUNCER_TIME_ZONE", "Nope/Zone")
+        with caplog.at_level(logging.WARNING):
+            time_zone = traces._time_zone_from_environment()
+        assert time_zone == ZoneInfo("Australia/Brisbane")
+        assert "Nope/Zone" in caplog.text
@@ -0,0 +1,82 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from bus_trip_announcer.database.database import CSVDatabase
+from bus_trip_announcer.database.finders import TripFinder
+from bus_trip_announcer.stops_finder import NextStopsFinder
+from bus_trip_announcer.travel_times import SegmentTravelTimes
+from bus_trip_announcer.utils import Coordinates, SEQDirection
+
+TEST_NETWORK = os.path.join(
+    os.path.dirname(__file__), "..", "data", "test_network"
+)
+
+
+def _travel_times() -> SegmentTravelTimes:
+    stop_times = pd.read_csv(os.path.join(TEST_NETWORK, "stop_times.csv"))
+    return SegmentTravelTimes.from_stop_times(stop_times)
+
+
+class TestSegmentTravelTimes:
+    def test_lookup(self):
+        travel_times = _travel_times()
+        assert travel_times.lookup("2", "3", 8 * 3600 + 300) == 600
+        assert travel_times.lookup("2", "3", 9 * 3600 + 300) == 720
+        assert travel_times.lookup("2", "3", 11 * 3600) == 600
+        assert np.isnan(travel_times.lookup("2", "3", 12 * 3600))
+        assert np.isnan(travel_times.lookup("1", "4", 8 * 3600))
+
+    def test_quantiles(self):
+        stop_times = pd.DataFrame(
+            {
+                "trip_id": ["A", "A", "B", "B", "C", "C"],
+                "stop_id": [1, 2, 1, 2, 1, 2],
+                "arrival_time": [
+                    "08:00:00",
+                    "08:01:00",
+                    "08:10:00",
+                    "08:12:00",
+                    "08:20:00",
+                    "08:23:00",
+                ],
+                "stop_sequence": [1, 2, 1, 2, 1, 2],
+            }
+        )
+        travel_times = SegmentTravelTimes.from_stop_times(stop_times)
+        assert travel_times.lookup("1", "2", 8 * 3600, 0.5) == 120
+        assert travel_times.lookup("1", "2", 8 * 3600, 0.9) == 168
+
+    def test_save_and_load(self, tmp_path):
+        travel_times = _travel_times()
+        path = str(tmp_path / "travel_times.npz")
+        travel_times.save(path)
+        loaded = SegmentTravelTimes.load(path)
+        assert loaded.segments == travel_times.segments
+        assert np.array_equal(
+            loaded.travel_times, travel_times.travel_times, equal_nan=True
+        )
+
+    def test_next_stops_finder_uses_model(self):
+        stop_times = pd.read_csv(os.path.join(TEST_NETWORK, "stop_times.csv"))
+        # the buses in the 8am bucket usually take 15 minutes from 2 to 3
+        stop_times.loc[stop_times["trip_id"] == "T1", "arrival_time"] = [
+            "08:00:00",
+            "08:05:00",
+            "08:20:00",
+            "08:25:00",
+        ]
+        trip = TripFinder(CSVDatabase(TEST_NETWORK))._create_trip(
+            "T1", 66, SEQDirection.ZERO
+        )
+        location = Coordinates(-27.48, 153.025)
+
+        scheduled = NextStopsFinder(trip).get_next_stops(location)
+        modelled = NextStopsFinder(
+            trip, SegmentTravelTimes.from_stop_times(stop_times)
+        ).get_next_stops(location)
+        assert scheduled[1].time_until_stop == datetime.timedelta(minutes=10)
+        assert modelled[1].time_until_stop == datetime.timedelta(minutes=15)
+        assert modelled[2].time_until_stop == datetime.timedelta(minutes=20)
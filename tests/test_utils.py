@@ -94,3 +94,17 @@ class TestCoordinates:
                 Coordinates(4, 6), Coordinates(1, 2)
             )
         ) == -4
+
+    def test_coordinates_are_immutable(self):
+        coordinates = Coordinates(1, 2)
+        try:
+            coordinates.latitude = 3
+        except AttributeError:
+            pass
+        else:
+            assert False
+        assert coordinates.latitude == 1
+
+    def test_coordinates_hash(self):
+        assert hash(Coordinates(1, 2)) == hash(Coordinates(1, 2))
+        assert len({Coordinates(1, 2), Coordinates(1, 2)}) == 1
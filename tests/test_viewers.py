@@ -0,0 +1,148 @@
+import datetime
+import threading
+
+from bus_trip_announcer.models import Stop
+from bus_trip_announcer.utils import Coordinates
+from bus_trip_announcer.viewers import FletTripViewer, RenderScheduler
+
+
+class FakeAnnouncer:
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+        return lambda: self.subscribers.remove(subscriber)
+
+    def publish(self):
+        for subscriber in list(self.subscribers):
+            subscriber(["event"])
+
+
+class FakeViewer:
+    def __init__(self):
+        self.rendered = threading.Semaphore(0)
+        self.renders = 0
+
+    def show_next_stops(self):
+        self.renders += 1
+        self.rendered.release()
+
+
+class TestRenderScheduler:
+    def start(self, max_fps=1000):
+        announcer = FakeAnnouncer()
+        viewer = FakeViewer()
+        scheduler = RenderScheduler(viewer, announcer, max_fps=max_fps)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        return announcer, viewer, scheduler, thread
+
+    def test_renders_first_frame(self):
+        _, viewer, scheduler, thread = self.start()
+        assert viewer.rendered.acquire(timeout=5)
+        scheduler.stop()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert viewer.renders == 1
+
+    def test_renders_on_change(self):
+        announcer, viewer, scheduler, thread = self.start()
+        assert viewer.rendered.acquire(timeout=5)
+        announcer.publish()
+        assert viewer.rendered.acquire(timeout=5)
+        scheduler.stop()
+        thread.join(5)
+
+        assert viewer.renders == 2
+        assert scheduler.frames_rendered == 2
+
+    def test_changes_within_frame_are_drawn_together(self):
+        announcer, viewer, scheduler, thread = self.start(max_fps=2)
+        assert viewer.rendered.acquire(timeout=5)
+        for _ in range(10):
+            announcer.publish()
+        assert viewer.rendered.acquire(timeout=5)
+        scheduler.stop()
+        thread.join(5)
+
+        assert viewer.renders == 2
+
+    def test_stop_unsubscribes(self):
+        announcer, _, scheduler, thread = self.start(max_fps=1)
+        scheduler.stop()
+        scheduler.stop()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert announcer.subscribers == []
+
+
+class FakePage:
+    def __init__(self):
+        self.controls = []
+        self.updates = 0
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self):
+        self.updates += 1
+
+
+class StopsAnnouncer:
+    def __init__(self, minutes):
+        self.set_minutes(minutes)
+
+    def set_minutes(self, minutes):
+        self.next_stops = [
+            Stop(
+                f"Stop {i}",
+                Coordinates(-27.5, 153.0),
+                datetime.timedelta(minutes=m),
+            )
+            for i, m in enumerate(minutes)
+        ]
+
+
+class TestFletTripViewer:
+    def texts(self, viewer):
+        return [
+            (name.value, time.value)
+            for name, time in zip(viewer._name_texts, viewer._time_texts)
+            if name.visible
+        ]
+
+    def test_first_show_adds_display(self):
+        page = FakePage()
+        viewer = FletTripViewer(StopsAnnouncer([1, 3]), page)
+        viewer.show_next_stops()
+
+        assert len(page.controls) == 1
+        assert page.updates == 0
+        assert self.texts(viewer) == [("Stop 0", "1min"), ("Stop 1", "3min")]
+
+    def test_controls_are_reused(self):
+        page = FakePage()
+        announcer = StopsAnnouncer([1, 2, 3, 4, 5, 6, 7])
+        viewer = FletTripViewer(announcer, page)
+        viewer.show_next_stops()
+        display = page.controls[0]
+        texts = list(viewer._name_texts)
+
+        announcer.set_minutes([2, 3])
+        viewer.show_next_stops()
+
+        assert page.controls == [display]
+        assert viewer._name_texts == texts
+        assert page.updates == 1
+        assert self.texts(viewer) == [("Stop 0", "2min"), ("Stop 1", "3min")]
+
+    def test_no_update_without_change(self):
+        page = FakePage()
+        viewer = FletTripViewer(StopsAnnouncer([1, 3]), page)
+        viewer.show_next_stops()
+        viewer.show_next_stops()
+
+        assert page.updates == 0